@@ -1,6 +1,5 @@
 import os
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from django.core.asgi import get_asgi_application
 from django.urls import path, re_path
 
@@ -10,10 +9,12 @@ django_asgi_app = get_asgi_application()
 
 # Import your websocket routes (or define inline)
 from orders.routing import websocket_urlpatterns as orders_ws  # keep routes in app
+from restaurants.routing import websocket_urlpatterns as restaurants_ws
+from backend.ws_auth import TokenAuthMiddlewareStack
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
-    "websocket": AuthMiddlewareStack(
-        URLRouter(orders_ws)
+    "websocket": TokenAuthMiddlewareStack(
+        URLRouter(orders_ws + restaurants_ws)
     ),
 })
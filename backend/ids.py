@@ -0,0 +1,127 @@
+import hashlib
+import hmac
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+
+# ---------------- ALLOCATORS ----------------
+class SequenceAllocator:
+    """One nextval() round trip per allocated value."""
+
+    def __init__(self, **options):
+        pass
+
+    def take(self, sequence, count=1):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)", [sequence, count]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class BlockAllocator(SequenceAllocator):
+    """
+    Reserves `block_size` sequence values per round trip and hands them out
+    from process memory. Values left in a block when the process exits are
+    skipped, never reused.
+    """
+
+    def __init__(self, block_size=50, **options):
+        self.block_size = block_size
+        self.blocks = {}
+        self.lock = threading.Lock()
+
+    def take(self, sequence, count=1):
+        with self.lock:
+            block = self.blocks.setdefault(sequence, [])
+            if len(block) < count:
+                block.extend(
+                    super().take(sequence, max(self.block_size, count - len(block)))
+                )
+            values, block[:] = block[:count], block[count:]
+            return values
+
+
+@lru_cache(maxsize=None)
+def get_allocator():
+    config = settings.ID_ALLOCATOR
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+
+
+# ---------------- OBFUSCATION ----------------
+class Permutation:
+    """
+    Keyed bijection on range(size): a balanced Feistel network over the
+    smallest even bit width covering `size`, cycle-walked back into range.
+    """
+
+    rounds = 4
+
+    def __init__(self, size, key):
+        bits = max((size - 1).bit_length(), 2)
+        self.half = (bits + 1) // 2
+        self.mask = (1 << self.half) - 1
+        self.size = size
+        self.key = key.encode()
+
+    def _round(self, index, value):
+        digest = hmac.new(
+            self.key, f"{index}:{value}".encode(), hashlib.sha256
+        ).digest()
+        return int.from_bytes(digest[:8], "big") & self.mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half, value & self.mask
+        for index in range(self.rounds):
+            left, right = right, left ^ self._round(index, right)
+        return (left << self.half) | right
+
+    def __call__(self, value):
+        value = self._encrypt(value)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+
+# ---------------- ID SEQUENCES ----------------
+class IdSequence:
+    """
+    Formats values drawn from a Postgres sequence as "<prefix><digits>",
+    zero-padded to `digits`.
+
+    Sequences are created without CYCLE and with a MAXVALUE that fits the
+    column (see the migrations that create them), so running out of IDs
+    raises an error instead of wrapping into duplicates. With `obfuscate`,
+    values in range(10**digits) are shuffled through a keyed permutation of
+    that range so consecutive IDs are not guessable; ID_OBFUSCATION_KEY must
+    therefore never change once IDs have been issued.
+    """
+
+    def __init__(self, sequence, prefix, digits, obfuscate=False):
+        self.sequence = sequence
+        self.prefix = prefix
+        self.digits = digits
+        self.obfuscate = obfuscate
+
+    @property
+    def size(self):
+        return 10**self.digits
+
+    def format(self, value):
+        if self.obfuscate:
+            value = Permutation(
+                self.size, f"{settings.ID_OBFUSCATION_KEY}:{self.sequence}"
+            )(value)
+        return f"{self.prefix}{value:0{self.digits}d}"
+
+    def next(self):
+        return self.take(1)[0]
+
+    def take(self, count):
+        return [
+            self.format(value) for value in get_allocator().take(self.sequence, count)
+        ]
@@ -0,0 +1,154 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Longest edge of each derivative, in pixels; smaller originals are not upscaled
+VARIANTS = {"thumb": 160, "card": 480, "full": 1280}
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# (model, field name) pairs wired up by register_image_field
+REGISTERED_FIELDS = []
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+    thread_name_prefix="image-derivatives",
+)
+
+
+def variants_field_name(field_name):
+    return f"{field_name}_variants"
+
+
+def derivative_name(name, variant, fmt, content):
+    """
+    "foods/pizza.png" -> "foods/pizza.card.<hash>.webp", next to the original.
+    The content hash lets serve_media mark derivatives as immutable.
+    """
+    root, _ = os.path.splitext(name)
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return f"{root}.{variant}.{digest}.{fmt}"
+
+
+def render_derivatives(field_file):
+    """
+    Write every variant of `field_file` to its storage and return the map
+    stored on the model: {"source": name, "webp": {"thumb": name, ...}, ...}.
+    """
+    storage = field_file.storage
+    with field_file.open("rb"), Image.open(field_file) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ("RGBA", "LA", "P")
+        original = original.convert("RGBA" if has_alpha else "RGB")
+
+        variants = {"source": field_file.name}
+        for fmt, (pil_format, options) in FORMATS.items():
+            variants[fmt] = {}
+            for variant, size in VARIANTS.items():
+                image = original.copy()
+                image.thumbnail((size, size), Image.LANCZOS)
+                if pil_format == "JPEG" and image.mode != "RGB":
+                    background = Image.new("RGB", image.size, "white")
+                    background.paste(image, mask=image.getchannel("A"))
+                    image = background
+
+                buffer = io.BytesIO()
+                image.save(buffer, pil_format, **options)
+                content = buffer.getvalue()
+                name = derivative_name(field_file.name, variant, fmt, content)
+                if not storage.exists(name):
+                    name = storage.save(name, ContentFile(content))
+                variants[fmt][variant] = name
+    return variants
+
+
+def derivative_names(variants):
+    return {name for fmt in FORMATS for name in variants.get(fmt, {}).values()}
+
+
+def delete_derivatives(storage, variants, keep=None):
+    for name in derivative_names(variants) - derivative_names(keep or {}):
+        storage.delete(name)
+
+
+def build_derivatives(model_label, pk, field_name):
+    """Render and record the derivatives of one stored image (worker thread)."""
+    model = apps.get_model(model_label)
+    variants_field = variants_field_name(field_name)
+    close_old_connections()
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        field_file = getattr(instance, field_name, None)
+        if not field_file:
+            return
+        variants = render_derivatives(field_file)
+
+        with transaction.atomic():
+            instance = model.objects.select_for_update().filter(pk=pk).first()
+            current = getattr(instance, field_name, None)
+            if current is None or current.name != variants["source"]:
+                # Replaced while rendering; the newer upload has its own job
+                stale, variants = variants, getattr(instance, variants_field, {})
+            else:
+                stale = getattr(instance, variants_field)
+                setattr(instance, variants_field, variants)
+                update_fields = [variants_field]
+                if any(f.name == "updated_at" for f in model._meta.concrete_fields):
+                    update_fields.append("updated_at")
+                # A regular save, so change markers (menu version, ETags) follow
+                instance.save(update_fields=update_fields)
+
+        delete_derivatives(field_file.storage, stale, keep=variants)
+    except Exception:
+        logger.exception("Image derivatives failed for %s %s", model_label, pk)
+    finally:
+        close_old_connections()
+
+
+def image_saved(sender, instance, field_name, **kwargs):
+    field_file = getattr(instance, field_name)
+    variants_field = variants_field_name(field_name)
+    variants = getattr(instance, variants_field)
+    if variants.get("source") == (field_file.name or None):
+        return
+
+    if not field_file:
+        # Image cleared: drop the derivatives of the old one
+        sender.objects.filter(pk=instance.pk).update(**{variants_field: {}})
+        setattr(instance, variants_field, {})
+        delete_derivatives(field_file.storage, variants)
+        return
+
+    label = sender._meta.label
+    pk = instance.pk
+    transaction.on_commit(
+        lambda: executor.submit(build_derivatives, label, pk, field_name)
+    )
+
+
+def register_image_field(model, field_name):
+    """Generate derivatives off the request thread whenever the image changes."""
+
+    def receiver(sender, instance, **kwargs):
+        image_saved(sender, instance, field_name, **kwargs)
+
+    REGISTERED_FIELDS.append((model, field_name))
+    post_save.connect(
+        receiver,
+        sender=model,
+        weak=False,
+        dispatch_uid=f"image-derivatives:{model._meta.label}.{field_name}",
+    )
@@ -0,0 +1,221 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import models
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date
+from django.views.decorators.http import require_safe
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+
+def media_base_url(request=None):
+    """
+    Scheme and host prefixed to media URLs: MEDIA_BASE_URL when configured,
+    otherwise derived once per request (is_secure() honours
+    SECURE_PROXY_SSL_HEADER) and cached on it.
+    """
+    if settings.MEDIA_BASE_URL:
+        return settings.MEDIA_BASE_URL
+    if request is None:
+        return ""
+
+    http_request = getattr(request, "_request", request)
+    base = getattr(http_request, "_media_base_url", None)
+    if base is None:
+        scheme = "https" if http_request.is_secure() else "http"
+        base = f"{scheme}://{http_request.get_host()}"
+        http_request._media_base_url = base
+    return base
+
+
+def absolute_url(url, request=None):
+    if url.startswith(("http://", "https://")):
+        return url
+    return media_base_url(request) + url
+
+
+def absolute_media_url(file, request=None):
+    if not file:
+        return None
+    return absolute_url(file.url, request)
+
+
+def variant_urls(variants, request=None):
+    """
+    Turn a stored derivative map (see backend.images) into absolute URLs:
+    {"webp": {"thumb": url, "card": url, "full": url}, "jpeg": {...}}, or
+    None until the derivatives exist.
+    """
+    if not variants:
+        return None
+    return {
+        fmt: {
+            variant: absolute_url(default_storage.url(name), request)
+            for variant, name in names.items()
+        }
+        for fmt, names in variants.items()
+        if fmt != "source"
+    }
+
+
+class MediaFileField(serializers.FileField):
+    def to_representation(self, value):
+        if not value:
+            return None
+        if not getattr(self, "use_url", api_settings.UPLOADED_FILES_USE_URL):
+            return value.name
+        return absolute_media_url(value, self.context.get("request"))
+
+
+class MediaImageField(MediaFileField, serializers.ImageField):
+    pass
+
+
+class MediaVariantsField(serializers.ReadOnlyField):
+    def to_representation(self, value):
+        return variant_urls(value, self.context.get("request"))
+
+
+class MediaModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer whose file and image fields use absolute_media_url."""
+
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.FileField: MediaFileField,
+        models.ImageField: MediaImageField,
+    }
+
+
+# ---------------- SERVING ----------------
+# Names like "food_images/p.card.3f2a9c1b7d4e.webp" never change content
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.[A-Za-z0-9]+$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+
+async def read_file_range(path, start, length, chunk_size=MEDIA_CHUNK_SIZE):
+    """
+    Yield `length` bytes of the file at `path` from offset `start`, one
+    chunk at a time. Under ASGI, Django buffers sync iterators whole before
+    sending them (StreamingHttpResponse.__aiter__), so the file is read
+    through an async generator; each blocking read runs in a worker thread.
+    """
+    read_async = sync_to_async(thread_sensitive=False)
+    file = await read_async(open)(path, "rb")
+    try:
+        await read_async(file.seek)(start)
+        while length > 0:
+            data = await read_async(file.read)(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def parse_range(header, size):
+    """
+    Return the inclusive (start, end) of a single-range "Range" header, None
+    to send the whole file (absent, malformed or multi-range headers), or
+    False when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header or "")
+    if not match or not size:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        suffix = int(end)
+        return (max(size - suffix, 0), size - 1) if suffix else False
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        return False
+    return start, min(int(end), size - 1) if end else size - 1
+
+
+def patch_media_headers(response, path, etag, last_modified):
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+    response.headers["Accept-Ranges"] = "bytes"
+    if HASHED_NAME_RE.search(path):
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_MAX_AGE)
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with validators, caching and Range support.
+    Behind nginx or Apache the body is handed off via X-Accel-Redirect or
+    X-Sendfile. Otherwise (e.g. daphne on Render, with no proxy in front) it
+    is streamed in chunks by read_file_range, so the ASGI worker never holds
+    the whole file in memory.
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stats = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404
+
+    etag = f'"{stats.st_size:x}-{stats.st_mtime_ns:x}"'
+    last_modified = int(stats.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        return patch_media_headers(response, path, etag, last_modified)
+
+    if settings.MEDIA_X_ACCEL_REDIRECT or settings.MEDIA_X_SENDFILE:
+        # The proxy streams the body and answers Range requests itself
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        response = HttpResponse(content_type=content_type)
+        if settings.MEDIA_X_ACCEL_REDIRECT:
+            response.headers["X-Accel-Redirect"] = (
+                settings.MEDIA_X_ACCEL_REDIRECT + quote(path)
+            )
+        else:
+            response.headers["X-Sendfile"] = fullpath
+        return patch_media_headers(response, path, etag, last_modified)
+
+    byte_range = None
+    if request.headers.get("If-Range", etag) == etag:
+        byte_range = parse_range(request.headers.get("Range"), stats.st_size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response.headers["Content-Range"] = f"bytes */{stats.st_size}"
+        return patch_media_headers(response, path, etag, last_modified)
+
+    start, end = byte_range or (0, stats.st_size - 1)
+    response = StreamingHttpResponse(
+        read_file_range(fullpath, start, end - start + 1),
+        status=206 if byte_range else 200,
+        content_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+    )
+    response.headers["Content-Length"] = end - start + 1
+    response.headers["Content-Disposition"] = content_disposition_header(
+        False, os.path.basename(path)
+    )
+    if byte_range:
+        response.headers["Content-Range"] = f"bytes {start}-{end}/{stats.st_size}"
+    return patch_media_headers(response, path, etag, last_modified)
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.views import APIView
+
+
+def date_param(request, name):
+    """Optional YYYY-MM-DD query parameter; a 400 when malformed."""
+    raw = request.query_params.get(name)
+    if not raw:
+        return None
+    try:
+        day = parse_date(raw)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({name: "Use a valid YYYY-MM-DD date."})
+    return day
+
+
+class RollupReportView(APIView):
+    """
+    Base for report endpoints that read daily rollup tables.
+
+    ?start=/?end= (dates, inclusive; default the last `default_days` days,
+    at most `max_days`) and ?group_by= a comma list of `groups` names.
+    Each group maps to the values() fields and aliases it adds.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    max_days = 366
+    default_days = 7
+    groups = {}
+    default_group_by = None
+
+    def parse_range(self):
+        end = date_param(self.request, "end") or timezone.localdate()
+        start = date_param(self.request, "start")
+        if start is None:
+            start = end - timedelta(days=self.default_days - 1)
+        if start > end:
+            raise ValidationError({"start": "Must not be after end."})
+        if (end - start).days >= self.max_days:
+            raise ValidationError(
+                {"start": f"Ranges are limited to {self.max_days} days."}
+            )
+        return start, end
+
+    def parse_group_by(self):
+        raw = self.request.query_params.get("group_by", self.default_group_by)
+        group_by = [name.strip() for name in raw.split(",") if name.strip()]
+        unknown = set(group_by) - set(self.groups)
+        if not group_by or unknown:
+            raise ValidationError(
+                {"group_by": f"Choose from {', '.join(self.groups)}."}
+            )
+        return group_by
+
+    def group_rows(self, rollups, group_by, **aggregates):
+        fields, aliases = [], {}
+        for name in group_by:
+            group_fields, group_aliases = self.groups[name]
+            fields += group_fields
+            aliases.update(group_aliases)
+        return (
+            rollups.values(*fields, **aliases)
+            .annotate(**aggregates)
+            .order_by(*fields, *aliases)
+        )
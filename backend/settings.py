@@ -53,6 +53,15 @@ MEDIA_ROOT = (
     "/var/data/media" if os.environ.get("RENDER") else os.path.join(BASE_DIR, "media")
 )
 MEDIA_URL = "/media/"
+# Optional "https://cdn.example.com" prefix for media URLs; when unset they
+# are built from the request's scheme and host
+MEDIA_BASE_URL = os.environ.get("MEDIA_BASE_URL", "").rstrip("/")
+# Cache lifetime for media without a content hash in its name
+MEDIA_MAX_AGE = int(os.environ.get("MEDIA_MAX_AGE", 60 * 60))
+# Hand media bodies to the front proxy: an nginx internal location prefix
+# (e.g. "/protected-media/") for X-Accel-Redirect, or X-Sendfile for Apache
+MEDIA_X_ACCEL_REDIRECT = os.environ.get("MEDIA_X_ACCEL_REDIRECT", "")
+MEDIA_X_SENDFILE = os.environ.get("MEDIA_X_SENDFILE") == "True"
 STATIC_URL = "/static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
@@ -74,6 +83,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.gis",
+    "django.contrib.postgres",
     # Third-party apps
     "rest_framework",
     "rest_framework.authtoken",
@@ -103,6 +113,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "orders.middleware.OrderEventBatchMiddleware",
 ]
 
 ROOT_URLCONF = "backend.urls"
@@ -197,6 +208,46 @@ SPECTACULAR_SETTINGS = {
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
 
+# =========================
+# ID allocation
+# =========================
+# BlockAllocator reserves sequence values in batches to save round trips
+ID_ALLOCATOR = {
+    "BACKEND": os.environ.get("ID_ALLOCATOR", "backend.ids.SequenceAllocator"),
+    "OPTIONS": {"block_size": int(os.environ.get("ID_ALLOCATOR_BLOCK_SIZE", 50))},
+}
+# Keys the permutation behind obfuscated IDs. Never change it once IDs have
+# been issued, or new IDs may collide with them; it is deliberately not tied
+# to DJANGO_SECRET_KEY, which gets rotated.
+ID_OBFUSCATION_KEY = os.environ.get("ID_OBFUSCATION_KEY")
+if not ID_OBFUSCATION_KEY:
+    if not DEBUG:
+        raise RuntimeError(
+            "ID_OBFUSCATION_KEY must be set; it keys issued IDs and must never change."
+        )
+    ID_OBFUSCATION_KEY = "django-insecure-dev-id-key"
+
+# =========================
+# Image derivatives
+# =========================
+# Threads resizing uploaded photos into thumb/card/full WebP and JPEG copies
+IMAGE_DERIVATIVE_WORKERS = int(os.environ.get("IMAGE_DERIVATIVE_WORKERS", 2))
+
+# =========================
+# Order archival
+# =========================
+# Delivered orders dated further back move to ArchivedOrder (archive_orders)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get("ORDER_ARCHIVE_AFTER_DAYS", 365))
+# How long an Idempotency-Key keeps replaying the first response
+IDEMPOTENCY_KEY_TTL_SECONDS = int(
+    os.environ.get("IDEMPOTENCY_KEY_TTL_SECONDS", 24 * 60 * 60)
+)
+# How long an unfinished first request holds its key before a retry may
+# take it over (e.g. after the worker handling it died)
+IDEMPOTENCY_KEY_LEASE_SECONDS = int(
+    os.environ.get("IDEMPOTENCY_KEY_LEASE_SECONDS", 60)
+)
+
 # =========================
 # CORS
 # =========================
@@ -233,6 +284,26 @@ else:
         }
     }
 
+# Rider location frames are coalesced in memory and written this often
+RIDER_LOCATION_FLUSH_SECONDS = int(os.environ.get("RIDER_LOCATION_FLUSH_SECONDS", 5))
+
+# =========================
+# Cache (menu snapshots)
+# =========================
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # =========================
 # Optional: Logging / Debugging Channels
 # =========================
@@ -0,0 +1,56 @@
+import math
+
+
+class DDSketch:
+    """
+    Mergeable quantile sketch (DDSketch) for non-negative values.
+
+    Values land in logarithmic buckets so every quantile is answered within
+    `RELATIVE_ACCURACY` of the true value, in memory bounded by the value
+    range rather than the number of values. Sketches of the same accuracy
+    merge by adding bucket counts, so hourly sketches can be combined into
+    any longer window. The accuracy is fixed because stored buckets depend
+    on it.
+    """
+
+    RELATIVE_ACCURACY = 0.01
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    LOG_GAMMA = math.log(GAMMA)
+
+    def __init__(self, bins=None, zero_count=0):
+        self.bins = {int(index): count for index, count in (bins or {}).items()}
+        self.zero_count = zero_count
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value, count=1):
+        if value <= 0:
+            self.zero_count += count
+            return
+        index = math.ceil(math.log(value) / self.LOG_GAMMA)
+        self.bins[index] = self.bins.get(index, 0) + count
+
+    def merge(self, other):
+        self.zero_count += other.zero_count
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+
+    def quantile(self, q):
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                return 2 * self.GAMMA**index / (self.GAMMA + 1)
+        return 2 * self.GAMMA ** max(self.bins) / (self.GAMMA + 1)
+
+    def to_json(self):
+        # JSON object keys are strings; __init__ turns them back into ints
+        return {str(index): count for index, count in self.bins.items()}
@@ -0,0 +1,295 @@
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIRequestFactory
+
+from restaurants.models import Food, Restaurant
+from restaurants.serializers import FoodSerializer
+
+from . import images
+
+from .media import (
+    MEDIA_CHUNK_SIZE,
+    absolute_media_url,
+    media_base_url,
+    variant_urls,
+)
+from .sketches import DDSketch
+
+
+class ServeMediaTests(SimpleTestCase):
+    url = "/media/food_images/dish.jpg"
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        os.makedirs(os.path.join(self.media_root, "food_images"))
+        self.data = os.urandom(MEDIA_CHUNK_SIZE * 3 + 100)
+        with open(os.path.join(self.media_root, "food_images/dish.jpg"), "wb") as f:
+            f.write(self.data)
+        settings = override_settings(
+            MEDIA_ROOT=self.media_root,
+            MEDIA_X_ACCEL_REDIRECT="",
+            MEDIA_X_SENDFILE=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    async def read(self, response):
+        return [chunk async for chunk in response.streaming_content]
+
+    async def test_file_is_streamed_in_chunks_under_asgi(self):
+        response = await self.async_client.get(self.url, secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response["Content-Length"], str(len(self.data)))
+        chunks = await self.read(response)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b"".join(chunks), self.data)
+
+    async def test_range_request_streams_only_the_range(self):
+        response = await self.async_client.get(
+            self.url, secure=True, headers={"range": "bytes=10-19"}
+        )
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.data)}")
+        self.assertEqual(b"".join(await self.read(response)), self.data[10:20])
+
+    async def test_matching_etag_answers_304(self):
+        response = await self.async_client.get(self.url, secure=True)
+        await self.read(response)
+
+        cached = await self.async_client.get(
+            self.url, secure=True, headers={"if-none-match": response["ETag"]}
+        )
+
+        self.assertEqual(cached.status_code, 304)
+
+
+class DDSketchTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        # Long-tailed durations in seconds, plus a few instant ones
+        self.values = [rng.lognormvariate(5, 1) for _ in range(5000)] + [0] * 50
+
+    def sketch(self, values):
+        sketch = DDSketch()
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def assertQuantilesAccurate(self, sketch, values):
+        ordered = sorted(values)
+        for q in (0.01, 0.25, 0.5, 0.9, 0.99, 1):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            self.assertAlmostEqual(
+                sketch.quantile(q),
+                exact,
+                delta=exact * DDSketch.RELATIVE_ACCURACY,
+                msg=f"q={q}",
+            )
+
+    def test_quantiles_are_within_the_relative_accuracy(self):
+        sketch = self.sketch(self.values)
+
+        self.assertEqual(sketch.count, len(self.values))
+        self.assertEqual(sketch.quantile(0), 0)
+        self.assertQuantilesAccurate(sketch, self.values)
+
+    def test_merged_sketches_answer_for_all_their_values(self):
+        half = len(self.values) // 2
+        merged = self.sketch(self.values[:half])
+        merged.merge(self.sketch(self.values[half:]))
+
+        whole = self.sketch(self.values)
+        self.assertEqual(merged.bins, whole.bins)
+        self.assertEqual(merged.zero_count, whole.zero_count)
+        self.assertQuantilesAccurate(merged, self.values)
+
+    def test_json_round_trip_keeps_the_buckets(self):
+        sketch = self.sketch(self.values)
+
+        stored = json.loads(json.dumps(sketch.to_json()))
+        loaded = DDSketch(stored, sketch.zero_count)
+
+        self.assertEqual(loaded.bins, sketch.bins)
+        self.assertEqual(loaded.quantile(0.9), sketch.quantile(0.9))
+
+    def test_empty_sketch_has_no_quantiles(self):
+        self.assertIsNone(DDSketch().quantile(0.5))
+
+
+def png_upload(name="dish.png", size=(600, 300)):
+    # Left half opaque red, right half fully transparent
+    image = Image.new("RGBA", size, (255, 0, 0, 255))
+    image.paste((0, 0, 0, 0), (size[0] // 2, 0, size[0], size[1]))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+# build_derivatives runs on a worker thread and recycles its connections;
+# here it runs inline, inside the test's transaction
+@mock.patch("backend.images.close_old_connections", mock.Mock())
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root, MEDIA_BASE_URL="")
+        settings.enable()
+        self.addCleanup(settings.disable)
+        user = get_user_model().objects.create_user(username="owner", password="x")
+        restaurant = Restaurant.objects.create(user=user, phone="000")
+        with self.captureOnCommitCallbacks() as self.jobs:
+            self.food = Food.objects.create(
+                restaurant=restaurant, name="Dish", price=5, image=png_upload()
+            )
+
+    def build(self):
+        images.build_derivatives("restaurants.Food", self.food.pk, "image")
+        self.food.refresh_from_db()
+        return self.food.image_variants
+
+    def test_upload_queues_one_job_and_builds_every_variant(self):
+        self.assertEqual(len(self.jobs), 1)
+
+        variants = self.build()
+
+        self.assertEqual(variants["source"], self.food.image.name)
+        for fmt in images.FORMATS:
+            self.assertEqual(set(variants[fmt]), set(images.VARIANTS))
+            for name in variants[fmt].values():
+                self.assertTrue(default_storage.exists(name))
+        with default_storage.open(variants["webp"]["thumb"]) as f:
+            self.assertEqual(Image.open(f).size, (160, 80))
+        # Smaller originals are not upscaled
+        with default_storage.open(variants["webp"]["full"]) as f:
+            self.assertEqual(Image.open(f).size, (600, 300))
+
+    def test_jpeg_variants_flatten_transparency_onto_white(self):
+        variants = self.build()
+
+        with default_storage.open(variants["jpeg"]["card"]) as f:
+            image = Image.open(f)
+            image.load()
+        self.assertEqual(image.mode, "RGB")
+        opaque = image.getpixel((10, 10))
+        transparent = image.getpixel((image.width - 10, 10))
+        self.assertTrue(opaque[0] > 240 and opaque[1] < 20)
+        self.assertTrue(all(channel > 240 for channel in transparent))
+
+    def test_image_replaced_while_rendering_keeps_the_newer_upload(self):
+        render = images.render_derivatives
+        rendered = {}
+
+        def replaced_meanwhile(field_file):
+            rendered.update(render(field_file))
+            Food.objects.filter(pk=self.food.pk).update(image="food_images/new.png")
+            return rendered
+
+        with mock.patch("backend.images.render_derivatives", replaced_meanwhile):
+            variants = self.build()
+
+        self.assertEqual(variants, {})
+        for name in images.derivative_names(rendered):
+            self.assertFalse(default_storage.exists(name))
+
+    def test_clearing_the_image_deletes_its_derivatives(self):
+        variants = self.build()
+
+        self.food.image = None
+        self.food.save()
+
+        self.food.refresh_from_db()
+        self.assertEqual(self.food.image_variants, {})
+        for name in images.derivative_names(variants):
+            self.assertFalse(default_storage.exists(name))
+
+    def test_serializer_renders_the_srcset_as_absolute_urls(self):
+        variants = self.build()
+        request = APIRequestFactory().get("/", secure=True)
+
+        srcset = FoodSerializer(self.food, context={"request": request}).data[
+            "imageSrcset"
+        ]
+
+        self.assertEqual(set(srcset), set(images.FORMATS))
+        self.assertEqual(
+            srcset["webp"]["card"],
+            f"https://testserver/media/{variants['webp']['card']}",
+        )
+
+
+@override_settings(MEDIA_BASE_URL="", SECURE_PROXY_SSL_HEADER=None)
+class MediaUrlTests(SimpleTestCase):
+    variants = {
+        "source": "food_images/dish.png",
+        "webp": {"thumb": "food_images/dish.thumb.abc.webp"},
+        "jpeg": {"thumb": "food_images/dish.thumb.def.jpeg"},
+    }
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_urls_follow_the_request_scheme_and_host(self):
+        request = self.factory.get("/", HTTP_HOST="api.example")
+
+        base = "http://api.example/media/food_images/"
+        self.assertEqual(media_base_url(request), "http://api.example")
+        self.assertEqual(
+            variant_urls(self.variants, request),
+            {
+                "webp": {"thumb": base + "dish.thumb.abc.webp"},
+                "jpeg": {"thumb": base + "dish.thumb.def.jpeg"},
+            },
+        )
+
+    @override_settings(SECURE_PROXY_SSL_HEADER=("HTTP_X_FORWARDED_PROTO", "https"))
+    def test_https_behind_a_tls_terminating_proxy(self):
+        request = self.factory.get(
+            "/", HTTP_HOST="api.example", HTTP_X_FORWARDED_PROTO="https"
+        )
+
+        self.assertEqual(media_base_url(request), "https://api.example")
+
+    def test_base_url_is_computed_once_per_request(self):
+        request = self.factory.get("/", HTTP_HOST="api.example")
+        media_base_url(request)
+
+        with mock.patch.object(request, "get_host") as get_host:
+            self.assertEqual(media_base_url(request), "http://api.example")
+        get_host.assert_not_called()
+
+    @override_settings(MEDIA_BASE_URL="https://cdn.example")
+    def test_configured_base_url_wins_over_the_request(self):
+        request = self.factory.get("/", HTTP_HOST="api.example")
+
+        self.assertEqual(media_base_url(request), "https://cdn.example")
+        self.assertEqual(media_base_url(), "https://cdn.example")
+        self.assertEqual(
+            variant_urls(self.variants)["webp"]["thumb"],
+            "https://cdn.example/media/food_images/dish.thumb.abc.webp",
+        )
+
+    def test_missing_files_and_variants_render_as_none(self):
+        request = self.factory.get("/")
+
+        self.assertIsNone(absolute_media_url(None, request))
+        self.assertIsNone(variant_urls({}, request))
+
+    def test_without_a_request_or_base_url_urls_stay_relative(self):
+        file = mock.Mock(url="/media/food_images/dish.png")
+
+        self.assertEqual(absolute_media_url(file), "/media/food_images/dish.png")
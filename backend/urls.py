@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
-from django.views.static import serve
+from backend.media import serve_media
 from django.views.generic import TemplateView  # For health check
 
 # Spectacular imports
@@ -37,7 +37,7 @@ urlpatterns = [
         name="swagger-ui",
     ),
     # Media serving in production (Render)
-    re_path(r"^media/(?P<path>.*)$", serve, {"document_root": settings.MEDIA_ROOT}),
+    re_path(r"^media/(?P<path>.*)$", serve_media, name="media"),
 ]
 
 # Only serve static files using Django in development
@@ -0,0 +1,32 @@
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authtoken.models import Token
+
+
+@database_sync_to_async
+def get_token_user(key):
+    token = Token.objects.select_related("user").filter(key=key).first()
+    return token.user if token else AnonymousUser()
+
+
+class TokenAuthMiddleware:
+    """
+    Authenticates WebSocket clients by the same DRF token the REST API uses,
+    passed as ?token=; falls back to the session user otherwise.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get("query_string", b"").decode())
+        if query.get("token"):
+            scope = dict(scope, user=await get_token_user(query["token"][0]))
+        return await self.inner(scope, receive, send)
+
+
+def TokenAuthMiddlewareStack(inner):
+    return AuthMiddlewareStack(TokenAuthMiddleware(inner))
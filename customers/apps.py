@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CustomersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'customers'
+
+    def ready(self):
+        from backend.images import register_image_field
+
+        register_image_field(self.get_model('Customer'), 'photo')
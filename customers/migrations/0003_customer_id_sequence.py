@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 15:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE SEQUENCE customers_customer_ids MINVALUE 0 MAXVALUE 99999999 START 0 NO CYCLE",
+            "DROP SEQUENCE customers_customer_ids",
+        ),
+    ]
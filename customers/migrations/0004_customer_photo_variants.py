@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_id_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -2,14 +2,13 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings
 
+from backend.ids import IdSequence
 
-import random
-import string
+# Two digits wider than the legacy user_###### IDs, so the two never collide
+CUSTOMER_IDS = IdSequence('customers_customer_ids', 'user_', 8, obfuscate=True)
 
 def generate_customer_id():
-    prefix = 'user_'
-    suffix = ''.join(random.choices(string.digits, k=6))
-    return f'{prefix}{suffix}'
+    return CUSTOMER_IDS.next()
 
 class Customer(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='customers')
@@ -21,13 +20,10 @@ class Customer(models.Model):
     gender = models.CharField(max_length=10)
     location = models.TextField()
     photo = models.ImageField(upload_to='customer_photos/', blank=True, null=True)
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
         if not self.customer_id:
-            while True:
-                new_id = generate_customer_id()
-                if not Customer.objects.filter(customer_id=new_id).exists():
-                    self.customer_id = new_id
-                    break
+            self.customer_id = generate_customer_id()
         super().save(*args, **kwargs)
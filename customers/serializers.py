@@ -1,16 +1,24 @@
 import os
 from rest_framework import serializers
+from backend.media import (
+    MediaImageField,
+    MediaModelSerializer,
+    MediaVariantsField,
+    absolute_media_url,
+)
 from .models import Customer
 
-class CustomerSerializer(serializers.ModelSerializer):
-    photo = serializers.ImageField(required=False)
+class CustomerSerializer(MediaModelSerializer):
+    photo = MediaImageField(required=False)
     photo_url = serializers.SerializerMethodField()
+    photo_srcset = MediaVariantsField(source='photo_variants')
 
     class Meta:
         model = Customer
         fields = [
             'id', 'customer_id', 'name', 'email', 'phone',
-            'is_student', 'gender', 'location', 'photo', 'photo_url', 'created_at'
+            'is_student', 'gender', 'location', 'photo', 'photo_url', 'photo_srcset',
+            'created_at'
         ]
         read_only_fields = ['customer_id', 'created_at', 'photo_url']
         extra_kwargs = {
@@ -32,10 +40,4 @@ class CustomerSerializer(serializers.ModelSerializer):
         return customer
 
     def get_photo_url(self, obj):
-        if obj.photo:
-            request = self.context.get('request')
-            if request is not None:
-                return request.build_absolute_uri(obj.photo.url)
-            # Fallback if no request in context (shouldn't happen in normal API usage)
-            return obj.photo.url
-        return None
\ No newline at end of file
+        return absolute_media_url(obj.photo, self.context.get('request'))
\ No newline at end of file
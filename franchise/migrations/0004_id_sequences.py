@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-18 15:02
+
+from django.db import migrations
+
+
+def continue_from_existing_ids(apps, schema_editor):
+    # The old generators numbered IDs sequentially; pick up after the highest
+    for model, field, prefix, sequence in [
+        ("Franchise", "franchise_id", "BF", "franchise_franchise_ids"),
+        ("Branch", "branch_id", "BFb", "franchise_branch_ids"),
+    ]:
+        numbers = [
+            int(value[len(prefix):])
+            for value in apps.get_model("franchise", model)
+            .objects.values_list(field, flat=True)
+            .iterator()
+            if value[len(prefix):].isdigit()
+        ]
+        if numbers:
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute("SELECT setval(%s, %s)", [sequence, max(numbers)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('franchise', '0003_branch_created_by_franchise_created_by'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE SEQUENCE franchise_franchise_ids MINVALUE 1 MAXVALUE 99999999 NO CYCLE",
+            "DROP SEQUENCE franchise_franchise_ids",
+        ),
+        migrations.RunSQL(
+            "CREATE SEQUENCE franchise_branch_ids MINVALUE 1 MAXVALUE 9999999 NO CYCLE",
+            "DROP SEQUENCE franchise_branch_ids",
+        ),
+        migrations.RunPython(continue_from_existing_ids, migrations.RunPython.noop),
+    ]
@@ -1,19 +1,21 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from backend.ids import IdSequence
+
 User = get_user_model()
 
+# Sequential like before; the sequences continue from the highest existing ID
+FRANCHISE_IDS = IdSequence("franchise_franchise_ids", "BF", 4)
+BRANCH_IDS = IdSequence("franchise_branch_ids", "BFb", 4)
+
 
 def generate_franchise_id():
-    last_id = Franchise.objects.all().order_by("id").last()
-    number = int(last_id.franchise_id[2:]) + 1 if last_id else 1
-    return f"BF{number:04d}"
+    return FRANCHISE_IDS.next()
 
 
 def generate_branch_id():
-    last_id = Branch.objects.all().order_by("id").last()
-    number = int(last_id.branch_id[3:]) + 1 if last_id else 1
-    return f"BFb{number:04d}"
+    return BRANCH_IDS.next()
 
 
 class Representative(models.Model):
@@ -1,14 +1,15 @@
 from rest_framework import serializers
+from backend.media import MediaModelSerializer
 from .models import Franchise, Branch, Representative
 
 
-class RepresentativeSerializer(serializers.ModelSerializer):
+class RepresentativeSerializer(MediaModelSerializer):
     class Meta:
         model = Representative
         fields = "__all__"
 
 
-class FranchiseSerializer(serializers.ModelSerializer):
+class FranchiseSerializer(MediaModelSerializer):
     owner = RepresentativeSerializer()
     franchise_id = serializers.CharField(read_only=True)
 
@@ -37,7 +38,7 @@ class FranchiseSerializer(serializers.ModelSerializer):
         return instance
 
 
-class BranchSerializer(serializers.ModelSerializer):
+class BranchSerializer(MediaModelSerializer):
     representative = RepresentativeSerializer()
     branch_id = serializers.CharField(read_only=True)
 
@@ -5,6 +5,7 @@ from .views import (
     BranchListCreateView,
     BranchRetrieveUpdateDestroyView
 )
+from orders.views import OrderReportView
 
 urlpatterns = [
     # Franchise endpoints
@@ -14,4 +15,5 @@ urlpatterns = [
     # Branch endpoints under a franchise
     path("<str:franchise_id>/branches/", BranchListCreateView.as_view(), name="branch-list-create"),
     path("<str:franchise_id>/branches/<str:branch_id>/", BranchRetrieveUpdateDestroyView.as_view(), name="branch-detail"),
+    path("<str:franchise_id>/branches/<str:branch_id>/reports/orders/", OrderReportView.as_view(), name="branch-order-report"),
 ]
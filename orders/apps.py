@@ -5,5 +5,5 @@ class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
 
-def ready(self):
-    import orders.signals
+    def ready(self):
+        import orders.signals  # noqa: F401
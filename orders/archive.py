@@ -0,0 +1,122 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from .models import ArchivedOrder, Item, Order, OrderEvent
+
+ARCHIVED_STATUS = "Delivered"
+GEOMETRY_FIELDS = ("pickup_location", "dropoff_location", "current_location")
+# Every model with a foreign key to Order; archive_batch folds these rows
+# into the archived document and deletes them itself
+ARCHIVED_RELATIONS = {Item: "order", OrderEvent: "order"}
+
+
+def geometry(point):
+    return point and {"lat": point.y, "lng": point.x}
+
+
+def archived_document(order, items, events):
+    data = {
+        name: value
+        for name, value in order.items()
+        if name not in GEOMETRY_FIELDS and name != "order_id"
+    }
+    for name in GEOMETRY_FIELDS:
+        data[name] = geometry(order[name])
+    data["items"] = items
+    data["events"] = [
+        {**event, "location": geometry(event["location"])} for event in events
+    ]
+    return data
+
+
+def check_relations():
+    related = {rel.related_model for rel in Order._meta.related_objects}
+    unhandled = related - set(ARCHIVED_RELATIONS)
+    if unhandled:
+        names = ", ".join(sorted(model.__name__ for model in unhandled))
+        raise RuntimeError(f"archive_orders does not handle rows of {names}.")
+
+
+def delete_rows(model, field_name, values):
+    """
+    Plain DELETE ... WHERE <column> = ANY(values): no delete signals and no
+    cascade collection. Signals must not run because archived orders still
+    count in the reporting rollups and must not be broadcast as deleted.
+    No cascades are needed because check_relations() guarantees every row
+    referencing the orders is in ARCHIVED_RELATIONS, deleted first.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    column = quote(model._meta.get_field(field_name).column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} = ANY(%s)", [values])
+
+
+def archive_batch(before, batch_size):
+    """Move one batch of old delivered orders; returns how many were moved."""
+    with transaction.atomic():
+        orders = list(
+            Order.objects.filter(status=ARCHIVED_STATUS, date_ordered__lt=before)
+            .order_by("date_ordered", "order_id")
+            .select_for_update(skip_locked=True)
+            .values()[:batch_size]
+        )
+        if not orders:
+            return 0
+        order_ids = [order["order_id"] for order in orders]
+
+        items = defaultdict(list)
+        for item in (
+            Item.objects.filter(order_id__in=order_ids)
+            .order_by("pk")
+            .values("order_id", "food_id", "quantity", "unit_price", "total_price")
+        ):
+            items[item.pop("order_id")].append(item)
+        events = defaultdict(list)
+        for event in (
+            OrderEvent.objects.filter(order_id__in=order_ids)
+            .order_by("ts", "pk")
+            .values(
+                "order_id", "from_status", "to_status", "actor_id", "ts", "location"
+            )
+        ):
+            events[event.pop("order_id")].append(event)
+
+        ArchivedOrder.objects.bulk_create(
+            [
+                ArchivedOrder(
+                    order_id=order["order_id"],
+                    restaurant_id=order["restaurant_id"],
+                    branch_id=order["branch_id"],
+                    date_ordered=order["date_ordered"],
+                    status=order["status"],
+                    payment_method=order["payment_method"],
+                    total=order["total"],
+                    data=archived_document(
+                        order, items[order["order_id"]], events[order["order_id"]]
+                    ),
+                )
+                for order in orders
+            ]
+        )
+        for model, field_name in ARCHIVED_RELATIONS.items():
+            delete_rows(model, field_name, order_ids)
+        delete_rows(Order, "order_id", order_ids)
+    return len(orders)
+
+
+def archive_orders(before, batch_size=500):
+    """
+    Move delivered orders dated before `before`, with their items and status
+    history, from the live tables into ArchivedOrder, one short transaction
+    per batch. Rows locked by concurrent writers are skipped and picked up
+    by the next run.
+    """
+    check_relations()
+    archived = 0
+    while True:
+        moved = archive_batch(before, batch_size)
+        if not moved:
+            return archived
+        archived += moved
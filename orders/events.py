@@ -0,0 +1,122 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .serilalizers import OrderSerializer, order_queryset
+
+_state = Local()
+
+
+def order_groups(order):
+    groups = [f"order_{order.order_id}"]
+    if order.restaurant_id:
+        groups.append(f"restaurant_{order.restaurant_id}")
+    return groups
+
+
+def merge_action(previous, action):
+    # create + update is still a create; a delete supersedes everything
+    if previous == "create" and action == "update":
+        return "create"
+    return action
+
+
+class OrderEventBus:
+    """
+    Single path for order change broadcasts.
+
+    Events are queued with transaction.on_commit, so rolled-back writes never
+    broadcast. Inside batch() (one per HTTP request, see
+    OrderEventBatchMiddleware) committed events are coalesced per order and
+    sent when the batch closes; each order is serialized once and sent once
+    to each of its groups.
+    """
+
+    def publish(self, order, action):
+        # Deleted orders lose their pk, so capture groups and payload now
+        data = self.serialize(order) if action == "delete" else None
+        event = (order.order_id, order_groups(order), order, action, data)
+        transaction.on_commit(lambda: self.committed(*event))
+
+    def committed(self, order_id, groups, order, action, data):
+        pending = getattr(_state, "pending", None)
+        if pending is None:
+            self.send({order_id: (groups, order, action, data)})
+            return
+        previous = pending.get(order_id)
+        if previous:
+            action = merge_action(previous[2], action)
+        pending[order_id] = (groups, order, action, data)
+
+    @contextmanager
+    def batch(self):
+        outer = getattr(_state, "pending", None)
+        if outer is not None:
+            # Nested batches fold into the outermost one
+            yield
+            return
+        _state.pending = {}
+        try:
+            yield
+        finally:
+            pending, _state.pending = _state.pending, None
+            self.send(pending)
+
+    def publish_bulk(self, orders, action):
+        """
+        Broadcast many changed orders once committed: the usual message to
+        each order's own group, and a single {"action": "bulk_<action>",
+        "orders": [...]} message to each restaurant group instead of one per
+        order. The orders are re-read and serialized in one query.
+        """
+        order_ids = [order.pk for order in orders]
+        transaction.on_commit(lambda: self.send_bulk(order_ids, action))
+
+    def send_bulk(self, order_ids, action):
+        orders = list(order_queryset().filter(pk__in=order_ids))
+        channel_layer = get_channel_layer()
+        combined = defaultdict(list)
+        for order, data in zip(orders, OrderSerializer(orders, many=True).data):
+            order_group, *other_groups = order_groups(order)
+            async_to_sync(channel_layer.group_send)(
+                order_group,
+                {
+                    "type": "send_order_update",
+                    "data": {"action": action, "order": data},
+                },
+            )
+            for group in other_groups:
+                combined[group].append(data)
+        for group, data in combined.items():
+            async_to_sync(channel_layer.group_send)(
+                group,
+                {
+                    "type": "send_order_update",
+                    "data": {"action": f"bulk_{action}", "orders": data},
+                },
+            )
+
+    def serialize(self, order):
+        return OrderSerializer(order).data
+
+    def send(self, events):
+        if not events:
+            return
+        channel_layer = get_channel_layer()
+        for groups, order, action, data in events.values():
+            message = {
+                "type": "send_order_update",
+                "data": {
+                    "action": action,
+                    "order": data if data is not None else self.serialize(order),
+                },
+            }
+            for group in groups:
+                async_to_sync(channel_layer.group_send)(group, message)
+
+
+order_events = OrderEventBus()
@@ -0,0 +1,139 @@
+import csv
+import json
+from datetime import date
+from itertools import groupby, islice
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import Item
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BATCH_LINES = 500
+
+ORDER_FIELDS = [
+    "order_id",
+    "date_ordered",
+    "date_delivered",
+    "status",
+    "payment_method",
+    "payment_status",
+    "delivery_fee",
+    "platform_fee",
+    "tax",
+    "total",
+]
+ORDER_CODES = {
+    "restaurant_code": F("restaurant_id"),
+    "branch_code": F("branch__branch_id"),
+    "rider_code": F("rider__rider_code"),
+    "customer_code": F("customer__customer_id"),
+}
+ITEM_FIELDS = ["food_id", "quantity", "unit_price", "total_price"]
+ITEM_CODES = {"food_name": F("food__name")}
+# Merge key only; not exported
+ITEM_ORDER = {"order_date": F("order__date_ordered")}
+
+ORDER_COLUMNS = [*ORDER_FIELDS, *ORDER_CODES]
+ITEM_COLUMNS = [*ITEM_FIELDS, *ITEM_CODES]
+
+
+def merge_key(date_ordered, order_id):
+    # Both queries sort ascending, where Postgres puts NULL dates last
+    return (date_ordered is None, date_ordered or date.min, order_id)
+
+
+def export_rows(orders):
+    """
+    Yield (order, [items]) for every order, as flat values() dicts.
+
+    Orders and their items are read through two server-side cursors in the
+    same order and merged, so memory use does not grow with the export.
+    The cursors are separate statements with their own snapshots: item
+    groups whose order is gone by the time the orders cursor reaches it
+    (deleted or archived in between) are skipped, not matched to the next
+    order.
+    """
+    orders = orders.order_by("date_ordered", "order_id")
+    items = (
+        Item.objects.filter(order__in=orders.values("pk"))
+        .order_by("order__date_ordered", "order_id", "pk")
+        .values("order_id", *ITEM_FIELDS, **ITEM_CODES, **ITEM_ORDER)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    item_groups = groupby(
+        items, key=lambda item: merge_key(item["order_date"], item["order_id"])
+    )
+    next_group = next(item_groups, None)
+
+    for order in orders.values(*ORDER_FIELDS, **ORDER_CODES).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ):
+        key = merge_key(order["date_ordered"], order["order_id"])
+        while next_group and next_group[0] < key:
+            next_group = next(item_groups, None)
+        order_items = []
+        if next_group and next_group[0] == key:
+            order_items = list(next_group[1])
+            next_group = next(item_groups, None)
+        yield order, order_items
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(orders):
+    """One line per order item; orders without items get one empty-item line."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(ORDER_COLUMNS + ITEM_COLUMNS)
+    empty_item = [""] * len(ITEM_COLUMNS)
+    for order, items in export_rows(orders):
+        order_values = [order[column] for column in ORDER_COLUMNS]
+        if not items:
+            yield writer.writerow(order_values + empty_item)
+        for item in items:
+            yield writer.writerow(
+                order_values + [item[column] for column in ITEM_COLUMNS]
+            )
+
+
+def export_ndjson(orders):
+    """One JSON object per order, with its items nested."""
+    for order, items in export_rows(orders):
+        order["items"] = [
+            {column: item[column] for column in ITEM_COLUMNS} for item in items
+        ]
+        yield json.dumps(order, cls=DjangoJSONEncoder) + "\n"
+
+
+async def stream_batches(lines, batch_size=EXPORT_BATCH_LINES):
+    """
+    Re-yield a line generator as an async iterator, `batch_size` lines per
+    chunk. Under ASGI Django buffers sync iterators whole before sending
+    them (StreamingHttpResponse.__aiter__), which would hold the entire
+    export in memory; here only one batch is pulled at a time.
+    """
+    # Thread-sensitive, so every pull runs on the connection whose
+    # server-side cursors the generator holds open
+    pull = sync_to_async(lambda: "".join(islice(lines, batch_size)))
+    try:
+        while True:
+            chunk = await pull()
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        # Closes the cursors when the client disconnects mid-export
+        await sync_to_async(lines.close)()
+
+
+EXPORT_FORMATS = {
+    "csv": (export_csv, "text/csv"),
+    "ndjson": (export_ndjson, "application/x-ndjson"),
+}
@@ -0,0 +1,120 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still being processed."
+    default_code = "idempotency_key_in_use"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = "idempotency_key_reused"
+
+
+class FingerprintEncoder(DjangoJSONEncoder):
+    """Uploads stand in as their name and size; their bytes are not hashed."""
+
+    def default(self, o):
+        if isinstance(o, UploadedFile):
+            return {"name": o.name, "size": o.size}
+        return super().default(o)
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, cls=FingerprintEncoder)
+    payload = f"{request.method} {request.path}\n{body}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotentMixin:
+    """
+    Honour an Idempotency-Key header on create and update.
+
+    The first request claims the key; the unique (user, key) constraint
+    makes concurrent duplicates fail to claim it and get a 409. Once the
+    first request succeeds, retries within IDEMPOTENCY_KEY_TTL_SECONDS get
+    its stored response back without running the view again. Failed
+    requests release the key so they can be retried, and a claim left
+    behind by a worker that died mid-request lapses after
+    IDEMPOTENCY_KEY_LEASE_SECONDS.
+    """
+
+    def create(self, request, *args, **kwargs):
+        return self.idempotent(request, super().create, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        return self.idempotent(request, super().update, *args, **kwargs)
+
+    def idempotent(self, request, handler, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return handler(request, *args, **kwargs)
+
+        fingerprint = request_fingerprint(request)
+        record = self.claim(request.user, key, fingerprint)
+        if record.status_code is not None:
+            response = Response(record.response, status=record.status_code)
+            response[f"{IDEMPOTENCY_HEADER}-Replayed"] = "true"
+            return response
+
+        try:
+            with transaction.atomic():
+                response = handler(request, *args, **kwargs)
+                stored = IdempotencyKey.objects.filter(pk=record.pk).update(
+                    status_code=response.status_code, response=response.data
+                )
+                if not stored:
+                    # The lease ran out and a retry took the key over; roll
+                    # this run back so the request only takes effect once
+                    raise IdempotencyKeyInUse()
+        except Exception:
+            record.delete()
+            raise
+        return response
+
+    def claim(self, user, key, fingerprint):
+        """Insert the key, or return the existing record for a replay."""
+        if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            raise ValidationError({IDEMPOTENCY_HEADER: "Key is too long."})
+        now = timezone.now()
+        lapsed = now - timedelta(seconds=settings.IDEMPOTENCY_KEY_LEASE_SECONDS)
+        IdempotencyKey.objects.filter(
+            Q(expires_at__lte=now) | Q(status_code=None, claimed_at__lte=lapsed),
+            user=user,
+            key=key,
+        ).delete()
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    fingerprint=fingerprint,
+                    claimed_at=now,
+                    expires_at=now
+                    + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+                )
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None or record.status_code is None:
+            raise IdempotencyKeyInUse()
+        if record.fingerprint != fingerprint:
+            raise IdempotencyKeyReused()
+        return record
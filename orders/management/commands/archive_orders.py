@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = "Move old delivered orders out of the live order tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help="Archive delivered orders dated more than this many days ago.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Orders moved per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.localdate() - timedelta(days=options["days"])
+        archived = archive_orders(before, batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {archived} orders dated before {before}")
+        )
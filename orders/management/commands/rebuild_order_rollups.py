@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import ArchivedOrder, Order, OrderDailyRollup
+from orders.reporting import rebuild_order_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily order reporting rollups from the order history."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-days",
+            type=int,
+            default=31,
+            help="Days of orders aggregated per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_order_rollups(
+            OrderDailyRollup,
+            Order,
+            ArchivedOrder,
+            chunk_days=options["chunk_days"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} order rollup rows"))
@@ -0,0 +1,12 @@
+from .events import order_events
+
+
+class OrderEventBatchMiddleware:
+    """Coalesce the order broadcasts of one request (see orders.events)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with order_events.batch():
+            return self.get_response(request)
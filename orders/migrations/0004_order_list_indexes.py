@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_id_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['restaurant', '-date_ordered', '-order_id'], name='order_restaurant_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['rider', '-date_ordered', '-order_id'], name='order_rider_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-date_ordered', '-order_id'], name='order_date_idx'),
+        ),
+    ]
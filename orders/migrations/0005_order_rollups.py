@@ -0,0 +1,68 @@
+# Generated by Django 4.2 on 2026-10-18 13:24
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def backfill_order_rollups(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderDailyRollup = apps.get_model("orders", "OrderDailyRollup")
+    rows = (
+        Order.objects.filter(date_ordered__isnull=False)
+        .values("date_ordered", "restaurant_id", "branch_id", "status", "payment_method")
+        .annotate(orders=Count("pk"), revenue=Coalesce(Sum("total"), Decimal(0)))
+        .order_by()
+    )
+    OrderDailyRollup.objects.bulk_create(
+        (
+            OrderDailyRollup(
+                day=row["date_ordered"],
+                restaurant_id=row["restaurant_id"],
+                branch_id=row["branch_id"],
+                status=row["status"],
+                payment_method=row["payment_method"],
+                orders=row["orders"],
+                revenue=row["revenue"],
+            )
+            for row in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0011_rider_last_location'),
+        ('franchise', '0004_id_sequences'),
+        ('orders', '0004_order_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=30)),
+                ('payment_method', models.CharField(max_length=100)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('branch', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='franchise.branch')),
+                ('restaurant', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurants.restaurant')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='orderdailyrollup',
+            index=models.Index(fields=['restaurant', 'day'], name='order_rollup_restaurant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderdailyrollup',
+            index=models.Index(fields=['branch', 'day'], name='order_rollup_branch_idx'),
+        ),
+        migrations.RunPython(backfill_order_rollups, migrations.RunPython.noop),
+    ]
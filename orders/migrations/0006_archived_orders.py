@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 13:27
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('franchise', '0004_id_sequences'),
+        ('restaurants', '0011_rider_last_location'),
+        ('orders', '0005_order_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('order_id', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('date_ordered', models.DateField()),
+                ('status', models.CharField(max_length=30)),
+                ('payment_method', models.CharField(max_length=100)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('branch', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='franchise.branch')),
+                ('restaurant', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurants.restaurant')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['restaurant', 'date_ordered'], name='archived_order_restaurant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['branch', 'date_ordered'], name='archived_order_branch_idx'),
+        ),
+    ]
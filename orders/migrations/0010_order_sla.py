@@ -0,0 +1,67 @@
+# Generated by Django 4.2 on 2026-10-18 13:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0011_rider_last_location'),
+        ('orders', '0009_order_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='accepted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        # Existing orders have no known placement time; only new ones get the default
+        migrations.AddField(
+            model_name='order',
+            name='placed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='placed_at',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='preparing_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='OrderSlaSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('time_to_accept', 'Time to accept'), ('prep_time', 'Preparation time'), ('delivery_time', 'Delivery time')], max_length=20)),
+                ('hour', models.DateTimeField()),
+                ('bins', models.JSONField(default=dict)),
+                ('zero_count', models.PositiveIntegerField(default=0)),
+                ('restaurant', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurants.restaurant')),
+                ('rider', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurants.rider')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='orderslasketch',
+            constraint=models.UniqueConstraint(condition=models.Q(('rider__isnull', True)), fields=('restaurant', 'metric', 'hour'), name='sla_sketch_restaurant_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderslasketch',
+            constraint=models.UniqueConstraint(condition=models.Q(('restaurant__isnull', True)), fields=('rider', 'metric', 'hour'), name='sla_sketch_rider_unique'),
+        ),
+    ]
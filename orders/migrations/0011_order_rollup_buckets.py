@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_sla'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='orderdailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('branch__isnull', True)), fields=('restaurant', 'day', 'status', 'payment_method'), name='order_rollup_restaurant_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderdailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('restaurant__isnull', True)), fields=('branch', 'day', 'status', 'payment_method'), name='order_rollup_branch_bucket'),
+        ),
+    ]
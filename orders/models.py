@@ -1,9 +1,12 @@
 from django.contrib.gis.db import models as gis_models
-from django.db import models
-import random
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models.signals import post_save
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.forms import ValidationError
+from django.utils import timezone
+from backend.ids import IdSequence
 from restaurants.models import Food, Restaurant, Rider
 from franchise.models import Branch
 from customers.models import Customer
@@ -11,11 +14,38 @@ from customers.models import Customer
 User = get_user_model()
 
 
+# One digit wider than the legacy BO####### IDs, so the two never collide
+ORDER_IDS = IdSequence("orders_order_ids", "BO", 8, obfuscate=True)
+
+
 def generate_unique_id():
-    while True:
-        new_id = f"BO{random.randint(1000000, 9999999)}"
-        if not Order.objects.filter(order_id=new_id).exists():
-            return new_id
+    return ORDER_IDS.next()
+
+
+ORDER_STATUS_FLOW = [
+    "Placed",
+    "Pending",
+    "Accepted",
+    "Being Prepared",
+    "On the way",
+    "Delivered",
+]
+ORDER_TRANSITIONS = {
+    status: {following}
+    for status, following in zip(ORDER_STATUS_FLOW, ORDER_STATUS_FLOW[1:])
+}
+# Lifecycle timestamp stamped when an order reaches each status
+ORDER_STATUS_TIMESTAMPS = {
+    "Placed": "placed_at",
+    "Accepted": "accepted_at",
+    "Being Prepared": "preparing_at",
+    "On the way": "dispatched_at",
+    "Delivered": "delivered_at",
+}
+
+
+class OrderConflict(Exception):
+    """The order's status changed since it was read."""
 
 
 class Order(models.Model):
@@ -84,11 +114,136 @@ class Order(models.Model):
     platform_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Bumped by every save() of an existing row and by transition(); their
+    # optimistic lock
+    version = models.PositiveIntegerField(default=0)
+
+    # Lifecycle timestamps, see ORDER_STATUS_TIMESTAMPS
+    placed_at = models.DateTimeField(null=True, blank=True, default=timezone.now)
+    accepted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    preparing_at = models.DateTimeField(null=True, blank=True, editable=False)
+    dispatched_at = models.DateTimeField(null=True, blank=True, editable=False)
+    delivered_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        # Back the order lists: newest first, per restaurant / rider / overall
+        indexes = [
+            models.Index(
+                fields=["restaurant", "-date_ordered", "-order_id"],
+                name="order_restaurant_date_idx",
+            ),
+            models.Index(
+                fields=["rider", "-date_ordered", "-order_id"],
+                name="order_rider_date_idx",
+            ),
+            models.Index(fields=["-date_ordered", "-order_id"], name="order_date_idx"),
+        ]
+
+    def rollup_bucket(self):
+        """
+        The OrderDailyRollup bucket (restaurant, branch, day, status, payment
+        method) this order counts in and the revenue it adds there, or None
+        while it is undated or unowned.
+        """
+        if not self.date_ordered or not (self.restaurant_id or self.branch_id):
+            return None
+        key = (
+            self.restaurant_id,
+            self.branch_id,
+            self.date_ordered,
+            self.status,
+            self.payment_method,
+        )
+        return key, self.total
+
+    def save(self, *args, **kwargs):
+        """
+        Saves of an existing row bump the version, guarded like transition():
+        the bump only matches while the row is still at the version this
+        instance read, otherwise OrderConflict is raised and nothing is
+        written. So a stale instance can never overwrite, or move between
+        rollup buckets, an order changed since it was loaded. The bump's row
+        lock is held until the save.
+        """
+        if self._state.adding or kwargs.get("force_insert"):
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            bumped = Order.objects.filter(pk=self.pk, version=self.version).update(
+                version=self.version + 1
+            )
+            if not bumped:
+                raise OrderConflict(self.pk)
+            self.version += 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+            try:
+                super().save(*args, **kwargs)
+            except Exception:
+                self.version -= 1
+                raise
+
+    def save_changes(self, fields, version=None):
+        """
+        Save `fields`, guarded by `version` (default: the one this instance
+        read) when the caller read it earlier; see save().
+        """
+        if version is not None:
+            self.version = version
+        self.save(update_fields=fields)
+
+    def can_transition(self, status):
+        return status in ORDER_TRANSITIONS.get(self.status, ())
+
+    def transition(self, status, version=None, actor=None, location=None):
+        """
+        Move to `status` with one conditional UPDATE that only matches while
+        the row still has the status and version this instance read (or
+        `version`, when the caller read it earlier). Takes no row lock; a
+        concurrent transition makes it raise OrderConflict instead. The
+        OrderEvent is written in the same transaction.
+        """
+        if not self.can_transition(status):
+            raise ValueError(f"Cannot move an order from {self.status} to {status}.")
+        version = self.version if version is None else version
+        stamps = {}
+        if status in ORDER_STATUS_TIMESTAMPS:
+            stamps[ORDER_STATUS_TIMESTAMPS[status]] = timezone.now()
+        with transaction.atomic():
+            updated = Order.objects.filter(
+                pk=self.pk, status=self.status, version=version
+            ).update(status=status, version=version + 1, **stamps)
+            if not updated:
+                raise OrderConflict(self.pk)
+            OrderEvent.objects.create(
+                order=self,
+                from_status=self.status,
+                to_status=status,
+                actor=actor,
+                location=location,
+            )
+            # The matched version guarantees the row held these values
+            self._previous_rollup = self.rollup_bucket()
+            self.status, self.version = status, version + 1
+            for name, value in stamps.items():
+                setattr(self, name, value)
+            # update() skips signals; order events and rollups still need to
+            # run, the rollup deltas inside this transaction
+            post_save.send(
+                sender=Order,
+                instance=self,
+                created=False,
+                update_fields=frozenset({"status", "version", *stamps}),
+                raw=False,
+                using=self._state.db,
+            )
+
+    def compute_total(self, items_total):
+        return items_total + self.delivery_fee + self.platform_fee + self.tax
 
     def calculate_totals(self):
-        items_total = sum([item.total_price for item in self.items.all()])
-        self.total = items_total + self.delivery_fee + self.platform_fee + self.tax
-        self.save()
+        items_total = self.items.aggregate(total=models.Sum("total_price"))["total"]
+        self.total = self.compute_total(items_total or 0)
+        self.save_changes(["total"])
 
     def clean(self):
         if not self.restaurant and not self.branch:
@@ -109,9 +264,173 @@ class Item(models.Model):
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)  # price snapshot
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
 
-    def save(self, *args, **kwargs):
+    def compute_total_price(self):
         self.total_price = self.quantity * self.unit_price
+        return self.total_price
+
+    def save(self, *args, **kwargs):
+        self.compute_total_price()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.quantity} x {self.food.name}"
+
+
+class OrderEvent(models.Model):
+    """
+    Append-only history of an order's status: one row when it is placed
+    (from_status empty) and one per transition.
+    """
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="events")
+    from_status = models.CharField(max_length=30, blank=True)
+    to_status = models.CharField(max_length=30)
+    actor = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    ts = models.DateTimeField(default=timezone.now)
+    location = gis_models.PointField(geography=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["order", "ts"], name="order_event_timeline_idx")
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Order events are append-only.")
+        super().save(*args, **kwargs)
+
+
+class ArchivedOrder(models.Model):
+    """
+    A delivered order moved out of the live tables by archive_orders. The
+    columns reports need stay queryable; everything else, items included,
+    is kept in one (TOAST-compressed) JSON document.
+    """
+
+    order_id = models.CharField(primary_key=True, max_length=10)
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    date_ordered = models.DateField()
+    status = models.CharField(max_length=30)
+    payment_method = models.CharField(max_length=100)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["restaurant", "date_ordered"],
+                name="archived_order_restaurant_idx",
+            ),
+            models.Index(
+                fields=["branch", "date_ordered"], name="archived_order_branch_idx"
+            ),
+        ]
+
+
+class OrderDailyRollup(models.Model):
+    """
+    Order count and revenue per restaurant or branch, day, status and payment
+    method. Maintained by orders.reporting; reports read only this table.
+    """
+
+    day = models.DateField()
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    branch = models.ForeignKey(
+        Branch, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    status = models.CharField(max_length=30)
+    payment_method = models.CharField(max_length=100)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["restaurant", "day"], name="order_rollup_restaurant_idx"),
+            models.Index(fields=["branch", "day"], name="order_rollup_branch_idx"),
+        ]
+        # One row per bucket, so concurrent first orders cannot both insert it
+        constraints = [
+            models.UniqueConstraint(
+                fields=["restaurant", "day", "status", "payment_method"],
+                condition=models.Q(branch__isnull=True),
+                name="order_rollup_restaurant_bucket",
+            ),
+            models.UniqueConstraint(
+                fields=["branch", "day", "status", "payment_method"],
+                condition=models.Q(restaurant__isnull=True),
+                name="order_rollup_branch_bucket",
+            ),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client-chosen Idempotency-Key and the response first returned for it.
+    status_code is null while that first request is still being handled;
+    such a claim can be taken over once claimed_at is older than the lease.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    claimed_at = models.DateTimeField(default=timezone.now)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_key_unique"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_key_expiry_idx")
+        ]
+
+
+class OrderSlaSketch(models.Model):
+    """
+    Quantile sketch (backend.sketches.DDSketch) of one lifecycle duration,
+    in seconds, for one hour and either one restaurant or one rider.
+    Hourly rows merge into any longer window without touching orders.
+    """
+
+    METRICS = [
+        ("time_to_accept", "Time to accept"),
+        ("prep_time", "Preparation time"),
+        ("delivery_time", "Delivery time"),
+    ]
+
+    metric = models.CharField(max_length=20, choices=METRICS)
+    hour = models.DateTimeField()
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    rider = models.ForeignKey(Rider, on_delete=models.CASCADE, null=True, related_name="+")
+    bins = models.JSONField(default=dict)
+    zero_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["restaurant", "metric", "hour"],
+                condition=models.Q(rider__isnull=True),
+                name="sla_sketch_restaurant_unique",
+            ),
+            models.UniqueConstraint(
+                fields=["rider", "metric", "hour"],
+                condition=models.Q(restaurant__isnull=True),
+                name="sla_sketch_rider_unique",
+            ),
+        ]
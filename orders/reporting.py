@@ -0,0 +1,145 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import Coalesce
+
+from .models import OrderDailyRollup
+
+
+def rollup_rows(rollup_model, *sources):
+    """
+    Aggregate orders into unsaved rollup rows, one per restaurant or branch,
+    day ordered, status and payment method. Each source is a queryset of
+    live or archived orders; their counts are summed. Undated orders are not
+    reported.
+    """
+    buckets = {}
+    for orders in sources:
+        rows = (
+            orders.filter(date_ordered__isnull=False)
+            .values(
+                "date_ordered", "restaurant_id", "branch_id", "status", "payment_method"
+            )
+            .annotate(orders=Count("pk"), revenue=Coalesce(Sum("total"), Decimal(0)))
+            .order_by()
+        )
+        for row in rows:
+            key = (
+                row["date_ordered"],
+                row["restaurant_id"],
+                row["branch_id"],
+                row["status"],
+                row["payment_method"],
+            )
+            if key in buckets:
+                buckets[key].orders += row["orders"]
+                buckets[key].revenue += row["revenue"]
+                continue
+            buckets[key] = rollup_model(
+                day=row["date_ordered"],
+                restaurant_id=row["restaurant_id"],
+                branch_id=row["branch_id"],
+                status=row["status"],
+                payment_method=row["payment_method"],
+                orders=row["orders"],
+                revenue=row["revenue"],
+            )
+    return list(buckets.values())
+
+
+def apply_rollup_changes(changes):
+    """
+    Fold (before, after) pairs of Order.rollup_bucket() values into the
+    rollup rows as F() deltas, in the caller's transaction: an order that
+    changed bucket is subtracted from the old one and added to the new one,
+    so each write costs one UPDATE per bucket it touches.
+    """
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for before, after in changes:
+        if before == after:
+            continue
+        if before:
+            deltas[before[0]][0] -= 1
+            deltas[before[0]][1] -= before[1]
+        if after:
+            deltas[after[0]][0] += 1
+            deltas[after[0]][1] += after[1]
+    if not deltas:
+        return
+    # Touch buckets in a fixed order so concurrent writers cannot deadlock
+    with transaction.atomic():
+        for key in sorted(deltas, key=lambda key: tuple(map(str, key))):
+            orders, revenue = deltas[key]
+            if orders or revenue:
+                add_to_rollup(key, orders, revenue)
+
+
+def add_to_rollup(key, orders, revenue):
+    restaurant_id, branch_id, day, status, payment_method = key
+    bucket = OrderDailyRollup.objects.filter(
+        restaurant_id=restaurant_id,
+        branch_id=branch_id,
+        day=day,
+        status=status,
+        payment_method=payment_method,
+    )
+    changes = {"orders": F("orders") + orders, "revenue": F("revenue") + revenue}
+    if bucket.update(**changes) or orders <= 0:
+        return
+    try:
+        with transaction.atomic():
+            OrderDailyRollup.objects.create(
+                restaurant_id=restaurant_id,
+                branch_id=branch_id,
+                day=day,
+                status=status,
+                payment_method=payment_method,
+                orders=orders,
+                revenue=revenue,
+            )
+    except IntegrityError:
+        # A concurrent writer created the bucket first
+        bucket.update(**changes)
+
+
+def rebuild_order_rollups(
+    rollup_model, order_model, archive_model=None, chunk_days=31, batch_size=1000
+):
+    """
+    Recompute every rollup row from the live and archived order history,
+    `chunk_days` days at a time so each transaction scans a bounded slice.
+    """
+    models = [order_model] + ([archive_model] if archive_model else [])
+    bounds = [
+        model.objects.aggregate(first=Min("date_ordered"), last=Max("date_ordered"))
+        for model in models
+    ]
+    bounds = [b for b in bounds if b["first"]]
+    if not bounds:
+        rollup_model.objects.all().delete()
+        return 0
+    first = min(b["first"] for b in bounds)
+    last = max(b["last"] for b in bounds)
+    # Rows outside the order history would not be revisited by any chunk
+    rollup_model.objects.exclude(day__range=(first, last)).delete()
+
+    rebuilt = 0
+    start = first
+    while start <= last:
+        end = start + timedelta(days=chunk_days - 1)
+        with transaction.atomic():
+            rollup_model.objects.filter(day__range=(start, end)).delete()
+            rows = rollup_rows(
+                rollup_model,
+                *(
+                    model.objects.filter(date_ordered__range=(start, end))
+                    for model in models
+                ),
+            )
+            rollup_model.objects.bulk_create(rows, batch_size=batch_size)
+        rebuilt += len(rows)
+        start = end + timedelta(days=1)
+    return rebuilt
@@ -1,14 +1,22 @@
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-from rest_framework import serializers
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
 from customers.models import Customer
 from franchise.models import Branch
-from orders.models import Order, Item
-from restaurants.models import Rider, Restaurant
+from orders.models import ORDER_STATUS_FLOW, Order, OrderConflict, OrderEvent, Item
+from restaurants.models import Food, Rider, Restaurant
 from restaurants.serializers import RiderSerializer
 from customers.serializers import CustomerSerializer
 from django.contrib.gis.geos import Point
 
 
+class OrderConflictError(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The order was changed by someone else; reload and retry."
+    default_code = "conflict"
+
+
 class StringLookupRelatedField(serializers.RelatedField):
     """Allows related lookup by a unique string field (like 'customer_id' or 'rider_code')."""
 
@@ -43,10 +51,21 @@ class PointField(serializers.Field):
             raise serializers.ValidationError("Invalid coordinates format.")
 
 
+def order_queryset():
+    # Joins everything OrderSerializer renders (the nested rider with its
+    # restaurant slug, and the customer), so a page costs one query plus
+    # the pagination count whatever its size.
+    return Order.objects.select_related("rider__restaurant", "customer")
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
+    # Plain id; OrderSerializer.validate_items resolves all foods in one query
+    food = serializers.IntegerField()
+
     class Meta:
         model = Item
         fields = ["food", "quantity", "unit_price"]
+        read_only_fields = ["unit_price"]
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -107,11 +126,53 @@ class OrderSerializer(serializers.ModelSerializer):
             "platform_fee",
             "tax",
             "total",
+            "version",
+            "placed_at",
+            "accepted_at",
+            "preparing_at",
+            "dispatched_at",
+            "delivered_at",
             "items",
         ]
-        read_only_fields = ["total", "rider", "customer", "branch", "restaurant"]
+        read_only_fields = [
+            "total",
+            "rider",
+            "customer",
+            "branch",
+            "restaurant",
+            "placed_at",
+        ]
+        extra_kwargs = {"version": {"required": False}}
+
+    def request_user(self):
+        request = self.context.get("request")
+        user = getattr(request, "user", None)
+        return user if user and user.is_authenticated else None
+
+    def validate_status(self, value):
+        order = self.instance
+        if order is None and value != ORDER_STATUS_FLOW[0]:
+            raise serializers.ValidationError(
+                f"New orders start as {ORDER_STATUS_FLOW[0]}."
+            )
+        if order and value != order.status and not order.can_transition(value):
+            raise serializers.ValidationError(
+                f"Cannot move an order from {order.status} to {value}."
+            )
+        return value
+
+    def validate_items(self, items):
+        food_ids = {item["food"] for item in items}
+        foods = Food.objects.only("id", "name", "price").in_bulk(food_ids)
+        missing = sorted(food_ids - foods.keys())
+        if missing:
+            raise serializers.ValidationError(
+                f"Food(s) {', '.join(map(str, missing))} do not exist."
+            )
+        return [{**item, "food": foods[item["food"]]} for item in items]
 
     def create(self, validated_data):
+        validated_data.pop("version", None)
         items_data = validated_data.pop("items", [])
         rider = validated_data.pop("rider_code", None)
         customer = validated_data.pop("customer_code")
@@ -124,16 +185,85 @@ class OrderSerializer(serializers.ModelSerializer):
             if restaurant_id:
                 restaurant = get_object_or_404(Restaurant, restaurant_id=restaurant_id)
 
-        order = Order.objects.create(
+        # Snapshot current prices and total everything before touching the db
+        items = [
+            Item(
+                food=item["food"],
+                quantity=item["quantity"],
+                unit_price=item["food"].price,
+            )
+            for item in items_data
+        ]
+        order = Order(
             rider=rider,
             customer=customer,
             branch=branch,
             restaurant=restaurant,
             **validated_data,
         )
+        order.total = order.compute_total(
+            sum(item.compute_total_price() for item in items)
+        )
 
-        # Create order items
-        for item in items_data:
-            Item.objects.create(order=order, **item)
+        with transaction.atomic():
+            order.save(force_insert=True)
+            for item in items:
+                item.order = order
+            Item.objects.bulk_create(items)
+            OrderEvent.objects.create(
+                order=order,
+                to_status=order.status,
+                actor=self.request_user(),
+                location=order.current_location,
+            )
 
         return order
+
+    def update(self, instance, validated_data):
+        """
+        Every write is guarded by the version the client read (the "version"
+        field, when sent): other fields go through Order.save_changes and
+        status changes through Order.transition, each bumping the version,
+        so concurrent writers get a 409 instead of silently overwriting
+        each other.
+        """
+        status = validated_data.pop("status", instance.status)
+        version = validated_data.pop("version", instance.version)
+        if version != instance.version:
+            raise OrderConflictError()
+
+        model_fields = {field.name for field in Order._meta.concrete_fields}
+        changes = {
+            name: value for name, value in validated_data.items() if name in model_fields
+        }
+        try:
+            with transaction.atomic():
+                if changes:
+                    for name, value in changes.items():
+                        setattr(instance, name, value)
+                    instance.save_changes(list(changes), version)
+                if status != instance.status:
+                    instance.transition(
+                        status,
+                        actor=self.request_user(),
+                        location=changes.get("current_location"),
+                    )
+        except OrderConflict:
+            raise OrderConflictError()
+        return instance
+
+
+class OrderEventSerializer(serializers.ModelSerializer):
+    actor = serializers.SlugRelatedField(slug_field="username", read_only=True)
+    location = PointField(read_only=True)
+
+    class Meta:
+        model = OrderEvent
+        fields = ["from_status", "to_status", "actor", "ts", "location"]
+
+
+class BulkOrderStatusSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.CharField(), allow_empty=False, max_length=200
+    )
+    status = serializers.ChoiceField(choices=ORDER_STATUS_FLOW)
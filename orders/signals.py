@@ -1,63 +1,71 @@
 # orders/signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from .models import Order
-from .serilalizers import OrderSerializer
+from .events import order_events
+from .reporting import apply_rollup_changes
+from .sla import record_sla_on_commit
+
 
 @receiver(post_save, sender=Order)
 def order_saved(sender, instance, created, **kwargs):
-    channel_layer = get_channel_layer()
-
-    # 1. Broadcast to order-specific group
-    async_to_sync(channel_layer.group_send)(
-        f"order_{instance.id}",
-        {
-            "type": "send_order_update",
-            "data": {
-                "event": "created" if created else "updated",
-                **OrderSerializer(instance).data
-            }
-        }
-    )
+    order_events.publish(instance, "create" if created else "update")
 
-    # 2. Broadcast to restaurant dashboard group
-    async_to_sync(channel_layer.group_send)(
-        f"restaurant_{instance.restaurant.id}",
-        {
-            "type": "send_order_update",
-            "data": {
-                "event": "created" if created else "updated",
-                **OrderSerializer(instance).data
-            }
-        }
-    )
 
 @receiver(post_delete, sender=Order)
 def order_deleted(sender, instance, **kwargs):
-    channel_layer = get_channel_layer()
-
-    # Order group
-    async_to_sync(channel_layer.group_send)(
-        f"order_{instance.id}",
-        {
-            "type": "send_order_update",
-            "data": {
-                "event": "deleted",
-                "order_id": instance.id
-            }
-        }
-    )
+    order_events.publish(instance, "delete")
+
+
+# ---------------- REPORTING ----------------
+ROLLUP_FIELDS = {
+    "restaurant",
+    "restaurant_id",
+    "branch",
+    "branch_id",
+    "date_ordered",
+    "status",
+    "payment_method",
+    "total",
+}
+
+
+def affects_rollups(update_fields):
+    return update_fields is None or not ROLLUP_FIELDS.isdisjoint(update_fields)
+
 
-    # Restaurant group
-    async_to_sync(channel_layer.group_send)(
-        f"restaurant_{instance.restaurant.id}",
-        {
-            "type": "send_order_update",
-            "data": {
-                "event": "deleted",
-                "order_id": instance.id
-            }
-        }
+@receiver(pre_save, sender=Order)
+def order_pre_save(sender, instance, update_fields=None, **kwargs):
+    # Remember the stored bucket so the save can move the order out of it
+    instance._previous_rollup = None
+    if instance._state.adding or not affects_rollups(update_fields):
+        return
+    previous = (
+        Order.objects.filter(pk=instance.pk)
+        .only(
+            "restaurant", "branch", "date_ordered", "status", "payment_method", "total"
+        )
+        .first()
     )
+    instance._previous_rollup = previous.rollup_bucket() if previous else None
+
+
+@receiver(post_save, sender=Order)
+def order_saved_rollups(sender, instance, created, update_fields=None, **kwargs):
+    if created or affects_rollups(update_fields):
+        apply_rollup_changes(
+            [(getattr(instance, "_previous_rollup", None), instance.rollup_bucket())]
+        )
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted_rollups(sender, instance, **kwargs):
+    apply_rollup_changes([(instance.rollup_bucket(), None)])
+
+
+# ---------------- SLA ----------------
+@receiver(post_save, sender=Order)
+def order_transitioned_sla(sender, instance, update_fields=None, **kwargs):
+    # Order.transition saves with update_fields; plain edits carry no timing
+    if update_fields and "status" in update_fields:
+        record_sla_on_commit([instance])
@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from backend.sketches import DDSketch
+
+from .models import ORDER_STATUS_TIMESTAMPS, OrderSlaSketch
+
+# Metric -> (start, end) lifecycle timestamps it measures
+SLA_METRICS = {
+    "time_to_accept": ("placed_at", "accepted_at"),
+    "prep_time": ("preparing_at", "dispatched_at"),
+    "delivery_time": ("dispatched_at", "delivered_at"),
+}
+SLA_QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+def sla_samples(order):
+    """(metric, seconds, ended_at) for each duration the order just completed."""
+    ended = ORDER_STATUS_TIMESTAMPS.get(order.status)
+    for metric, (start_field, end_field) in SLA_METRICS.items():
+        if end_field != ended:
+            continue
+        start, end = getattr(order, start_field), getattr(order, end_field)
+        if start and end:
+            yield metric, (end - start).total_seconds(), end
+
+
+def collect_sla_samples(orders):
+    """Durations the orders' latest transitions completed, by sketch row."""
+    samples = defaultdict(list)
+    for order in orders:
+        for metric, seconds, ended_at in sla_samples(order):
+            hour = ended_at.replace(minute=0, second=0, microsecond=0)
+            if order.restaurant_id:
+                key = (metric, hour, order.restaurant_id, None)
+                samples[key].append(seconds)
+            if order.rider_id:
+                samples[(metric, hour, None, order.rider_id)].append(seconds)
+    return samples
+
+
+def save_sla_samples(samples):
+    for (metric, hour, restaurant_id, rider_id), values in samples.items():
+        with transaction.atomic():
+            row, _ = OrderSlaSketch.objects.select_for_update().get_or_create(
+                metric=metric, hour=hour, restaurant_id=restaurant_id, rider_id=rider_id
+            )
+            sketch = DDSketch(row.bins, row.zero_count)
+            for value in values:
+                sketch.add(value)
+            row.bins, row.zero_count = sketch.to_json(), sketch.zero_count
+            row.save(update_fields=["bins", "zero_count"])
+
+
+def record_sla(orders):
+    """
+    Add the durations completed by the orders' latest transitions to the
+    hourly restaurant and rider sketches, one locked update per sketch row.
+    """
+    save_sla_samples(collect_sla_samples(orders))
+
+
+def record_sla_on_commit(orders):
+    # Sample now: the instances may transition again before the commit, and
+    # each transition must only count the duration it completed
+    samples = collect_sla_samples(orders)
+    if samples:
+        transaction.on_commit(lambda: save_sla_samples(samples))
+
+
+def sla_summary(sketch_rows):
+    """Merge (metric, bins, zero_count) rows into count and p50/p90/p99 per metric."""
+    merged = {metric: DDSketch() for metric in SLA_METRICS}
+    for metric, bins, zero_count in sketch_rows:
+        merged[metric].merge(DDSketch(bins, zero_count))
+    summary = {}
+    for metric, sketch in merged.items():
+        summary[metric] = {"count": sketch.count}
+        for name, q in SLA_QUANTILES.items():
+            value = sketch.quantile(q)
+            summary[metric][name] = None if value is None else round(value, 1)
+    return summary
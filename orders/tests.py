@@ -1,3 +1,600 @@
-from django.test import TestCase
+from datetime import timedelta
+from itertools import groupby
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from backend.sketches import DDSketch
+from customers.models import Customer
+from restaurants.models import Food, Restaurant, Rider
+
+from .archive import archive_orders
+from .events import order_events
+from .export import EXPORT_BATCH_LINES, export_rows
+from .models import (
+    ArchivedOrder,
+    IdempotencyKey,
+    Item,
+    Order,
+    OrderConflict,
+    OrderDailyRollup,
+    OrderEvent,
+    OrderSlaSketch,
+)
+from .transitions import bulk_transition
+
+User = get_user_model()
+
+
+class OrderTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="admin", password="pass", role="admin"
+        )
+        self.restaurant = Restaurant.objects.create(user=self.user, phone="000")
+        self.customer = Customer.objects.create(
+            user=self.user, name="Ada", email="ada@example.com", phone="111"
+        )
+        self.rider = Rider.objects.create(
+            restaurant=self.restaurant, full_name="Rider", phone="222"
+        )
+        self.foods = [
+            Food.objects.create(restaurant=self.restaurant, name=name, price=price)
+            for name, price in (("Jollof", 6), ("Suya", 3))
+        ]
+        self.client.force_authenticate(self.user)
+
+    def add_order(self, items=2, **fields):
+        order = Order.objects.create(
+            restaurant=self.restaurant,
+            customer=self.customer,
+            rider=self.rider,
+            **fields,
+        )
+        for index in range(items):
+            Item.objects.create(
+                order=order,
+                food=self.foods[index % len(self.foods)],
+                quantity=1,
+                unit_price=self.foods[index % len(self.foods)].price,
+            )
+        return order
+
+
+class OrderListQueryCountTests(OrderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("restaurant-orders", args=[self.restaurant.restaurant_id])
+
+    def test_order_list_query_count_does_not_grow_with_orders(self):
+        self.add_order()
+        # Page COUNT + one SELECT joining rider, its restaurant and customer
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, secure=True)
+        self.assertEqual(response.data["count"], 1)
+
+        for _ in range(9):
+            self.add_order(items=3)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, secure=True)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(
+            response.data["results"][0]["rider"]["restaurant"],
+            self.restaurant.restaurant_id,
+        )
+
+
+class OrderCreateQueryCountTests(OrderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("restaurant-orders", args=[self.restaurant.restaurant_id])
+
+    def create(self, items):
+        return self.client.post(
+            self.url,
+            {
+                "customer_code": self.customer.customer_id,
+                "restaurant_code": self.restaurant.restaurant_id,
+                "delivery_fee": "2.00",
+                "items": [
+                    {"food": self.foods[index % 2].pk, "quantity": 2}
+                    for index in range(items)
+                ],
+            },
+            format="json",
+            secure=True,
+        )
+
+    def test_order_create_query_count_does_not_grow_with_items(self):
+        # Customer, restaurant and foods lookups, the ID nextval, then inside
+        # the savepoint: order INSERT, restaurant touch, one bulk item INSERT
+        # and the placed event
+        with self.assertNumQueries(10):
+            response = self.create(items=1)
+        self.assertEqual(response.status_code, 201)
+
+        with self.assertNumQueries(10):
+            response = self.create(items=20)
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data["order_id"])
+        self.assertEqual(order.items.count(), 20)
+        self.assertEqual(str(order.total), "182.00")
+
+
+class OrderRollupTests(OrderTestMixin, APITestCase):
+    def buckets(self):
+        return {
+            (row.status, row.payment_method): (row.orders, str(row.revenue))
+            for row in OrderDailyRollup.objects.filter(orders__gt=0)
+        }
+
+    def add_dated_order(self):
+        return self.add_order(items=0, date_ordered=timezone.localdate(), total=10)
+
+    def test_writes_move_orders_between_buckets(self):
+        orders = [self.add_dated_order() for _ in range(3)]
+        self.assertEqual(self.buckets(), {("Placed", "Cash in hand"): (3, "30.00")})
+
+        orders[0].transition("Pending")
+        orders[1].payment_method = "Paypal"
+        orders[1].total = 25
+        orders[1].save()
+        orders[2].delete()
+
+        self.assertEqual(
+            self.buckets(),
+            {
+                ("Pending", "Cash in hand"): (1, "10.00"),
+                ("Placed", "Paypal"): (1, "25.00"),
+            },
+        )
+
+    def test_stale_instance_cannot_move_rollups_with_its_old_values(self):
+        order = self.add_dated_order()
+        stale = Order.objects.get(pk=order.pk)
+        order.payment_method = "Paypal"
+        order.save()
+
+        with self.assertRaises(OrderConflict):
+            stale.transition("Pending")
+        with self.assertRaises(OrderConflict):
+            stale.save()
+
+        self.assertEqual(self.buckets(), {("Placed", "Paypal"): (1, "10.00")})
+
+    def test_transition_cost_does_not_grow_with_orders_that_day(self):
+        orders = [self.add_dated_order() for _ in range(3)]
+        orders[0].transition("Pending")
+        # Order UPDATE and event INSERT, then one UPDATE per bucket, each
+        # group in its savepoint; the day's other orders are never read
+        with self.assertNumQueries(8):
+            orders[1].transition("Pending")
+
+        for _ in range(10):
+            self.add_dated_order()
+        with self.assertNumQueries(8):
+            orders[2].transition("Pending")
+
+
+class OrderExportTests(OrderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.user)
+        order = self.add_order(items=0)
+        # One CSV line per item, so the body spans two batches
+        Item.objects.bulk_create(
+            Item(order=order, food=self.foods[0], unit_price=6, total_price=6)
+            for _ in range(EXPORT_BATCH_LINES + 10)
+        )
+        self.url = reverse(
+            "restaurant-order-export-csv", args=[self.restaurant.restaurant_id]
+        )
+
+    async def test_csv_export_streams_in_batches_under_asgi(self):
+        response = await self.async_client.get(
+            self.url,
+            secure=True,
+            headers={"authorization": f"Token {self.token.key}"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        # An async iterator is sent chunk by chunk; a sync one would be
+        # buffered whole by the ASGI handler
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 2)
+        lines = b"".join(chunks).decode().splitlines()
+        self.assertEqual(len(lines), EXPORT_BATCH_LINES + 11)
+        self.assertTrue(lines[0].startswith("order_id,"))
+
+
+class OrderExportMergeTests(OrderTestMixin, APITestCase):
+    def test_items_of_an_order_gone_before_the_orders_query_are_skipped(self):
+        today = timezone.localdate()
+        gone, *kept = [
+            self.add_order(date_ordered=today - timedelta(days=days))
+            for days in (2, 1, 0)
+        ]
+
+        def archived_meanwhile(items, key):
+            groups = groupby(items, key)
+            first = next(groups)  # runs the items query
+            Order.objects.filter(pk=gone.pk).delete()
+            yield first
+            yield from groups
+
+        with mock.patch("orders.export.groupby", archived_meanwhile):
+            rows = list(export_rows(Order.objects.all()))
+
+        self.assertEqual(
+            [(order["order_id"], len(items)) for order, items in rows],
+            [(order.pk, 2) for order in kept],
+        )
+
+
+class OrderArchiveTests(OrderTestMixin, APITestCase):
+    def test_archived_orders_leave_the_live_tables_but_stay_reported(self):
+        day = timezone.localdate() - timedelta(days=400)
+        order = self.add_order(date_ordered=day, status="Delivered", total=12)
+        OrderEvent.objects.create(order=order, to_status="Delivered")
+        recent = self.add_order(date_ordered=timezone.localdate(), status="Delivered")
+
+        archived = archive_orders(timezone.localdate() - timedelta(days=365))
+
+        self.assertEqual(archived, 1)
+        self.assertEqual(list(Order.objects.values_list("pk", flat=True)), [recent.pk])
+        self.assertFalse(Item.objects.filter(order_id=order.pk).exists())
+        self.assertFalse(OrderEvent.objects.filter(order_id=order.pk).exists())
+        document = ArchivedOrder.objects.get(pk=order.pk).data
+        self.assertEqual(len(document["items"]), 2)
+        self.assertEqual(document["events"][0]["to_status"], "Delivered")
+        self.assertEqual(OrderDailyRollup.objects.get(day=day).orders, 1)
+
+
+class OrderVersionTests(OrderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = self.add_order()
+        self.url = reverse(
+            "restaurant-order-detail",
+            args=[self.restaurant.restaurant_id, self.order.order_id],
+        )
+
+    def patch(self, data):
+        return self.client.patch(self.url, data, format="json", secure=True)
+
+    def test_transition_bumps_the_version_and_records_an_event(self):
+        response = self.patch({"status": "Pending", "version": 0})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["version"], 1)
+        event = OrderEvent.objects.get(order=self.order)
+        self.assertEqual((event.from_status, event.to_status), ("Placed", "Pending"))
+        self.assertEqual(event.actor, self.user)
+
+    def test_illegal_transition_is_rejected(self):
+        response = self.patch({"status": "Delivered"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("status", response.data)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.version), ("Placed", 0))
+
+    def test_stale_version_gets_409_for_status_and_field_edits(self):
+        self.assertEqual(self.patch({"tax": "1.00", "version": 0}).status_code, 200)
+
+        self.assertEqual(self.patch({"tax": "2.00", "version": 0}).status_code, 409)
+        self.assertEqual(
+            self.patch({"status": "Pending", "version": 0}).status_code, 409
+        )
+        self.order.refresh_from_db()
+        self.assertEqual((str(self.order.tax), self.order.version), ("1.00", 1))
+
+    def test_concurrent_edit_of_a_loaded_order_conflicts(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        self.order.tax = 1
+        self.order.save_changes(["tax"])
+
+        stale.tax = 2
+        with self.assertRaises(OrderConflict):
+            stale.save_changes(["tax"])
+
+    def test_every_save_bumps_the_version(self):
+        self.order.tax = 1
+        self.order.save()
+        self.order.calculate_totals()
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.version, 2)
+
+    def test_orders_are_created_in_the_initial_status(self):
+        response = self.client.post(
+            reverse("restaurant-orders", args=[self.restaurant.restaurant_id]),
+            {
+                "customer_code": self.customer.customer_id,
+                "restaurant_code": self.restaurant.restaurant_id,
+                "status": "Delivered",
+                "items": [{"food": self.foods[0].pk, "quantity": 1}],
+            },
+            format="json",
+            secure=True,
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("status", response.data)
+
+
+class OrderIdempotencyTests(OrderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("restaurant-orders", args=[self.restaurant.restaurant_id])
+
+    def create(self, key, quantity=1, **kwargs):
+        kwargs.setdefault("format", "json")
+        data = kwargs.pop("data", None) or {
+            "customer_code": self.customer.customer_id,
+            "restaurant_code": self.restaurant.restaurant_id,
+            "items": [{"food": self.foods[0].pk, "quantity": quantity}],
+        }
+        return self.client.post(
+            self.url, data, secure=True, headers={"idempotency-key": key}, **kwargs
+        )
+
+    def test_replay_returns_the_first_response(self):
+        first = self.create("order-1")
+        replay = self.create("order-1")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(replay["Idempotency-Key-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_for_a_different_body_conflicts(self):
+        self.assertEqual(self.create("order-1").status_code, 201)
+
+        response = self.create("order-1", quantity=2)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_pending_claim_is_reclaimable_after_the_lease(self):
+        claim = IdempotencyKey.objects.create(
+            user=self.user,
+            key="order-1",
+            fingerprint="",
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        self.assertEqual(self.create("order-1").status_code, 409)
+
+        claim.claimed_at = timezone.now() - timedelta(minutes=5)
+        claim.save(update_fields=["claimed_at"])
+
+        self.assertEqual(self.create("order-1").status_code, 201)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_multipart_upload_can_be_fingerprinted(self):
+        data = {
+            "customer_code": self.customer.customer_id,
+            "attachment": SimpleUploadedFile("note.txt", b"no onions"),
+        }
+        response = self.create("order-1", data=data, format="multipart")
+
+        # No items, so the order is refused and the key released for a retry
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("items", response.data)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class OrderBulkStatusTests(OrderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse(
+            "restaurant-order-bulk-status", args=[self.restaurant.restaurant_id]
+        )
+        self.orders = [
+            self.add_order(items=0, date_ordered=timezone.localdate(), total=10)
+            for _ in range(3)
+        ]
+
+    def post(self, order_ids, status="Pending"):
+        return self.client.post(
+            self.url,
+            {"order_ids": order_ids, "status": status},
+            format="json",
+            secure=True,
+        )
+
+    def statuses(self):
+        stored = Order.objects.in_bulk([order.pk for order in self.orders])
+        return [
+            (stored[order.pk].status, stored[order.pk].version)
+            for order in self.orders
+        ]
+
+    def test_orders_move_together_with_events_and_rollups(self):
+        order_ids = [order.pk for order in self.orders]
+
+        response = self.post(order_ids)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"status": "Pending", "order_ids": order_ids})
+        self.assertEqual(self.statuses(), [("Pending", 1)] * 3)
+        self.assertEqual(
+            OrderEvent.objects.filter(to_status="Pending", actor=self.user).count(), 3
+        )
+        rollup = OrderDailyRollup.objects.get(orders__gt=0)
+        self.assertEqual((rollup.status, rollup.orders), ("Pending", 3))
+
+    def test_unknown_order_fails_the_whole_request(self):
+        response = self.post([self.orders[0].pk, "ORD-MISSING"])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ORD-MISSING", response.data["order_ids"])
+        self.assertEqual(self.statuses(), [("Placed", 0)] * 3)
+
+    def test_one_illegal_transition_fails_the_whole_request(self):
+        self.orders[1].transition("Pending")
+
+        response = self.post([order.pk for order in self.orders])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data["order_ids"]), [self.orders[1].pk])
+        self.assertEqual(
+            self.statuses(), [("Placed", 0), ("Pending", 1), ("Placed", 0)]
+        )
+        self.assertEqual(OrderEvent.objects.count(), 1)
+
+    def test_order_changed_meanwhile_conflicts_and_changes_nothing(self):
+        edited = Order.objects.filter(pk=self.orders[1].pk)
+
+        def edited_meanwhile(orders, *args, **kwargs):
+            # Another request edits one order after the view has read it
+            edited.update(version=F("version") + 1)
+            return bulk_transition(orders, *args, **kwargs)
+
+        with mock.patch("orders.views.bulk_transition", edited_meanwhile):
+            response = self.post([order.pk for order in self.orders])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.statuses(), [("Placed", 0), ("Placed", 1), ("Placed", 0)])
+        self.assertFalse(OrderEvent.objects.exists())
+        rollup = OrderDailyRollup.objects.get(orders__gt=0)
+        self.assertEqual((rollup.status, rollup.orders), ("Placed", 3))
+
+
+class OrderSlaTests(OrderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("restaurant-order-sla", args=[self.restaurant.restaurant_id])
+
+    def accept_orders_placed_ago(self, *seconds):
+        now = timezone.now()
+        # Both transitions of an order commit together, so each must only
+        # count the duration it completed
+        with self.captureOnCommitCallbacks(execute=True):
+            for ago in seconds:
+                order = self.add_order(items=0, placed_at=now - timedelta(seconds=ago))
+                order.transition("Pending")
+                order.transition("Accepted")
+
+    def test_transitions_are_recorded_in_restaurant_and_rider_sketches(self):
+        self.accept_orders_placed_ago(60, 120, 600)
+
+        for params in ({}, {"rider": self.rider.rider_code}):
+            response = self.client.get(self.url, params, secure=True)
+            metric = response.data["metrics"]["time_to_accept"]
+            self.assertEqual(metric["count"], 3)
+            self.assertAlmostEqual(metric["p50"], 120, delta=120 * 0.01 + 0.1)
+        self.assertFalse(OrderSlaSketch.objects.filter(metric="prep_time").exists())
+
+    def test_report_merges_the_hourly_sketches(self):
+        self.accept_orders_placed_ago(120)
+        earlier = DDSketch()
+        for _ in range(2):
+            earlier.add(30)
+        OrderSlaSketch.objects.create(
+            metric="time_to_accept",
+            hour=timezone.now().replace(minute=0, second=0, microsecond=0)
+            - timedelta(hours=1),
+            restaurant=self.restaurant,
+            bins=earlier.to_json(),
+        )
+
+        # Two sketch rows, one hour each
+        self.assertEqual(
+            OrderSlaSketch.objects.filter(
+                metric="time_to_accept", restaurant=self.restaurant
+            ).count(),
+            2,
+        )
+        start = timezone.localdate() - timedelta(days=1)
+        response = self.client.get(self.url, {"start": str(start)}, secure=True)
+        metric = response.data["metrics"]["time_to_accept"]
+        self.assertEqual(metric["count"], 3)
+        self.assertAlmostEqual(metric["p50"], 30, delta=30 * 0.01 + 0.1)
+
+
+class OrderEventBusTests(OrderTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = self.add_order()
+        channel_layer = mock.Mock(group_send=mock.AsyncMock())
+        self.group_send = channel_layer.group_send
+        for patcher in (
+            mock.patch("orders.events.get_channel_layer", return_value=channel_layer),
+            mock.patch.object(
+                order_events, "serialize", wraps=order_events.serialize
+            ),
+        ):
+            self.addCleanup(patcher.stop)
+            patcher.start()
+
+    def sent(self):
+        return [
+            (group, message["data"]["action"], message["data"]["order"]["order_id"])
+            for (group, message), _ in self.group_send.call_args_list
+        ]
+
+    def groups(self, order, action):
+        return [
+            (f"order_{order.pk}", action, order.pk),
+            (f"restaurant_{self.restaurant.pk}", action, order.pk),
+        ]
+
+    def test_request_sends_one_message_per_group_for_several_saves(self):
+        url = reverse(
+            "restaurant-order-detail",
+            args=[self.restaurant.restaurant_id, self.order.order_id],
+        )
+        # The middleware's batch nests into this one, which closes after
+        # the commit callbacks have run
+        with order_events.batch(), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                url, {"tax": "1.00", "status": "Pending"}, format="json", secure=True
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sent(), self.groups(self.order, "update"))
+        self.assertEqual(order_events.serialize.call_count, 1)
+
+    def test_rolled_back_writes_send_nothing(self):
+        with order_events.batch(), self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError), transaction.atomic():
+                self.order.tax = 1
+                self.order.save()
+                raise ValueError
+
+        self.group_send.assert_not_called()
+
+    def test_create_then_update_is_sent_as_a_create(self):
+        with order_events.batch(), self.captureOnCommitCallbacks(execute=True):
+            order = self.add_order(items=0)
+            order.tax = 1
+            order.save()
+
+        self.assertEqual(self.sent(), self.groups(order, "create"))
+
+    def test_delete_payload_is_captured_before_the_delete(self):
+        order_id = self.order.pk
+        with order_events.batch(), self.captureOnCommitCallbacks(execute=True):
+            self.order.delete()
+
+        self.assertEqual(
+            self.sent(),
+            [
+                (f"order_{order_id}", "delete", order_id),
+                (f"restaurant_{self.restaurant.pk}", "delete", order_id),
+            ],
+        )
+        # The instance has lost its pk by now; the payload was taken earlier
+        self.assertIsNone(self.order.pk)
+        message = self.group_send.call_args.args[1]
+        self.assertEqual(message["data"]["order"]["customer"]["name"], "Ada")
@@ -0,0 +1,65 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .events import order_events
+from .models import (
+    ORDER_STATUS_TIMESTAMPS,
+    ORDER_TRANSITIONS,
+    Order,
+    OrderConflict,
+    OrderEvent,
+)
+from .reporting import apply_rollup_changes
+from .sla import record_sla_on_commit
+
+
+def bulk_transition(orders, status, actor=None):
+    """
+    Move every order in `orders` to `status` with one UPDATE that only
+    matches rows still at the version they were read with, so like
+    Order.transition it takes no row locks. Raises OrderConflict, leaving
+    every order untouched, if any of them changed in the meantime.
+
+    Writes the OrderEvents and the reporting rollup deltas in the same
+    transaction, then records the SLA sketches and broadcasts once for the
+    whole set.
+    `orders` must carry their lifecycle timestamps, rider and rollup fields
+    (see Order.rollup_bucket).
+    """
+    for order in orders:
+        if status not in ORDER_TRANSITIONS.get(order.status, ()):
+            raise ValueError(
+                f"Cannot move order {order.pk} from {order.status} to {status}."
+            )
+    read = reduce(or_, (Q(pk=order.pk, version=order.version) for order in orders))
+    stamps = {}
+    if status in ORDER_STATUS_TIMESTAMPS:
+        stamps[ORDER_STATUS_TIMESTAMPS[status]] = timezone.now()
+
+    with transaction.atomic():
+        updated = Order.objects.filter(read).update(
+            status=status, version=F("version") + 1, **stamps
+        )
+        if updated != len(orders):
+            raise OrderConflict([order.pk for order in orders])
+        OrderEvent.objects.bulk_create(
+            [
+                OrderEvent(
+                    order=order, from_status=order.status, to_status=status, actor=actor
+                )
+                for order in orders
+            ]
+        )
+        before = [order.rollup_bucket() for order in orders]
+        for order in orders:
+            order.status, order.version = status, order.version + 1
+            for name, value in stamps.items():
+                setattr(order, name, value)
+        apply_rollup_changes(zip(before, (order.rollup_bucket() for order in orders)))
+        record_sla_on_commit(orders)
+        order_events.publish_bulk(orders, "update")
+    return orders
@@ -1,52 +1,64 @@
+from datetime import datetime, time, timedelta
+
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-
-from .serilalizers import OrderSerializer
-from .models import Order
+from django.utils import timezone
+
+from backend.reports import RollupReportView, date_param
+
+from .export import EXPORT_FORMATS, stream_batches
+from .idempotency import IdempotentMixin
+from .serilalizers import (
+    BulkOrderStatusSerializer,
+    OrderConflictError,
+    OrderEventSerializer,
+    OrderSerializer,
+    order_queryset,
+)
+from .models import (
+    ORDER_STATUS_TIMESTAMPS,
+    Order,
+    OrderConflict,
+    OrderDailyRollup,
+    OrderEvent,
+    OrderSlaSketch,
+)
+from .sla import sla_summary
+from .transitions import bulk_transition
 from restaurants.models import Restaurant, Rider
 
 
-# =========================
-# Helper function to broadcast order changes
-# =========================
-def broadcast_order_update(order, action="update"):
-    channel_layer = get_channel_layer()
-    group_name = f"order_{order.order_id}"
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            "type": "send_order_update",
-            "data": {"action": action, "order": OrderSerializer(order).data},
-        },
-    )
+def order_list_queryset():
+    # order_id breaks date ties so pages stay stable; matches the Order indexes
+    return order_queryset().order_by("-date_ordered", "-order_id")
 
 
 # =========================
 # Orders List / Create
 # =========================
-class OrderListCreateView(generics.ListCreateAPIView):
+class OrderListCreateView(IdempotentMixin, generics.ListCreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
         if user.role == "admin":
-            return Order.objects.all().order_by("-date_ordered")
+            return order_list_queryset()
         elif user.role == "manager":
             if not hasattr(user, "restaurant"):
                 raise PermissionDenied("Manager is not associated with any restaurant.")
-            return Order.objects.filter(
-                restaurant__restaurant_id=user.restaurant.restaurant_id
-            ).order_by("-date_ordered")
+            return order_list_queryset().filter(
+                restaurant_id=user.restaurant.restaurant_id
+            )
         elif user.role == "rider":
             rider = get_object_or_404(Rider, user=user)
-            return Order.objects.filter(rider__rider_code=rider.rider_code).order_by(
-                "-date_ordered"
-            )
+            return order_list_queryset().filter(rider=rider)
         return Order.objects.none()
 
     def get_serializer_context(self):
@@ -59,17 +71,18 @@ class OrderListCreateView(generics.ListCreateAPIView):
         user = self.request.user
         if user.role not in ["manager", "admin"]:
             raise PermissionDenied("Only managers or admins can create orders.")
-        order = serializer.save()
-        broadcast_order_update(order, action="create")
+        serializer.save()
 
 
 # =========================
 # Orders Retrieve / Update / Delete
 # =========================
-class OrderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class OrderRetrieveUpdateDestroyView(
+    IdempotentMixin, generics.RetrieveUpdateDestroyAPIView
+):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
-    queryset = Order.objects.all()
+    queryset = order_queryset()
     lookup_field = "order_id"
 
     def get_object(self):
@@ -93,19 +106,13 @@ class OrderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         else:
             raise PermissionDenied("You do not have permission to access this order.")
 
-    def perform_update(self, serializer):
-        order = serializer.save()
-        broadcast_order_update(order, action="update")
-
-    def perform_destroy(self, instance):
-        broadcast_order_update(instance, action="delete")
-        instance.delete()
-
 
 # =========================
 # Restaurant Orders
 # =========================
-class RestaurantOrderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class RestaurantOrderRetrieveUpdateDestroyView(
+    IdempotentMixin, generics.RetrieveUpdateDestroyAPIView
+):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = "order_id"
@@ -116,9 +123,7 @@ class RestaurantOrderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPI
         user = self.request.user
 
         if user.role == "admin":
-            return Order.objects.filter(
-                restaurant__restaurant_id=restaurant.restaurant_id
-            )
+            return order_queryset().filter(restaurant=restaurant)
         elif user.role == "manager":
             if (
                 not hasattr(user, "restaurant")
@@ -127,20 +132,10 @@ class RestaurantOrderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPI
                 raise PermissionDenied(
                     "You can only manage orders for your own restaurant."
                 )
-            return Order.objects.filter(
-                restaurant__restaurant_id=restaurant.restaurant_id
-            )
+            return order_queryset().filter(restaurant=restaurant)
         else:
             raise PermissionDenied("You do not have permission to manage this order.")
 
-    def perform_update(self, serializer):
-        order = serializer.save()
-        broadcast_order_update(order, action="update")
-
-    def perform_destroy(self, instance):
-        broadcast_order_update(instance, action="delete")
-        instance.delete()
-
 
 # =========================
 # Rider Orders List
@@ -155,18 +150,14 @@ class RiderOrderListView(generics.ListAPIView):
         rider = get_object_or_404(Rider, rider_code=rider_code)
 
         if user.role == "admin":
-            return Order.objects.filter(rider__rider_code=rider.rider_code).order_by(
-                "-date_ordered"
-            )
+            return order_list_queryset().filter(rider=rider)
         elif user.role == "manager":
             if (
                 not hasattr(user, "restaurant")
                 or rider.restaurant.restaurant_id != user.restaurant.restaurant_id
             ):
                 raise PermissionDenied("This rider does not belong to your restaurant.")
-            return Order.objects.filter(rider__rider_code=rider.rider_code).order_by(
-                "-date_ordered"
-            )
+            return order_list_queryset().filter(rider=rider)
 
         raise PermissionDenied(
             "You do not have permission to view this rider's orders."
@@ -176,7 +167,7 @@ class RiderOrderListView(generics.ListAPIView):
 # =========================
 # Rider Orders Create
 # =========================
-class RiderOrderCreateView(generics.CreateAPIView):
+class RiderOrderCreateView(IdempotentMixin, generics.CreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
@@ -201,14 +192,15 @@ class RiderOrderCreateView(generics.CreateAPIView):
         if rider.restaurant.restaurant_id != restaurant.restaurant_id:
             raise PermissionDenied("This rider does not belong to your restaurant.")
 
-        order = serializer.save(restaurant=restaurant, rider=rider)
-        broadcast_order_update(order, action="create")
+        serializer.save(restaurant=restaurant, rider=rider)
 
 
 # =========================
 # Rider Orders Retrieve / Update / Delete
 # =========================
-class RiderOrderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class RiderOrderRetrieveUpdateDestroyView(
+    IdempotentMixin, generics.RetrieveUpdateDestroyAPIView
+):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = "order_id"
@@ -219,21 +211,222 @@ class RiderOrderRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView)
         rider = get_object_or_404(Rider, rider_code=rider_code)
 
         if user.role == "admin":
-            return Order.objects.filter(rider__rider_code=rider.rider_code)
+            return order_queryset().filter(rider=rider)
         elif user.role == "manager":
             if (
                 not hasattr(user, "restaurant")
                 or rider.restaurant.restaurant_id != user.restaurant.restaurant_id
             ):
                 raise PermissionDenied("You do not have access to this rider's orders.")
-            return Order.objects.filter(rider__rider_code=rider.rider_code)
+            return order_queryset().filter(rider=rider)
 
         raise PermissionDenied("You do not have permission to manage this order.")
 
-    def perform_update(self, serializer):
-        order = serializer.save()
-        broadcast_order_update(order, action="update")
 
-    def perform_destroy(self, instance):
-        broadcast_order_update(instance, action="delete")
-        instance.delete()
+# =========================
+# Bulk Order Status
+# =========================
+class OrderBulkStatusView(APIView):
+    """
+    Move many of a restaurant's orders to one status in a single request:
+    {"order_ids": [...], "status": "..."}. All or nothing; 409 if any order
+    changed since it was read.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, restaurant_id):
+        restaurant = get_object_or_404(
+            Restaurant, restaurant_id=restaurant_id, user=request.user
+        )
+        serializer = BulkOrderStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = list(dict.fromkeys(serializer.validated_data["order_ids"]))
+        status = serializer.validated_data["status"]
+
+        orders = list(
+            Order.objects.filter(restaurant=restaurant, pk__in=order_ids).only(
+                "order_id",
+                "status",
+                "version",
+                "restaurant_id",
+                "branch_id",
+                "rider_id",
+                "date_ordered",
+                "payment_method",
+                "total",
+                *ORDER_STATUS_TIMESTAMPS.values(),
+            )
+        )
+        missing = set(order_ids) - {order.pk for order in orders}
+        if missing:
+            raise ValidationError(
+                {"order_ids": f"Unknown orders: {', '.join(sorted(missing))}."}
+            )
+        invalid = {
+            order.pk: f"Cannot move an order from {order.status} to {status}."
+            for order in orders
+            if not order.can_transition(status)
+        }
+        if invalid:
+            raise ValidationError({"order_ids": invalid})
+
+        try:
+            bulk_transition(orders, status, actor=request.user)
+        except OrderConflict:
+            raise OrderConflictError()
+        return Response({"status": status, "order_ids": order_ids})
+
+
+# =========================
+# Order Timeline
+# =========================
+class OrderTimelineView(generics.ListAPIView):
+    """Status history of one of the user's restaurant's orders, oldest first."""
+
+    serializer_class = OrderEventSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        order = get_object_or_404(
+            Order,
+            order_id=self.kwargs["order_id"],
+            restaurant__restaurant_id=self.kwargs["restaurant_id"],
+            restaurant__user=self.request.user,
+        )
+        return (
+            OrderEvent.objects.filter(order=order)
+            .select_related("actor")
+            .order_by("ts", "pk")
+        )
+
+
+# =========================
+# Order Export
+# =========================
+class OrderExportView(APIView):
+    """
+    Stream a restaurant's orders and their items as CSV or NDJSON, read with
+    server-side cursors and sent in batches through an async iterator (see
+    stream_batches). Optional ?start=/?end= (inclusive) on date_ordered.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, restaurant_id, fmt):
+        restaurant = get_object_or_404(
+            Restaurant, restaurant_id=restaurant_id, user=request.user
+        )
+        orders = Order.objects.filter(restaurant=restaurant)
+        start, end = date_param(request, "start"), date_param(request, "end")
+        if start:
+            orders = orders.filter(date_ordered__gte=start)
+        if end:
+            orders = orders.filter(date_ordered__lte=end)
+
+        render, content_type = EXPORT_FORMATS[fmt]
+        response = StreamingHttpResponse(
+            stream_batches(render(orders)), content_type=content_type
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="orders-{restaurant_id}.{fmt}"'
+        )
+        return response
+
+
+# =========================
+# Order Reports
+# =========================
+class OrderReportView(RollupReportView):
+    """
+    Order counts and revenue of one restaurant or branch, read only from the
+    daily rollups. ?group_by= any of day, status and payment_method
+    (default day); optional ?status= / ?payment_method= filters.
+    """
+
+    default_days = 30
+    groups = {
+        "day": (["day"], {}),
+        "status": (["status"], {}),
+        "payment_method": (["payment_method"], {}),
+    }
+    default_group_by = "day"
+
+    def get(self, request, restaurant_id=None, franchise_id=None, branch_id=None):
+        start, end = self.parse_range()
+        group_by = self.parse_group_by()
+
+        if restaurant_id:
+            rollups = OrderDailyRollup.objects.filter(
+                restaurant_id=restaurant_id, restaurant__user=request.user
+            )
+        else:
+            rollups = OrderDailyRollup.objects.filter(
+                branch__branch_id=branch_id,
+                branch__franchise__franchise_id=franchise_id,
+                branch__franchise__created_by=request.user,
+            )
+        # Buckets every order has moved out of stay behind with zero orders
+        rollups = rollups.filter(day__range=(start, end), orders__gt=0)
+        for name in ("status", "payment_method"):
+            if request.query_params.get(name):
+                rollups = rollups.filter(**{name: request.query_params[name]})
+
+        totals = rollups.aggregate(orders=Sum("orders"), revenue=Sum("revenue"))
+        rows = self.group_rows(
+            rollups, group_by, orders=Sum("orders"), revenue=Sum("revenue")
+        )
+        return Response(
+            {
+                "start": start,
+                "end": end,
+                "group_by": group_by,
+                "totals": {
+                    "orders": totals["orders"] or 0,
+                    "revenue": totals["revenue"] or 0,
+                },
+                "results": list(rows),
+            }
+        )
+
+
+# =========================
+# Order SLA
+# =========================
+class OrderSlaView(RollupReportView):
+    """
+    p50/p90/p99 time to accept, preparation and delivery time, in seconds,
+    merged from the hourly sketches of a restaurant, or of one of its riders
+    with ?rider=<rider_code>.
+    """
+
+    def get(self, request, restaurant_id):
+        start, end = self.parse_range()
+        restaurant = get_object_or_404(
+            Restaurant, restaurant_id=restaurant_id, user=request.user
+        )
+        sketches = OrderSlaSketch.objects.filter(
+            hour__gte=timezone.make_aware(datetime.combine(start, time.min)),
+            hour__lt=timezone.make_aware(datetime.combine(end, time.min))
+            + timedelta(days=1),
+        )
+        rider_code = request.query_params.get("rider")
+        if rider_code:
+            rider = get_object_or_404(
+                Rider, rider_code=rider_code, restaurant=restaurant
+            )
+            sketches = sketches.filter(rider=rider, restaurant=None)
+        else:
+            sketches = sketches.filter(restaurant=restaurant, rider=None)
+
+        return Response(
+            {
+                "start": start,
+                "end": end,
+                "rider": rider_code,
+                "metrics": sla_summary(
+                    sketches.values_list("metric", "bins", "zero_count")
+                ),
+            }
+        )
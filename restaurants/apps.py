@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class RestaurantsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'restaurants'
+
+    def ready(self):
+        import restaurants.signals  # noqa: F401
+        from backend.images import register_image_field
+
+        register_image_field(self.get_model("Representative"), "photo")
+        register_image_field(self.get_model("Restaurant"), "restaurant_image")
+        register_image_field(self.get_model("Food"), "image")
+        register_image_field(self.get_model("Rider"), "profile_image")
@@ -0,0 +1,49 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.utils import timezone
+
+from .locations import location_buffer
+from .models import Rider
+
+
+@database_sync_to_async
+def get_rider_id(rider_code, user):
+    return (
+        Rider.objects.filter(rider_code=rider_code, restaurant__user=user)
+        .values_list("pk", flat=True)
+        .first()
+    )
+
+
+class RiderLocationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Rider devices stream {"lat": .., "lng": ..} frames every few seconds.
+    Frames are buffered in memory and written behind in coalesced batches
+    (see restaurants.locations), so nothing here touches the database.
+    """
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        rider_code = self.scope["url_route"]["kwargs"]["rider_code"]
+        self.rider_id = await get_rider_id(rider_code, user)
+        if self.rider_id is None:
+            await self.close(code=4403)
+            return
+        await self.accept()
+
+    async def receive_json(self, content):
+        if content.get("type") in ["ping", "test"]:
+            await self.send_json({"echo": content})
+            return
+        try:
+            lat, lng = float(content["lat"]), float(content["lng"])
+        except (KeyError, TypeError, ValueError):
+            await self.send_json({"error": "Expected numeric lat and lng."})
+            return
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            await self.send_json({"error": "Coordinates out of range."})
+            return
+        location_buffer.record(self.rider_id, lng, lat, timezone.now())
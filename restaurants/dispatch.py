@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.contrib.gis.db.models.functions import Distance, GeometryDistance
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Restaurant, Rider, RiderShift
+
+NEAREST_RIDERS_LIMIT = 5
+MAX_OPEN_ORDERS = 3
+# Positions older than this are treated as unknown
+LOCATION_MAX_AGE = timedelta(minutes=5)
+CLOSED_ORDER_STATUSES = ("Delivered",)
+
+
+def nearest_available_riders(
+    point,
+    riders=None,
+    limit=NEAREST_RIDERS_LIMIT,
+    max_open_orders=MAX_OPEN_ORDERS,
+    max_age=LOCATION_MAX_AGE,
+):
+    """
+    The `limit` riders closest to `point` who are active, on a started shift,
+    have a recent position and fewer than `max_open_orders` open orders.
+
+    Ordering by `<->` (GeometryDistance) lets Postgres walk the GiST index on
+    last_location nearest-first and stop after `limit` matches; the shift and
+    open-order checks are per-row subqueries so nothing forces a full scan.
+    """
+    Order = Restaurant._meta.get_field("orders").related_model
+    open_orders = (
+        Order.objects.filter(rider=OuterRef("pk"))
+        .exclude(status__in=CLOSED_ORDER_STATUSES)
+        .order_by()
+        .values("rider")
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    on_shift = RiderShift.objects.filter(rider=OuterRef("pk"), status="started")
+
+    riders = Rider.objects.all() if riders is None else riders
+    return (
+        riders.filter(
+            is_active=True,
+            last_location__isnull=False,
+            last_location_at__gte=timezone.now() - max_age,
+        )
+        .annotate(
+            open_orders=Coalesce(
+                Subquery(open_orders, output_field=IntegerField()), Value(0)
+            ),
+        )
+        .filter(Exists(on_shift), open_orders__lt=max_open_orders)
+        .annotate(distance=Distance("last_location", point))
+        .order_by(GeometryDistance("last_location", point))[:limit]
+    )
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.gis.geos import Point
+
+from .dispatch import CLOSED_ORDER_STATUSES
+from .models import Restaurant, Rider
+
+logger = logging.getLogger(__name__)
+
+
+def flush_locations(positions):
+    """
+    Persist the latest position of each rider with one bulk UPDATE and push
+    a compact location frame to the tracking groups of their open orders.
+    """
+    riders = [
+        Rider(
+            pk=rider_id,
+            last_location=Point(lng, lat, srid=4326),
+            last_location_at=at,
+        )
+        for rider_id, (lng, lat, at) in positions.items()
+    ]
+    Rider.objects.bulk_update(riders, ["last_location", "last_location_at"])
+
+    Order = Restaurant._meta.get_field("orders").related_model
+    open_orders = (
+        Order.objects.filter(rider_id__in=positions)
+        .exclude(status__in=CLOSED_ORDER_STATUSES)
+        .values_list("order_id", "rider_id")
+    )
+    channel_layer = get_channel_layer()
+    for order_id, rider_id in open_orders:
+        lng, lat, at = positions[rider_id]
+        async_to_sync(channel_layer.group_send)(
+            f"order_{order_id}",
+            {
+                "type": "send_order_update",
+                "data": {
+                    "action": "rider_location",
+                    "order_id": order_id,
+                    "location": {"lat": lat, "lng": lng},
+                    "at": at.isoformat(),
+                },
+            },
+        )
+
+
+class LocationWriteBehind:
+    """
+    Per-process buffer of the latest reported position per rider. Frames
+    only overwrite a dict entry; a background task flushes the buffer every
+    RIDER_LOCATION_FLUSH_SECONDS, so the database sees at most one write per
+    rider per interval however often riders report.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.pending = {}
+        self.task = None
+
+    def record(self, rider_id, lng, lat, at):
+        self.pending[rider_id] = (lng, lat, at)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def flush(self):
+        positions, self.pending = self.pending, {}
+        if not positions:
+            return
+        try:
+            await database_sync_to_async(flush_locations)(positions)
+        except Exception:
+            # Retry next interval unless a newer frame replaced the position
+            for rider_id, position in positions.items():
+                self.pending.setdefault(rider_id, position)
+            raise
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Rider location flush failed")
+            if not self.pending:
+                # Idle: stop until the next frame restarts the task
+                return
+
+
+location_buffer = LocationWriteBehind(settings.RIDER_LOCATION_FLUSH_SECONDS)
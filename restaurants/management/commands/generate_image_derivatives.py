@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from backend.images import (
+    REGISTERED_FIELDS,
+    build_derivatives,
+    variants_field_name,
+)
+
+
+class Command(BaseCommand):
+    help = "Generate thumb/card/full derivatives for uploaded photos that lack them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true", help="Regenerate existing derivatives too."
+        )
+
+    def handle(self, *args, **options):
+        for model, field_name in REGISTERED_FIELDS:
+            queryset = model.objects.exclude(**{field_name: ""}).exclude(
+                **{f"{field_name}__isnull": True}
+            )
+            if not options["all"]:
+                queryset = queryset.filter(**{variants_field_name(field_name): {}})
+
+            pks = list(queryset.values_list("pk", flat=True))
+            for pk in pks:
+                build_derivatives(model._meta.label, pk, field_name)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Processed {len(pks)} {model._meta.verbose_name_plural} ({field_name})"
+                )
+            )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from restaurants.models import Restaurant, Food, Review
+from restaurants.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute restaurant and food rating aggregates from their reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        for model, related_field in ((Restaurant, "restaurant"), (Food, "food")):
+            rebuilt = rebuild_rating_aggregates(
+                model, Review, related_field, chunk_size=options["chunk_size"]
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Rebuilt ratings for {rebuilt} {model._meta.verbose_name_plural}"
+                )
+            )
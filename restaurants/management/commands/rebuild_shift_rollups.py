@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from restaurants.models import RiderShift, RiderShiftDailyRollup
+from restaurants.shifts import rebuild_shift_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily rider shift rollups from the shift history."
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_shift_rollups(RiderShiftDailyRollup, RiderShift)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} shift rollup rows"))
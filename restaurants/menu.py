@@ -0,0 +1,110 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from backend.media import absolute_media_url, media_base_url, variant_urls
+
+from .models import Restaurant, FoodCategory, Food
+
+# Snapshots are keyed by version, so an old entry is never served once the
+# version moves on; the timeout only bounds how long stale keys linger.
+MENU_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+
+def menu_cache_key(restaurant_id, version):
+    # Snapshots hold media URLs relative to MEDIA_URL (or under the fixed
+    # MEDIA_BASE_URL), so one entry serves every host and scheme
+    return f"menu:{restaurant_id}:v{version}:{settings.MEDIA_BASE_URL}"
+
+
+def bump_menu_version(**filters):
+    Restaurant.objects.filter(**filters).update(
+        menu_version=F("menu_version") + 1, updated_at=timezone.now()
+    )
+
+
+def touch_restaurant(pk):
+    Restaurant.objects.filter(pk=pk).update(updated_at=timezone.now())
+
+
+def serialize_food(food):
+    # Mirrors FoodSerializer's shape, minus the review data
+    return {
+        "id": food.id,
+        "name": food.name,
+        "description": food.description,
+        "price": str(food.price),
+        "image": absolute_media_url(food.image),
+        "imageSrcset": variant_urls(food.image_variants),
+        "available": food.available,
+        "sizes": {
+            "smallPrice": food.small_price,
+            "mediumPrice": food.medium_price,
+            "largePrice": food.large_price,
+        },
+        "extras": [
+            {"id": extra.id, "name": extra.name, "price": str(extra.price)}
+            for extra in food.extras.all()
+        ],
+    }
+
+
+def build_menu(restaurant_id, version):
+    categories = FoodCategory.objects.filter(restaurant_id=restaurant_id).order_by(
+        "name", "id"
+    )
+    foods = (
+        Food.objects.filter(restaurant_id=restaurant_id)
+        .prefetch_related("extras")
+        .order_by("name", "id")
+    )
+
+    foods_by_category = {}
+    for food in foods:
+        foods_by_category.setdefault(food.category_id, []).append(
+            serialize_food(food)
+        )
+
+    return {
+        "restaurant_id": restaurant_id,
+        "version": version,
+        "categories": [
+            {
+                "id": category.id,
+                "name": category.name,
+                "foods": foods_by_category.get(category.id, []),
+            }
+            for category in categories
+        ],
+        "uncategorized": foods_by_category.get(None, []),
+    }
+
+
+def absolute_snapshot_urls(snapshot, request=None):
+    """
+    Prefix the request's media base URL to the relative media URLs in a
+    rendered snapshot. Those are the JSON strings starting with MEDIA_URL
+    right after a ':', ',' or '['; a quote inside a string is escaped, so
+    no text the snapshot quotes can match.
+    """
+    base = media_base_url(request)
+    if not base or not settings.MEDIA_URL.startswith("/"):
+        return snapshot
+    media_url = settings.MEDIA_URL.encode()
+    pattern = rb'([\[:,]\s?)"' + re.escape(media_url)
+    prefix = b'"' + base.encode() + media_url
+    return re.sub(pattern, lambda match: match.group(1) + prefix, snapshot)
+
+
+def get_menu_snapshot(restaurant_id, version, request=None):
+    """Return the rendered menu JSON for this version, building it on a miss."""
+    key = menu_cache_key(restaurant_id, version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = JSONRenderer().render(build_menu(restaurant_id, version))
+        cache.set(key, snapshot, MENU_SNAPSHOT_TIMEOUT)
+    return absolute_snapshot_urls(snapshot, request)
@@ -0,0 +1,242 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .menu import bump_menu_version
+from .models import FoodCategory, Food, Extra
+from .search import refresh_search_vectors
+
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 500
+
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+NDJSON_CONTENT_TYPES = (
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/jsonl",
+)
+
+FOOD_FIELDS = [
+    "category",
+    "description",
+    "price",
+    "small_price",
+    "medium_price",
+    "large_price",
+    "available",
+]
+
+
+class ImportExtraSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+    price = serializers.DecimalField(max_digits=8, decimal_places=2)
+
+
+class MenuImportRowSerializer(serializers.Serializer):
+    category = serializers.CharField(
+        max_length=100, required=False, allow_blank=True, default=""
+    )
+    name = serializers.CharField(max_length=100)
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+    price = serializers.DecimalField(max_digits=8, decimal_places=2)
+    small_price = serializers.DecimalField(
+        max_digits=8, decimal_places=2, required=False, allow_null=True, default=None
+    )
+    medium_price = serializers.DecimalField(
+        max_digits=8, decimal_places=2, required=False, allow_null=True, default=None
+    )
+    large_price = serializers.DecimalField(
+        max_digits=8, decimal_places=2, required=False, allow_null=True, default=None
+    )
+    available = serializers.BooleanField(required=False, default=True)
+    # Rows without "extras" leave a food's existing extras untouched
+    extras = ImportExtraSerializer(many=True, required=False)
+
+
+def detect_format(content_type, filename=""):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in CSV_CONTENT_TYPES or filename.endswith(".csv"):
+        return "csv"
+    if content_type in NDJSON_CONTENT_TYPES or filename.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return None
+
+
+def parse_csv_extras(value):
+    """CSV rows list extras as "Cheese:1.50|Bacon:2.00"."""
+    extras = []
+    for chunk in (value or "").split("|"):
+        if not chunk.strip():
+            continue
+        name, _, price = chunk.rpartition(":")
+        extras.append({"name": name.strip(), "price": price.strip()})
+    return extras
+
+
+def iter_rows(stream, fmt):
+    """Yield (row_number, raw_row) pairs while reading the stream line by line."""
+    lines = codecs.iterdecode(stream, "utf-8-sig")
+    if fmt == "csv":
+        for row_number, row in enumerate(csv.DictReader(lines), start=2):
+            row = {key: value for key, value in row.items() if value not in (None, "")}
+            if "extras" in row:
+                row["extras"] = parse_csv_extras(row["extras"])
+            yield row_number, row
+        return
+
+    for row_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield row_number, None
+            continue
+        yield row_number, row
+
+
+def resolve_categories(restaurant, names):
+    existing = {}
+    for category in FoodCategory.objects.filter(
+        restaurant=restaurant, name__in=names
+    ).order_by("-id"):
+        existing[category.name] = category
+    missing = [
+        FoodCategory(restaurant=restaurant, name=name)
+        for name in names
+        if name not in existing
+    ]
+    for category in FoodCategory.objects.bulk_create(missing):
+        existing[category.name] = category
+    return existing, len(missing)
+
+
+def resolve_extras(pairs):
+    existing = {}
+    for extra in Extra.objects.filter(name__in={name for name, _ in pairs}).order_by(
+        "-id"
+    ):
+        existing[(extra.name, extra.price)] = extra
+    missing = [
+        Extra(name=name, price=price)
+        for name, price in pairs
+        if (name, price) not in existing
+    ]
+    for extra in Extra.objects.bulk_create(missing):
+        existing[(extra.name, extra.price)] = extra
+    return existing
+
+
+def import_batch(restaurant, rows, report):
+    """Upsert one batch of validated rows, keyed by food name per restaurant."""
+    # A name appearing twice in a batch keeps its last row
+    rows = {row["name"]: row for row in rows}
+
+    categories, created_categories = resolve_categories(
+        restaurant, {row["category"] for row in rows.values() if row["category"]}
+    )
+    report["categories_created"] += created_categories
+
+    foods = {}
+    for food in Food.objects.filter(restaurant=restaurant, name__in=rows).order_by(
+        "-id"
+    ):
+        foods[food.name] = food
+
+    to_create, to_update = [], []
+    for name, row in rows.items():
+        values = dict(row, category=categories.get(row["category"]))
+        values.pop("extras", None)
+        food = foods.get(name)
+        if food is None:
+            food = Food(restaurant=restaurant, name=name)
+            to_create.append(food)
+        else:
+            to_update.append(food)
+        for field, value in values.items():
+            setattr(food, field, value)
+        foods[name] = food
+
+    Food.objects.bulk_create(to_create)
+    Food.objects.bulk_update(to_update, FOOD_FIELDS)
+    refresh_search_vectors(
+        Food.objects.filter(pk__in=[food.pk for food in foods.values()])
+    )
+    report["created"] += len(to_create)
+    report["updated"] += len(to_update)
+
+    # Replace the extras of the foods that listed them in two statements
+    with_extras = {name: row["extras"] for name, row in rows.items() if "extras" in row}
+    if not with_extras:
+        return
+    extras = resolve_extras(
+        {
+            (extra["name"], extra["price"])
+            for food_extras in with_extras.values()
+            for extra in food_extras
+        }
+    )
+    Through = Food.extras.through
+    Through.objects.filter(food__in=[foods[name] for name in with_extras]).delete()
+    Through.objects.bulk_create(
+        [
+            Through(
+                food_id=foods[name].id,
+                extra_id=extras[(extra["name"], extra["price"])].id,
+            )
+            for name, food_extras in with_extras.items()
+            for extra in food_extras
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def import_menu(restaurant, stream, fmt, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Stream a CSV/NDJSON menu into the restaurant in a single transaction and
+    return a report with per-row validation errors.
+    """
+    report = {
+        "rows": 0,
+        "created": 0,
+        "updated": 0,
+        "categories_created": 0,
+        "errors": [],
+        "error_count": 0,
+    }
+    rows = iter_rows(stream, fmt)
+
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+
+            valid = []
+            for row_number, raw in chunk:
+                report["rows"] += 1
+                if raw is None:
+                    errors = "Invalid JSON."
+                else:
+                    serializer = MenuImportRowSerializer(data=raw)
+                    if serializer.is_valid():
+                        valid.append(serializer.validated_data)
+                        continue
+                    errors = serializer.errors
+
+                report["error_count"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"row": row_number, "errors": errors})
+
+            if valid:
+                import_batch(restaurant, valid, report)
+
+        # Bulk writes skip model signals, so invalidate the menu once here
+        if report["created"] or report["updated"]:
+            bump_menu_version(pk=restaurant.pk)
+
+    return report
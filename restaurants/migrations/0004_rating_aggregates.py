@@ -0,0 +1,141 @@
+# Generated by Django 4.2 on 2026-10-18 13:01
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+import django.db.models.deletion
+
+STARS = range(1, 6)
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Review = apps.get_model("restaurants", "Review")
+    annotations = {
+        "rating_count": Count("id"),
+        "rating_sum": Sum("rating"),
+        **{f"stars_{star}": Count("id", filter=Q(rating=star)) for star in STARS},
+    }
+    fields = ["rating", *annotations]
+    for model_name, related_field in (("Restaurant", "restaurant"), ("Food", "food")):
+        model = apps.get_model("restaurants", model_name)
+        # Unreviewed rows keep the new zero counters; rating starts from scratch
+        model.objects.update(rating=Decimal("0.0"))
+        rows = list(
+            Review.objects.filter(**{f"{related_field}__isnull": False})
+            .values(related_field)
+            .annotate(**annotations)
+            .order_by()
+        )
+        for start in range(0, len(rows), 500):
+            chunk = rows[start : start + 500]
+            # Loaded rather than instantiated: new instances would evaluate
+            # the ID default, whose sequence a later migration creates
+            objs = model.objects.only("pk").in_bulk(
+                [row[related_field] for row in chunk]
+            )
+            for row in chunk:
+                obj = objs[row[related_field]]
+                for field in annotations:
+                    setattr(obj, field, row[field])
+                obj.rating = round(Decimal(obj.rating_sum) / obj.rating_count, 1)
+            model.objects.bulk_update(objs.values(), fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0003_food_available_food_large_price_food_medium_price_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='food',
+            name='rating',
+            field=models.DecimalField(decimal_places=1, default=0.0, max_digits=2),
+        ),
+        migrations.AddField(
+            model_name='food',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='food',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='food',
+            name='stars_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='food',
+            name='stars_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='food',
+            name='stars_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='food',
+            name='stars_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='food',
+            name='stars_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='stars_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='stars_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='stars_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='stars_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='stars_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='food',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='restaurants.food'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['restaurant', '-rating'], name='food_restaurant_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['user', '-rating'], name='restaurant_user_rating_idx'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
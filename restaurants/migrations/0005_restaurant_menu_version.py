@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0004_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='menu_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0005_restaurant_menu_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
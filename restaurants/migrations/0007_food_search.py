@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-18 13:07
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def backfill_search_vectors(apps, schema_editor):
+    Food = apps.get_model("restaurants", "Food")
+    # Frozen copy of restaurants.search.FOOD_SEARCH_VECTOR at this point
+    Food.objects.update(
+        search_vector=SearchVector("name", weight="A")
+        + SearchVector("description", weight="B")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0006_restaurant_updated_at'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='food',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='food_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='food_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
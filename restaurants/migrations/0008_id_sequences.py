@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-18 15:02
+
+from django.db import migrations, models
+import restaurants.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0007_food_search'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE SEQUENCE restaurants_restaurant_ids MINVALUE 0 MAXVALUE 999999 START 0 NO CYCLE",
+            "DROP SEQUENCE restaurants_restaurant_ids",
+        ),
+        migrations.RunSQL(
+            "CREATE SEQUENCE restaurants_rider_codes MINVALUE 0 MAXVALUE 999999 START 0 NO CYCLE",
+            "DROP SEQUENCE restaurants_rider_codes",
+        ),
+        migrations.AlterField(
+            model_name='restaurant',
+            name='restaurant_id',
+            field=models.CharField(default=restaurants.models.generate_unique_id, editable=False, max_length=10, primary_key=True, serialize=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0008_id_sequences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='food',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='representative',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='restaurant_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='rider',
+            name='profile_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
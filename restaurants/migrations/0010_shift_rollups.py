@@ -0,0 +1,77 @@
+# Generated by Django 4.2 on 2026-10-18 16:25
+
+import datetime
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+import django.db.models.deletion
+
+
+def backfill_shift_rollups(apps, schema_editor):
+    RiderShift = apps.get_model("restaurants", "RiderShift")
+    RiderShiftDailyRollup = apps.get_model("restaurants", "RiderShiftDailyRollup")
+    # Finished shifts count towards the day they started on
+    rows = (
+        RiderShift.objects.filter(status__in=("ended", "cancelled"))
+        .annotate(day=TruncDate("start_time"))
+        .values("day", "rider_id", "rider__restaurant_id", "shift_type_id")
+        .annotate(
+            shifts_ended=Count("id", filter=Q(status="ended")),
+            shifts_cancelled=Count("id", filter=Q(status="cancelled")),
+            time_worked=Coalesce(
+                Sum(
+                    F("end_time") - F("start_time"),
+                    filter=Q(status="ended", end_time__isnull=False),
+                ),
+                datetime.timedelta(),
+            ),
+        )
+        .order_by()
+    )
+    RiderShiftDailyRollup.objects.bulk_create(
+        (
+            RiderShiftDailyRollup(
+                day=row["day"],
+                rider_id=row["rider_id"],
+                restaurant_id=row["rider__restaurant_id"],
+                shift_type_id=row["shift_type_id"],
+                shifts_ended=row["shifts_ended"],
+                shifts_cancelled=row["shifts_cancelled"],
+                time_worked=row["time_worked"],
+            )
+            for row in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0009_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiderShiftDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('shifts_ended', models.PositiveIntegerField(default=0)),
+                ('shifts_cancelled', models.PositiveIntegerField(default=0)),
+                ('time_worked', models.DurationField(default=datetime.timedelta)),
+                ('restaurant', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurants.restaurant')),
+                ('rider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurants.rider')),
+                ('shift_type', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='restaurants.shifttype')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ridershiftdailyrollup',
+            index=models.Index(fields=['restaurant', 'day'], name='shift_rollup_restaurant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ridershiftdailyrollup',
+            index=models.Index(fields=['rider', 'day'], name='shift_rollup_rider_idx'),
+        ),
+        migrations.RunPython(backfill_shift_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-18 17:05
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0010_shift_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rider',
+            name='last_location',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='rider',
+            name='last_location_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,22 +1,35 @@
+from datetime import timedelta
+
 from django.utils import timezone
-import random
-from django.db import models
+from django.contrib.gis.db import models as gis_models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.conf import settings
 
+from backend.ids import IdSequence
+
 User = get_user_model()
 
 
+# Wider than the legacy B#### / R#### codes, so new IDs never collide with them
+RESTAURANT_IDS = IdSequence("restaurants_restaurant_ids", "B", 6, obfuscate=True)
+RIDER_CODES = IdSequence("restaurants_rider_codes", "R", 6, obfuscate=True)
+
+
 def generate_unique_id():
-    while True:
-        new_id = f"B{random.randint(1000, 9999)}"
-        if not Restaurant.objects.filter(restaurant_id=new_id).exists():
-            return new_id
+    return RESTAURANT_IDS.next()
+
+
+def generate_rider_code():
+    return RIDER_CODES.next()
 
 
 class Representative(models.Model):
     full_name = models.CharField(max_length=255)
     photo = models.ImageField(upload_to="restaurant_rep_images/", null=True, blank=True)
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     phone = models.CharField(max_length=20)
     location = models.CharField(max_length=255, null=True, blank=True)
 
@@ -24,10 +37,30 @@ class Representative(models.Model):
         return self.full_name
 
 
-class Restaurant(models.Model):
+class RatingAggregate(models.Model):
+    """Review statistics kept in step by restaurants.signals."""
+
+    rating = models.DecimalField(max_digits=2, decimal_places=1, default=0.0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def rating_histogram(self):
+        return {str(star): getattr(self, f"stars_{star}") for star in range(1, 6)}
+
+
+class Restaurant(RatingAggregate):
     restaurant_id = models.CharField(
         primary_key=True,
-        max_length=5,
+        max_length=10,
         unique=True,
         editable=False,
         default=generate_unique_id,
@@ -53,30 +86,71 @@ class Restaurant(models.Model):
     restaurant_image = models.ImageField(
         upload_to="restaurant_images/", null=True, blank=True
     )
-    rating = models.DecimalField(max_digits=2, decimal_places=1, default=0.0)
+    restaurant_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     status = models.CharField(
         max_length=10,
         choices=[("Open", "Open"), ("Closed", "Closed")],
         default="Closed",
     )
+    # Bumped by restaurants.signals whenever foods, categories or extras change
+    menu_version = models.PositiveIntegerField(default=1, editable=False)
+    # Also touched by restaurants.signals when nested data (reviews, riders,
+    # orders, menu) changes, so it can serve as a cheap HTTP validator
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-rating"], name="restaurant_user_rating_idx"),
+        ]
 
     def __str__(self):
         return self.name or self.id
 
 
+class FoodCategoryQuerySet(models.QuerySet):
+    def with_item_counts(self):
+        return self.annotate(
+            food_count=models.Count("foods"),
+            available_food_count=models.Count(
+                "foods", filter=models.Q(foods__available=True)
+            ),
+            unavailable_food_count=models.Count(
+                "foods", filter=models.Q(foods__available=False)
+            ),
+        )
+
+
 class FoodCategory(models.Model):
     restaurant = models.ForeignKey(
         Restaurant, related_name="categories", on_delete=models.CASCADE, null=True, blank=True
     )
     name = models.CharField(max_length=100)
 
+    objects = FoodCategoryQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
+    # The counts below prefer the with_item_counts() annotations and only
+    # query when the category was loaded without them.
     @property
     def item_count(self):
+        if hasattr(self, "food_count"):
+            return self.food_count
         return self.foods.count()
 
+    @property
+    def available_item_count(self):
+        if hasattr(self, "available_food_count"):
+            return self.available_food_count
+        return self.foods.filter(available=True).count()
+
+    @property
+    def unavailable_item_count(self):
+        if hasattr(self, "unavailable_food_count"):
+            return self.unavailable_food_count
+        return self.foods.filter(available=False).count()
+
 
 class Extra(models.Model):
     name = models.CharField(max_length=100)
@@ -86,7 +160,7 @@ class Extra(models.Model):
         return self.name
 
 
-class Food(models.Model):
+class Food(RatingAggregate):
     restaurant = models.ForeignKey(
         Restaurant, related_name="foods", on_delete=models.CASCADE
     )
@@ -97,6 +171,7 @@ class Food(models.Model):
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     image = models.ImageField(upload_to="food_images/", blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     extras = models.ManyToManyField(Extra, blank=True, related_name="foods")
     available = models.BooleanField(default=True)
 
@@ -105,19 +180,30 @@ class Food(models.Model):
     medium_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     large_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
 
+    # Kept in sync by restaurants.search.refresh_search_vectors
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["restaurant", "-rating"], name="food_restaurant_rating_idx"
+            ),
+            GinIndex(fields=["search_vector"], name="food_search_vector_idx"),
+            GinIndex(
+                fields=["name"], name="food_name_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
     @property
     def average_rating(self):
-        reviews = self.reviews.all()
-        if reviews.exists():
-            return round(sum(r.rating for r in reviews) / reviews.count(), 1)
-        return 0.0
+        return float(self.rating)
 
     @property
     def total_ratings(self):
-        return self.reviews.count()
+        return self.rating_count
 
     @property
     def category_name(self):
@@ -129,11 +215,20 @@ class Review(models.Model):
     restaurant = models.ForeignKey(
         Restaurant, related_name="reviews", on_delete=models.CASCADE
     )
+    food = models.ForeignKey(
+        Food, related_name="reviews", on_delete=models.CASCADE, null=True, blank=True
+    )
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     comment = models.TextField()
     rating = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        # The rating signals lock the stored row in pre_save and apply the
+        # delta from it in post_save; both must run in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.restaurant.name} - {self.rating}/5"
 
@@ -150,6 +245,7 @@ class Rider(models.Model):
     profile_image = models.ImageField(
         upload_to="rider_profiles/", null=True, blank=True
     )
+    profile_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     date_of_birth = models.DateField(null=True, blank=True)
     gender = models.CharField(
         max_length=10, choices=GENDER_CHOICES, null=True, blank=True
@@ -160,13 +256,13 @@ class Rider(models.Model):
     )
     is_active = models.BooleanField(default=True)
     rider_code = models.CharField(max_length=10, unique=True, null=True, blank=True)
+    # Last reported position; GiST-indexed for nearest-rider (KNN) lookups
+    last_location = gis_models.PointField(srid=4326, null=True, blank=True)
+    last_location_at = models.DateTimeField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
         if not self.rider_code:
-            code = f"R{random.randint(1000, 9999)}"
-            while Rider.objects.filter(rider_code=code).exists():
-                code = f"R{random.randint(1000, 9999)}"
-            self.rider_code = code
+            self.rider_code = generate_rider_code()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -215,4 +311,27 @@ class RiderShift(models.Model):
         return f"{self.rider.full_name} - {self.status} - {self.start_time.date()}"
 
 
+class RiderShiftDailyRollup(models.Model):
+    """
+    Finished shifts per rider, shift type and start day (see
+    restaurants.shifts), so analytics read one row per rider-day instead of
+    the shift history.
+    """
 
+    day = models.DateField()
+    rider = models.ForeignKey(Rider, on_delete=models.CASCADE, related_name="+")
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    shift_type = models.ForeignKey(
+        ShiftType, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    shifts_ended = models.PositiveIntegerField(default=0)
+    shifts_cancelled = models.PositiveIntegerField(default=0)
+    time_worked = models.DurationField(default=timedelta)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["restaurant", "day"], name="shift_rollup_restaurant_idx"),
+            models.Index(fields=["rider", "day"], name="shift_rollup_rider_idx"),
+        ]
@@ -0,0 +1,93 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Cast, Greatest
+
+STARS = range(1, 6)
+AGGREGATE_FIELDS = ["rating", "rating_count", "rating_sum"] + [
+    f"stars_{star}" for star in STARS
+]
+
+
+def apply_rating_delta(model, pk, added=(), removed=()):
+    """Fold added/removed review ratings into one row with a single UPDATE."""
+    count = F("rating_count") + (len(added) - len(removed))
+    total = F("rating_sum") + (sum(added) - sum(removed))
+    values = {
+        "rating_count": count,
+        "rating_sum": total,
+        "rating": Cast(total, models.DecimalField(max_digits=12, decimal_places=2))
+        / Greatest(count, Value(1)),
+    }
+    star_deltas = defaultdict(int)
+    for rating in added:
+        star_deltas[rating] += 1
+    for rating in removed:
+        star_deltas[rating] -= 1
+    for star, delta in star_deltas.items():
+        if star in STARS and delta:
+            values[f"stars_{star}"] = F(f"stars_{star}") + delta
+    model.objects.filter(pk=pk).update(**values)
+
+
+def apply_review_change(restaurant_model, food_model, before=None, after=None):
+    """
+    Update restaurant and food aggregates for a review going from `before` to
+    `after`, each a (restaurant_id, food_id, rating) tuple or None.
+    """
+    with transaction.atomic():
+        for model, position in ((restaurant_model, 0), (food_model, 1)):
+            deltas = defaultdict(lambda: ([], []))
+            if before and before[position] is not None:
+                deltas[before[position]][1].append(before[2])
+            if after and after[position] is not None:
+                deltas[after[position]][0].append(after[2])
+            for pk, (added, removed) in deltas.items():
+                if added != removed:
+                    apply_rating_delta(model, pk, added, removed)
+
+
+def rebuild_rating_aggregates(model, review_model, related_field, chunk_size=500):
+    """Recompute aggregates from the review table, one locked chunk at a time."""
+    annotations = {
+        "rating_count": Count("id"),
+        "rating_sum": Sum("rating"),
+        **{
+            f"stars_{star}": Count("id", filter=Q(rating=star))
+            for star in STARS
+        },
+    }
+    rebuilt = 0
+    last_pk = None
+    while True:
+        with transaction.atomic():
+            queryset = model.objects.order_by("pk").select_for_update()
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            chunk = list(queryset.only("pk")[:chunk_size])
+            if not chunk:
+                return rebuilt
+
+            stats = {
+                row[related_field]: row
+                for row in review_model.objects.filter(
+                    **{f"{related_field}__in": [obj.pk for obj in chunk]}
+                )
+                .values(related_field)
+                .annotate(**annotations)
+            }
+            for obj in chunk:
+                row = stats.get(obj.pk, {})
+                for field in AGGREGATE_FIELDS[1:]:
+                    setattr(obj, field, row.get(field) or 0)
+                obj.rating = (
+                    round(Decimal(obj.rating_sum) / obj.rating_count, 1)
+                    if obj.rating_count
+                    else Decimal("0.0")
+                )
+            model.objects.bulk_update(chunk, AGGREGATE_FIELDS)
+
+        rebuilt += len(chunk)
+        last_pk = chunk[-1].pk
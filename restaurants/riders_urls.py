@@ -6,11 +6,16 @@ from .views import (
     StartRiderShiftView,
     EndRiderShiftView,
     RiderShiftListView,
+    RiderShiftAnalyticsView,
+    NearestRidersView,
+    RiderLocationListView,
 )
 from orders.views import RiderOrderCreateView, RiderOrderListView
 
 urlpatterns = [
     path("", RiderListCreateView.as_view(), name="rider-list-create"),
+    path("nearest/", NearestRidersView.as_view(), name="nearest-riders"),
+    path("locations/", RiderLocationListView.as_view(), name="rider-locations"),
     path("<str:rider_code>/", RiderRetrieveUpdateDestroyView.as_view(), name="rider-detail"),
 
     # Rider's assigned orders (aka deliveries)
@@ -22,4 +27,5 @@ urlpatterns = [
     path("<str:rider_code>/shifts/start/", StartRiderShiftView.as_view(), name="start-rider-shift"),
     path("shifts/<int:pk>/end/", EndRiderShiftView.as_view(), name="end-rider-shift"),
     path("shifts/", RiderShiftListView.as_view(), name="rider-shifts"),
+    path("shifts/analytics/", RiderShiftAnalyticsView.as_view(), name="rider-shift-analytics"),
 ]
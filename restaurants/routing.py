@@ -0,0 +1,10 @@
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    # Rider devices streaming their position
+    re_path(
+        r"ws/riders/(?P<rider_code>\w+)/location/$",
+        consumers.RiderLocationConsumer.as_asgi(),
+    ),
+]
@@ -0,0 +1,60 @@
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db.models import F, Q
+
+from .models import Food
+
+FOOD_SEARCH_VECTOR = SearchVector("name", weight="A") + SearchVector(
+    "description", weight="B"
+)
+
+
+def refresh_search_vectors(queryset):
+    queryset.update(search_vector=FOOD_SEARCH_VECTOR)
+
+
+def search_foods(queryset, text):
+    """
+    Match foods by full-text query (GIN on search_vector) or by trigram
+    similarity on the name (GIN trigram index) so typos still hit, ranked
+    by the sum of both scores.
+    """
+    query = SearchQuery(text, search_type="websearch")
+    return queryset.filter(
+        Q(search_vector=query) | Q(name__trigram_similar=text)
+    ).annotate(
+        rank=SearchRank(F("search_vector"), query) + TrigramSimilarity("name", text)
+    )
+
+
+def food_highlights(foods, text):
+    """Headlines for one page of results, keyed by food id."""
+    if not foods:
+        return {}
+    query = SearchQuery(text, search_type="websearch")
+    rows = (
+        Food.objects.filter(pk__in=[food.pk for food in foods])
+        .annotate(
+            name_highlight=SearchHeadline(
+                "name", query, start_sel="<mark>", stop_sel="</mark>"
+            ),
+            description_highlight=SearchHeadline(
+                "description",
+                query,
+                start_sel="<mark>",
+                stop_sel="</mark>",
+                max_words=20,
+                min_words=8,
+            ),
+        )
+        .values_list("pk", "name_highlight", "description_highlight")
+    )
+    return {
+        pk: {"name": name, "description": description}
+        for pk, name, description in rows
+    }
@@ -1,5 +1,11 @@
 from datetime import date
 from rest_framework import serializers
+from backend.media import (
+    MediaImageField,
+    MediaModelSerializer,
+    MediaVariantsField,
+    absolute_media_url,
+)
 from .models import (
     Restaurant,
     Representative,
@@ -13,33 +19,58 @@ from .models import (
 )
 
 
-class RepresentativeSerializer(serializers.ModelSerializer):
-    photo = serializers.ImageField(required=False)
+class RepresentativeSerializer(MediaModelSerializer):
+    photo = MediaImageField(required=False)
     photo_url = serializers.SerializerMethodField()
+    photo_srcset = MediaVariantsField(source="photo_variants")
 
     class Meta:
         model = Representative
-        fields = ["id", "full_name", "photo", "photo_url", "phone", "location"]
+        fields = [
+            "id",
+            "full_name",
+            "photo",
+            "photo_url",
+            "photo_srcset",
+            "phone",
+            "location",
+        ]
 
     def get_photo_url(self, obj):
-        request = self.context.get("request")
-        if obj.photo and request:
-            return request.build_absolute_uri(obj.photo.url)
-        return None
+        return absolute_media_url(obj.photo, self.context.get("request"))
 
 
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
-        fields = ["id", "user", "comment", "rating", "created_at"]
+        fields = ["id", "user", "food", "comment", "rating", "created_at"]
+
+    def validate(self, attrs):
+        # The restaurant is set by the view (save(restaurant=...)) or context
+        restaurant = attrs.get("restaurant") or self.context.get("restaurant")
+        food = attrs.get("food")
+        if self.instance is not None:
+            restaurant = restaurant or self.instance.restaurant
+            food = attrs.get("food", self.instance.food)
+        if food and restaurant and food.restaurant_id != restaurant.pk:
+            raise serializers.ValidationError(
+                {"food": "This food belongs to another restaurant."}
+            )
+        return attrs
 
 
 class FoodCategorySerializer(serializers.ModelSerializer):
     itemCount = serializers.IntegerField(source="item_count", read_only=True)
+    availableCount = serializers.IntegerField(
+        source="available_item_count", read_only=True
+    )
+    unavailableCount = serializers.IntegerField(
+        source="unavailable_item_count", read_only=True
+    )
 
     class Meta:
         model = FoodCategory
-        fields = ["id", "name", "itemCount"]
+        fields = ["id", "name", "itemCount", "availableCount", "unavailableCount"]
 
 
 class ExtraSerializer(serializers.ModelSerializer):
@@ -48,11 +79,13 @@ class ExtraSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "price"]
 
 
-class FoodSerializer(serializers.ModelSerializer):
+class FoodSerializer(MediaModelSerializer):
     extras = ExtraSerializer(many=True, read_only=True)
     categoryName = serializers.CharField(source="category_name", read_only=True)
     averageRating = serializers.FloatField(source="average_rating", read_only=True)
     totalRatings = serializers.IntegerField(source="total_ratings", read_only=True)
+    ratingBreakdown = serializers.DictField(source="rating_histogram", read_only=True)
+    imageSrcset = MediaVariantsField(source="image_variants")
     reviews = ReviewSerializer(many=True, read_only=True)
     sizes = serializers.SerializerMethodField()
 
@@ -69,6 +102,7 @@ class FoodSerializer(serializers.ModelSerializer):
             "description",
             "price",
             "image",
+            "imageSrcset",
             "extras",
             "category",
             "categoryName",
@@ -76,6 +110,7 @@ class FoodSerializer(serializers.ModelSerializer):
             "sizes",
             "averageRating",
             "totalRatings",
+            "ratingBreakdown",
             "reviews",
             "restaurant",  # added so global POST can link to a restaurant if wanted
         ]
@@ -91,9 +126,38 @@ class FoodSerializer(serializers.ModelSerializer):
         }
 
 
-class RiderSerializer(serializers.ModelSerializer):
-    profile_image = serializers.ImageField(required=False)
+class FoodSearchResultSerializer(MediaModelSerializer):
+    restaurant = serializers.CharField(source="restaurant_id", read_only=True)
+    categoryName = serializers.CharField(source="category_name", read_only=True)
+    rank = serializers.FloatField(read_only=True)
+    imageSrcset = MediaVariantsField(source="image_variants")
+    highlights = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Food
+        fields = [
+            "id",
+            "name",
+            "description",
+            "price",
+            "image",
+            "imageSrcset",
+            "category",
+            "categoryName",
+            "available",
+            "restaurant",
+            "rank",
+            "highlights",
+        ]
+
+    def get_highlights(self, obj):
+        return self.context.get("highlights", {}).get(obj.pk)
+
+
+class RiderSerializer(MediaModelSerializer):
+    profile_image = MediaImageField(required=False)
     profile_image_url = serializers.SerializerMethodField()
+    profile_image_srcset = MediaVariantsField(source="profile_image_variants")
     restaurant = serializers.SlugRelatedField(
         queryset=Restaurant.objects.all(), slug_field="restaurant_id"
     )
@@ -106,6 +170,7 @@ class RiderSerializer(serializers.ModelSerializer):
             "phone",
             "profile_image",
             "profile_image_url",
+            "profile_image_srcset",
             "date_of_birth",
             "gender",
             "address",
@@ -115,10 +180,7 @@ class RiderSerializer(serializers.ModelSerializer):
         read_only_fields = ["rider_code"]
 
     def get_profile_image_url(self, obj):
-        request = self.context.get("request")
-        if obj.profile_image and request:
-            return request.build_absolute_uri(obj.profile_image.url)
-        return None
+        return absolute_media_url(obj.profile_image, self.context.get("request"))
 
     def validate_date_of_birth(self, value):
         if value:
@@ -135,6 +197,35 @@ class RiderSerializer(serializers.ModelSerializer):
         return value
 
 
+class NearestRiderSerializer(MediaModelSerializer):
+    profile_image_url = serializers.SerializerMethodField()
+    location = serializers.SerializerMethodField()
+    distance_m = serializers.SerializerMethodField()
+    open_orders = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Rider
+        fields = [
+            "rider_code",
+            "full_name",
+            "phone",
+            "profile_image_url",
+            "location",
+            "last_location_at",
+            "distance_m",
+            "open_orders",
+        ]
+
+    def get_profile_image_url(self, obj):
+        return absolute_media_url(obj.profile_image, self.context.get("request"))
+
+    def get_location(self, obj):
+        return {"lat": obj.last_location.y, "lng": obj.last_location.x}
+
+    def get_distance_m(self, obj):
+        return round(obj.distance.m, 1)
+
+
 class ShiftTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShiftType
@@ -169,15 +260,20 @@ class RiderShiftSerializer(serializers.ModelSerializer):
         ]
 
 
-class RestaurantSerializer(serializers.ModelSerializer):
+class RestaurantSerializer(MediaModelSerializer):
     restaurant_image_url = serializers.SerializerMethodField()
-    restaurant_image = serializers.ImageField(required=False)
+    restaurant_image = MediaImageField(required=False)
+    restaurant_image_srcset = MediaVariantsField(source="restaurant_image_variants")
     representative = RepresentativeSerializer()
     categories = FoodCategorySerializer(many=True, read_only=True)
     foods = FoodSerializer(many=True, read_only=True)
     reviews = ReviewSerializer(many=True, read_only=True)
     riders = RiderSerializer(many=True, read_only=True)
     orders = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    rating_histogram = serializers.DictField(read_only=True)
+
+    # Nested collections that are only rendered when asked for via ?expand=
+    EXPANDABLE_FIELDS = ("categories", "foods", "reviews", "riders", "orders")
 
     class Meta:
         model = Restaurant
@@ -194,7 +290,10 @@ class RestaurantSerializer(serializers.ModelSerializer):
             "location",
             "restaurant_image",
             "restaurant_image_url",
+            "restaurant_image_srcset",
             "rating",
+            "rating_count",
+            "rating_histogram",
             "status",
             "categories",
             "foods",
@@ -202,12 +301,19 @@ class RestaurantSerializer(serializers.ModelSerializer):
             "riders",
             "orders",
         ]
+        read_only_fields = ["rating", "rating_count"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # "expand" missing from the context keeps the full representation
+        expand = self.context.get("expand")
+        if expand is not None:
+            for field_name in self.EXPANDABLE_FIELDS:
+                if field_name not in expand:
+                    self.fields.pop(field_name)
 
     def get_restaurant_image_url(self, obj):
-        request = self.context.get("request")
-        if obj.restaurant_image and request:
-            return request.build_absolute_uri(obj.restaurant_image.url)
-        return None
+        return absolute_media_url(obj.restaurant_image, self.context.get("request"))
 
     def create(self, validated_data):
         rep_data = validated_data.pop("representative", {})
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+from .models import Rider, RiderShift, RiderShiftDailyRollup
+
+FINISHED_STATUSES = ("ended", "cancelled")
+
+
+def rollup_rows(rollup_model, shifts):
+    """
+    Aggregate finished shifts into unsaved rollup rows, one per rider, shift
+    type and start day. Shifts count towards the day they started on.
+    """
+    rows = (
+        shifts.filter(status__in=FINISHED_STATUSES)
+        .annotate(day=TruncDate("start_time"))
+        .values("day", "rider_id", "rider__restaurant_id", "shift_type_id")
+        .annotate(
+            shifts_ended=Count("id", filter=Q(status="ended")),
+            shifts_cancelled=Count("id", filter=Q(status="cancelled")),
+            time_worked=Coalesce(
+                Sum(
+                    F("end_time") - F("start_time"),
+                    filter=Q(status="ended", end_time__isnull=False),
+                ),
+                timedelta(),
+            ),
+        )
+        .order_by()
+    )
+    return [
+        rollup_model(
+            day=row["day"],
+            rider_id=row["rider_id"],
+            restaurant_id=row["rider__restaurant_id"],
+            shift_type_id=row["shift_type_id"],
+            shifts_ended=row["shifts_ended"],
+            shifts_cancelled=row["shifts_cancelled"],
+            time_worked=row["time_worked"],
+        )
+        for row in rows
+    ]
+
+
+def refresh_shift_rollups(rider_id, day):
+    """Recompute one rider's rollup rows for one day."""
+    with transaction.atomic():
+        # Serialises concurrent refreshes of the same rider
+        list(Rider.objects.select_for_update().filter(pk=rider_id).values("pk"))
+        RiderShiftDailyRollup.objects.filter(rider_id=rider_id, day=day).delete()
+        RiderShiftDailyRollup.objects.bulk_create(
+            rollup_rows(
+                RiderShiftDailyRollup,
+                RiderShift.objects.filter(rider_id=rider_id, start_time__date=day),
+            )
+        )
+
+
+def rebuild_shift_rollups(rollup_model, shift_model, batch_size=1000):
+    """Recompute every rollup row from the shift history."""
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        rows = rollup_rows(rollup_model, shift_model.objects.all())
+        rollup_model.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
@@ -0,0 +1,191 @@
+# restaurants/signals.py
+from django.db.models.signals import (
+    pre_save,
+    post_save,
+    pre_delete,
+    post_delete,
+    m2m_changed,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Restaurant,
+    Representative,
+    FoodCategory,
+    Extra,
+    Food,
+    Review,
+    Rider,
+    RiderShift,
+)
+from .menu import bump_menu_version, touch_restaurant
+from .ratings import apply_review_change
+from .search import refresh_search_vectors
+from .shifts import FINISHED_STATUSES, refresh_shift_rollups
+
+
+def review_key(review):
+    return (review["restaurant_id"], review["food_id"], review["rating"])
+
+
+def locked_review_key(pk):
+    """
+    The stored (restaurant, food, rating) of a review, with its row locked
+    for the rest of the transaction, or None once it is gone. A concurrent
+    edit or delete of the same review waits here until the other one
+    commits, so each delta starts from what the other left behind.
+    """
+    stored = (
+        Review.objects.select_for_update()
+        .filter(pk=pk)
+        .values("restaurant_id", "food_id", "rating")
+        .first()
+    )
+    return review_key(stored) if stored else None
+
+
+@receiver(pre_save, sender=Review)
+def review_pre_save(sender, instance, **kwargs):
+    # Runs inside Review.save()'s transaction, see Review.save
+    instance._previous_rating = locked_review_key(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    apply_review_change(
+        Restaurant,
+        Food,
+        before=getattr(instance, "_previous_rating", None),
+        after=(instance.restaurant_id, instance.food_id, instance.rating),
+    )
+    touch_restaurant(instance.restaurant_id)
+
+
+@receiver(pre_delete, sender=Review)
+def review_pre_delete(sender, instance, **kwargs):
+    # Deletion signals run inside the deletion's transaction. A review that
+    # was already deleted has nothing left to subtract.
+    instance._previous_rating = locked_review_key(instance.pk)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    before = getattr(instance, "_previous_rating", None)
+    if before:
+        apply_review_change(Restaurant, Food, before=before)
+        touch_restaurant(instance.restaurant_id)
+
+
+# ---------------- RESTAURANT CHANGE MARKER ----------------
+@receiver(post_save, sender=Rider)
+@receiver(post_delete, sender=Rider)
+def rider_changed(sender, instance, **kwargs):
+    touch_restaurant(instance.restaurant_id)
+
+
+# Representatives are nested in restaurant responses (photo derivatives land
+# asynchronously, so the restaurant ETag has to move when they do)
+@receiver(post_save, sender=Representative)
+def representative_changed(sender, instance, **kwargs):
+    Restaurant.objects.filter(representative=instance).update(
+        updated_at=timezone.now()
+    )
+
+
+# Restaurants only list their order IDs, so only membership changes count
+@receiver(post_save, sender="orders.Order")
+def order_created(sender, instance, created, **kwargs):
+    if created and instance.restaurant_id:
+        touch_restaurant(instance.restaurant_id)
+
+
+@receiver(post_delete, sender="orders.Order")
+def order_deleted(sender, instance, **kwargs):
+    if instance.restaurant_id:
+        touch_restaurant(instance.restaurant_id)
+
+
+# ---------------- SHIFT ROLLUPS ----------------
+def shift_rollup_key(shift):
+    if shift.status not in FINISHED_STATUSES:
+        return None
+    return (shift.rider_id, timezone.localdate(shift.start_time))
+
+
+@receiver(pre_save, sender=RiderShift)
+def shift_pre_save(sender, instance, **kwargs):
+    previous = RiderShift.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._previous_rollup = shift_rollup_key(previous) if previous else None
+
+
+@receiver(post_save, sender=RiderShift)
+def shift_saved(sender, instance, **kwargs):
+    # Only finished shifts are rolled up, so most saves of open shifts are free
+    keys = {getattr(instance, "_previous_rollup", None), shift_rollup_key(instance)}
+    for key in keys - {None}:
+        refresh_shift_rollups(*key)
+
+
+@receiver(post_delete, sender=RiderShift)
+def shift_deleted(sender, instance, **kwargs):
+    key = shift_rollup_key(instance)
+    if key:
+        refresh_shift_rollups(*key)
+
+
+# ---------------- SEARCH ----------------
+@receiver(post_save, sender=Food)
+def food_saved_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {"name", "description"} & set(update_fields):
+        refresh_search_vectors(Food.objects.filter(pk=instance.pk))
+
+
+# ---------------- MENU VERSION ----------------
+@receiver(post_save, sender=Food)
+@receiver(post_delete, sender=Food)
+@receiver(post_save, sender=FoodCategory)
+@receiver(post_delete, sender=FoodCategory)
+def menu_item_changed(sender, instance, **kwargs):
+    if instance.restaurant_id:
+        bump_menu_version(pk=instance.restaurant_id)
+
+
+def restaurants_serving(extra):
+    return list(
+        Food.objects.filter(extras=extra)
+        .values_list("restaurant_id", flat=True)
+        .distinct()
+    )
+
+
+@receiver(post_save, sender=Extra)
+def extra_saved(sender, instance, **kwargs):
+    # Extras are shared, so every restaurant serving this one is affected
+    bump_menu_version(pk__in=restaurants_serving(instance))
+
+
+@receiver(pre_delete, sender=Extra)
+def extra_pre_delete(sender, instance, **kwargs):
+    # The food links are gone by post_delete, so collect the restaurants now
+    instance._menu_restaurants = restaurants_serving(instance)
+
+
+@receiver(post_delete, sender=Extra)
+def extra_deleted(sender, instance, **kwargs):
+    bump_menu_version(pk__in=getattr(instance, "_menu_restaurants", []))
+
+
+@receiver(m2m_changed, sender=Food.extras.through)
+def food_extras_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            bump_menu_version(pk=instance.restaurant_id)
+    elif action == "pre_clear":
+        instance._menu_restaurants = restaurants_serving(instance)
+    elif action == "post_clear":
+        bump_menu_version(pk__in=getattr(instance, "_menu_restaurants", []))
+    elif action in ("post_add", "post_remove"):
+        bump_menu_version(
+            pk__in=Food.objects.filter(pk__in=pk_set).values("restaurant_id")
+        )
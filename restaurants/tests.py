@@ -1,3 +1,815 @@
-from django.test import TestCase
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from backend.ids import BlockAllocator, Permutation, SequenceAllocator
+from backend.ws_auth import TokenAuthMiddlewareStack
+from orders.models import Order
+
+from .locations import LocationWriteBehind
+from .menu import menu_cache_key
+from .models import (
+    RESTAURANT_IDS,
+    Representative,
+    Restaurant,
+    FoodCategory,
+    Food,
+    Review,
+    Rider,
+    RiderShift,
+    RiderShiftDailyRollup,
+    ShiftType,
+)
+from .routing import websocket_urlpatterns
+from .serializers import FoodCategorySerializer, ReviewSerializer
+from .views import FoodSearchPagination
+from .shifts import rebuild_shift_rollups
+
+User = get_user_model()
+
+
+class FoodCategoryItemCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="pass")
+        self.restaurant = Restaurant.objects.create(user=self.user, phone="000")
+        self.client.force_authenticate(self.user)
+        self.url = reverse("food-categories", args=[self.restaurant.restaurant_id])
+
+    def add_category(self, available=2, unavailable=1):
+        category = FoodCategory.objects.create(
+            restaurant=self.restaurant, name=f"Category {FoodCategory.objects.count()}"
+        )
+        for is_available in [True] * available + [False] * unavailable:
+            Food.objects.create(
+                restaurant=self.restaurant,
+                category=category,
+                name="Dish",
+                price=5,
+                available=is_available,
+            )
+        return category
+
+    def test_category_list_query_count_does_not_grow_with_categories(self):
+        self.add_category()
+        # Validator aggregate + page COUNT + one annotated SELECT, regardless
+        # of how many categories there are
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, secure=True)
+        self.assertEqual(response.status_code, 200)
+
+        for _ in range(5):
+            self.add_category()
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, secure=True)
+        self.assertEqual(len(response.data["results"]), 6)
+
+    def test_category_list_reports_availability_breakdown(self):
+        self.add_category(available=3, unavailable=2)
+        self.add_category(available=0, unavailable=0)
+
+        response = self.client.get(self.url, secure=True)
+
+        counts = [
+            (row["itemCount"], row["availableCount"], row["unavailableCount"])
+            for row in response.data["results"]
+        ]
+        self.assertEqual(counts, [(5, 3, 2), (0, 0, 0)])
+
+    def test_serializer_falls_back_without_annotation(self):
+        category = self.add_category(available=1, unavailable=1)
+
+        data = FoodCategorySerializer(FoodCategory.objects.get(pk=category.pk)).data
+
+        self.assertEqual(data["itemCount"], 2)
+        self.assertEqual(data["availableCount"], 1)
+        self.assertEqual(data["unavailableCount"], 1)
+
+    def test_unchanged_category_list_answers_304(self):
+        self.add_category()
+        response = self.client.get(self.url, secure=True)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(
+                self.url, secure=True, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(cached.status_code, 304)
+
+        self.add_category()
+        changed = self.client.get(
+            self.url, secure=True, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(changed.status_code, 200)
+
+
+class ReviewSerializerTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="pass")
+        self.restaurant = Restaurant.objects.create(user=self.user, phone="000")
+        other = Restaurant.objects.create(user=self.user, phone="001")
+        self.other_food = Food.objects.create(restaurant=other, name="Dish", price=5)
+
+    def test_rejects_food_from_another_restaurant(self):
+        serializer = ReviewSerializer(
+            data={
+                "user": self.user.pk,
+                "food": self.other_food.pk,
+                "comment": "Good",
+                "rating": 5,
+            },
+            context={"restaurant": self.restaurant},
+        )
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("food", serializer.errors)
+
+
+class ReviewRatingMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="pass")
+        self.restaurant = Restaurant.objects.create(user=self.user, phone="000")
+        self.foods = [
+            Food.objects.create(restaurant=self.restaurant, name=name, price=5)
+            for name in ("Jollof", "Suya")
+        ]
+
+    def add_review(self, rating, food=None):
+        return Review.objects.create(
+            restaurant=self.restaurant,
+            food=food or self.foods[0],
+            user=self.user,
+            comment="Good",
+            rating=rating,
+        )
+
+    def aggregates(self, obj):
+        obj = type(obj).objects.get(pk=obj.pk)
+        return (
+            obj.rating_count,
+            obj.rating_sum,
+            str(obj.rating),
+            {star: count for star, count in obj.rating_histogram.items() if count},
+        )
+
+
+class ReviewRatingTests(ReviewRatingMixin, APITestCase):
+    def test_create_adds_to_restaurant_and_food(self):
+        self.add_review(4)
+        self.add_review(5)
+
+        expected = (2, 9, "4.5", {"4": 1, "5": 1})
+        self.assertEqual(self.aggregates(self.restaurant), expected)
+        self.assertEqual(self.aggregates(self.foods[0]), expected)
+
+    def test_update_moves_the_rating(self):
+        review = self.add_review(2)
+
+        review.rating = 5
+        review.save()
+
+        self.assertEqual(self.aggregates(self.restaurant), (1, 5, "5.0", {"5": 1}))
+        self.assertEqual(self.aggregates(self.foods[0]), (1, 5, "5.0", {"5": 1}))
+
+    def test_food_change_moves_the_review_between_foods(self):
+        review = self.add_review(3)
+
+        review.food = self.foods[1]
+        review.save()
+
+        self.assertEqual(self.aggregates(self.restaurant), (1, 3, "3.0", {"3": 1}))
+        self.assertEqual(self.aggregates(self.foods[0]), (0, 0, "0.0", {}))
+        self.assertEqual(self.aggregates(self.foods[1]), (1, 3, "3.0", {"3": 1}))
+
+    def test_delete_subtracts_once(self):
+        review = self.add_review(4)
+        self.add_review(2)
+        stale = Review.objects.get(pk=review.pk)
+
+        review.delete()
+        stale.delete()
+
+        self.assertEqual(self.aggregates(self.restaurant), (1, 2, "2.0", {"2": 1}))
+        self.assertEqual(self.aggregates(self.foods[0]), (1, 2, "2.0", {"2": 1}))
+
+
+class ConcurrentReviewEditTests(ReviewRatingMixin, TransactionTestCase):
+    def test_concurrent_edits_apply_one_delta_each(self):
+        review = self.add_review(3)
+        first_saved = threading.Event()
+
+        def edit(rating, first):
+            try:
+                stale = Review.objects.get(pk=review.pk)
+                with transaction.atomic():
+                    if not first:
+                        first_saved.wait(5)
+                    stale.rating = rating
+                    stale.save()
+                    if first:
+                        # Hold the first edit open while the second one
+                        # starts from the same loaded rating
+                        first_saved.set()
+                        threading.Event().wait(0.3)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(2) as pool:
+            list(pool.map(edit, (5, 1), (True, False)))
+
+        self.assertEqual(self.aggregates(self.restaurant), (1, 1, "1.0", {"1": 1}))
+
+
+@override_settings(MEDIA_BASE_URL="")
+class MenuSnapshotTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="pass")
+        self.restaurant = Restaurant.objects.create(user=self.user, phone="000")
+        Food.objects.create(
+            restaurant=self.restaurant,
+            name="Dish",
+            description='Photo at "/media/foods/dish.jpg"',
+            price=5,
+            image="foods/dish.jpg",
+        )
+        self.client.force_authenticate(self.user)
+        self.url = reverse("restaurant-menu", args=[self.restaurant.restaurant_id])
+
+    def test_snapshot_image_urls_are_absolute_per_host(self):
+        response = self.client.get(self.url, secure=True)
+        other_host = self.client.get(self.url, secure=True, HTTP_HOST="cdn.example")
+
+        self.assertEqual(
+            response.json()["uncategorized"][0]["image"],
+            "https://testserver/media/foods/dish.jpg",
+        )
+        self.assertEqual(
+            other_host.json()["uncategorized"][0]["image"],
+            "https://cdn.example/media/foods/dish.jpg",
+        )
+        # Quoted text that looks like a media URL is left alone
+        self.assertEqual(
+            other_host.json()["uncategorized"][0]["description"],
+            'Photo at "/media/foods/dish.jpg"',
+        )
+
+    def test_one_snapshot_is_cached_whatever_the_host(self):
+        with mock.patch("restaurants.menu.cache.set", wraps=cache.set) as cache_set:
+            for host in ("a.example", "b.example", "c.example"):
+                self.client.get(self.url, secure=True, HTTP_HOST=host)
+
+        cache_set.assert_called_once()
+        self.restaurant.refresh_from_db()
+        key = menu_cache_key(self.restaurant.pk, self.restaurant.menu_version)
+        self.assertIn(b'"image":"/media/foods/dish.jpg"', cache.get(key))
+
+    @override_settings(MEDIA_BASE_URL="https://cdn.example")
+    def test_configured_media_base_url_is_used_for_every_host(self):
+        response = self.client.get(self.url, secure=True, HTTP_HOST="evil.example")
+
+        self.assertEqual(
+            response.json()["uncategorized"][0]["image"],
+            "https://cdn.example/media/foods/dish.jpg",
+        )
+
+
+class MenuImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="pass")
+        self.restaurant = Restaurant.objects.create(user=self.user, phone="000")
+        self.client.force_authenticate(self.user)
+        self.url = reverse(
+            "restaurant-menu-import", args=[self.restaurant.restaurant_id]
+        )
+
+    def test_csv_body_upserts_foods_and_reports_bad_rows(self):
+        Food.objects.create(restaurant=self.restaurant, name="Jollof", price=4)
+        body = (
+            "category,name,price,extras\n"
+            "Mains,Jollof,6.50,Chicken:2.00|Plantain:1.00\n"
+            "Mains,Fried Rice,7.00,\n"
+            "Mains,Broken,not-a-price,\n"
+        )
+
+        response = self.client.post(
+            self.url, body, content_type="text/csv", secure=True
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.data[key] for key in ("rows", "created", "updated")},
+            {"rows": 3, "created": 1, "updated": 1},
+        )
+        self.assertEqual(response.data["errors"][0]["row"], 4)
+        jollof = Food.objects.get(restaurant=self.restaurant, name="Jollof")
+        self.assertEqual(str(jollof.price), "6.50")
+        self.assertEqual(jollof.category.name, "Mains")
+        self.assertEqual(
+            sorted(jollof.extras.values_list("name", flat=True)),
+            ["Chicken", "Plantain"],
+        )
+
+    def test_ndjson_upload_bumps_menu_version(self):
+        upload = SimpleUploadedFile(
+            "menu.ndjson",
+            b'{"name": "Suya", "price": "3.00"}\n{"name": "Puff", "price": "1"}\n',
+            content_type="application/x-ndjson",
+        )
+
+        response = self.client.post(
+            self.url, {"file": upload}, format="multipart", secure=True
+        )
+
+        self.assertEqual(response.data["created"], 2)
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.menu_version, 2)
+
+
+class IdAllocationTests(TransactionTestCase):
+    def take_concurrently(self, *allocators, workers=8, per_worker=50):
+        # Worker i draws from allocators[i % n], each on its own connection
+        def take(worker):
+            allocator = allocators[worker % len(allocators)]
+            try:
+                return [
+                    RESTAURANT_IDS.format(value)
+                    for _ in range(per_worker)
+                    for value in allocator.take(RESTAURANT_IDS.sequence)
+                ]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(workers) as pool:
+            return [id_ for batch in pool.map(take, range(workers)) for id_ in batch]
+
+    def test_sequence_allocator_never_repeats_under_concurrency(self):
+        ids = self.take_concurrently(SequenceAllocator())
+
+        self.assertEqual(len(ids), 400)
+        self.assertEqual(len(set(ids)), 400)
+
+    def test_block_allocators_never_repeat_under_concurrency(self):
+        # Two allocators stand in for two processes sharing the sequence
+        ids = self.take_concurrently(
+            BlockAllocator(block_size=7), BlockAllocator(block_size=7)
+        )
+
+        self.assertEqual(len(ids), 400)
+        self.assertEqual(len(set(ids)), 400)
+
+    def test_permutation_is_a_bijection(self):
+        permute = Permutation(1000, "key")
+
+        self.assertEqual(
+            sorted(permute(value) for value in range(1000)), list(range(1000))
+        )
+
+
+@mock.patch("restaurants.locations.flush_locations")
+class LocationWriteBehindTests(SimpleTestCase):
+    def buffer(self, interval=60):
+        buffer = LocationWriteBehind(interval)
+        self.addCleanup(lambda: buffer.task and buffer.task.cancel())
+        return buffer
+
+    async def test_flush_writes_the_latest_frame_per_rider_once(self, flush_locations):
+        buffer = self.buffer()
+        for lng in (1, 2, 3):
+            buffer.record(1, lng, 0, f"t{lng}")
+        buffer.record(2, 9, 9, "t1")
+
+        await buffer.flush()
+        await buffer.flush()
+
+        flush_locations.assert_called_once_with({1: (3, 0, "t3"), 2: (9, 9, "t1")})
+        self.assertEqual(buffer.pending, {})
+
+    async def test_failed_flush_requeues_without_overwriting_newer_frames(
+        self, flush_locations
+    ):
+        buffer = self.buffer()
+        buffer.record(1, 1, 1, "old")
+        buffer.record(2, 2, 2, "old")
+
+        def newer_frame_then_fail(positions):
+            buffer.pending[1] = (5, 5, "new")
+            raise DatabaseError
+
+        flush_locations.side_effect = newer_frame_then_fail
+        with self.assertRaises(DatabaseError):
+            await buffer.flush()
+
+        self.assertEqual(buffer.pending, {1: (5, 5, "new"), 2: (2, 2, "old")})
+
+    async def test_task_stops_when_idle_and_restarts_on_the_next_frame(
+        self, flush_locations
+    ):
+        buffer = self.buffer(interval=0.01)
+        buffer.record(1, 1, 1, "t1")
+        first = buffer.task
+        await asyncio.sleep(0.05)
+
+        self.assertTrue(first.done())
+        flush_locations.assert_called_once()
+
+        buffer.record(1, 2, 2, "t2")
+        self.assertIsNot(buffer.task, first)
+        await asyncio.sleep(0.05)
+        self.assertEqual(flush_locations.call_count, 2)
+        flush_locations.assert_called_with({1: (2, 2, "t2")})
+
+
+@mock.patch("restaurants.consumers.location_buffer")
+class RiderLocationConsumerTests(TransactionTestCase):
+    application = TokenAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+
+    def setUp(self):
+        owner = User.objects.create_user(username="owner", password="pass")
+        self.restaurant = Restaurant.objects.create(user=owner, phone="000")
+        self.rider = Rider.objects.create(
+            restaurant=self.restaurant, full_name="Rider", phone="222"
+        )
+        self.owner_token = Token.objects.create(user=owner)
+        stranger = User.objects.create_user(username="stranger", password="pass")
+        self.stranger_token = Token.objects.create(user=stranger)
+
+    def communicator(self, token=None):
+        path = f"/ws/riders/{self.rider.rider_code}/location/"
+        if token:
+            path += f"?token={token.key}"
+        return WebsocketCommunicator(self.application, path)
+
+    async def test_anonymous_clients_are_closed_with_4401(self, location_buffer):
+        connected, code = await self.communicator().connect()
+
+        self.assertEqual((connected, code), (False, 4401))
+
+    async def test_other_users_riders_are_closed_with_4403(self, location_buffer):
+        connected, code = await self.communicator(self.stranger_token).connect()
+
+        self.assertEqual((connected, code), (False, 4403))
+
+    async def test_frames_are_buffered_not_written(self, location_buffer):
+        communicator = self.communicator(self.owner_token)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_json_to({"lat": 91, "lng": 0})
+        self.assertEqual(
+            await communicator.receive_json_from(),
+            {"error": "Coordinates out of range."},
+        )
+        await communicator.send_json_to({"lat": "6.5", "lng": 3.4})
+        await communicator.send_json_to({"type": "ping"})
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        location_buffer.record.assert_called_once_with(
+            self.rider.pk, 3.4, 6.5, mock.ANY
+        )
+
+
+class NearestRidersTests(APITestCase):
+    # Lagos; 0.01 degrees of longitude is roughly 1.1 km here
+    lat, lng = 6.45, 3.40
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="pass")
+        self.restaurant = Restaurant.objects.create(user=self.user, phone="000")
+        self.client.force_authenticate(self.user)
+        self.url = reverse("nearest-riders")
+
+    def add_rider(
+        self,
+        east,
+        restaurant=None,
+        on_shift=True,
+        active=True,
+        seen=timedelta(seconds=10),
+        open_orders=0,
+    ):
+        rider = Rider.objects.create(
+            restaurant=restaurant or self.restaurant,
+            full_name="Rider",
+            phone="222",
+            is_active=active,
+            last_location=Point(self.lng + east, self.lat, srid=4326),
+            last_location_at=timezone.now() - seen,
+        )
+        RiderShift.objects.create(
+            rider=rider, status="started" if on_shift else "ended"
+        )
+        for status in ["Pending"] * open_orders + ["Delivered"]:
+            Order.objects.create(
+                restaurant=rider.restaurant, rider=rider, status=status
+            )
+        return rider.rider_code
+
+    def nearest(self, **params):
+        response = self.client.get(
+            self.url, {"lat": self.lat, "lng": self.lng, **params}, secure=True
+        )
+        self.assertEqual(response.status_code, 200)
+        return [rider["rider_code"] for rider in response.data]
+
+    def test_only_available_riders_are_returned_nearest_first(self):
+        far = self.add_rider(0.03)
+        near = self.add_rider(0.001)
+        middle = self.add_rider(0.01)
+        self.add_rider(0.0005, seen=timedelta(minutes=10))
+        self.add_rider(0.0005, on_shift=False)
+        self.add_rider(0.0005, active=False)
+        self.add_rider(0.0005, open_orders=3)
+
+        self.assertEqual(self.nearest(), [near, middle, far])
+
+    def test_limit_and_open_order_cap_come_from_the_query(self):
+        near = self.add_rider(0.001)
+        busy = self.add_rider(0.002, open_orders=3)
+        middle = self.add_rider(0.01)
+        self.add_rider(0.03)
+
+        self.assertEqual(self.nearest(k=2), [near, middle])
+        self.assertEqual(self.nearest(k=2, max_open_orders=4), [near, busy])
+
+    def test_other_managers_riders_are_never_returned(self):
+        other = Restaurant.objects.create(
+            user=User.objects.create_user(username="other", password="pass"),
+            phone="001",
+        )
+        self.add_rider(0.0005, restaurant=other)
+        own = self.add_rider(0.01)
+
+        self.assertEqual(self.nearest(), [own])
+        response = self.client.get(
+            reverse("nearest-riders", args=[other.restaurant_id]),
+            {"lat": self.lat, "lng": self.lng},
+            secure=True,
+        )
+        self.assertEqual(response.data, [])
+
+
+class RestaurantExpandTests(APITestCase):
+    collections = {"categories", "foods", "reviews", "riders", "orders"}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="pass")
+        self.client.force_authenticate(self.user)
+        self.url = reverse("restaurant-list-create")
+
+    def add_restaurant(self, riders=3):
+        restaurant = Restaurant.objects.create(
+            user=self.user,
+            phone="000",
+            representative=Representative.objects.create(full_name="Rep"),
+        )
+        for _ in range(riders):
+            Rider.objects.create(restaurant=restaurant, full_name="R", phone="1")
+        Food.objects.create(restaurant=restaurant, name="Dish", price=5)
+        return restaurant
+
+    def test_list_is_compact_without_expand(self):
+        self.add_restaurant()
+        # Page COUNT + restaurants joined to their representative
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, secure=True)
+
+        for _ in range(3):
+            self.add_restaurant()
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, secure=True)
+        self.assertEqual(len(response.data["results"]), 4)
+        self.assertFalse(self.collections & set(response.data["results"][0]))
+
+    def test_expanded_collections_cost_one_query_each(self):
+        self.add_restaurant()
+        # Page COUNT, restaurants, riders, then foods with their extras and
+        # reviews
+        with self.assertNumQueries(6):
+            self.client.get(self.url, {"expand": "riders,foods"}, secure=True)
+
+        for _ in range(3):
+            self.add_restaurant()
+        with self.assertNumQueries(6):
+            response = self.client.get(
+                self.url, {"expand": "riders,foods,unknown"}, secure=True
+            )
+        restaurant = response.data["results"][0]
+        self.assertEqual(self.collections & set(restaurant), {"riders", "foods"})
+        self.assertEqual(len(restaurant["riders"]), 3)
+
+    def test_expanded_collections_are_capped_per_restaurant(self):
+        self.add_restaurant(riders=3)
+        self.add_restaurant(riders=1)
+
+        with mock.patch("restaurants.views.EXPAND_PAGE_SIZE", 2):
+            response = self.client.get(self.url, {"expand": "riders"}, secure=True)
+
+        self.assertEqual(
+            sorted(len(row["riders"]) for row in response.data["results"]), [1, 2]
+        )
+
+    def test_detail_renders_every_collection_unless_expand_is_given(self):
+        restaurant = self.add_restaurant()
+        url = reverse("restaurant-detail", args=[restaurant.restaurant_id])
+
+        full = self.client.get(url, secure=True).data
+        compact = self.client.get(url, {"expand": ""}, secure=True).data
+        riders = self.client.get(url, {"expand": "riders"}, secure=True).data
+
+        self.assertEqual(self.collections & set(full), self.collections)
+        self.assertFalse(self.collections & set(compact))
+        self.assertEqual(self.collections & set(riders), {"riders"})
+
+
+class ShiftRollupTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="pass")
+        self.restaurant = Restaurant.objects.create(user=self.user, phone="000")
+        self.rider = Rider.objects.create(
+            restaurant=self.restaurant, full_name="Rider", phone="222"
+        )
+        self.day_shift = ShiftType.objects.create(
+            name="Day", start_time=time(8), end_time=time(16)
+        )
+        self.night_shift = ShiftType.objects.create(
+            name="Night", start_time=time(20), end_time=time(4)
+        )
+        self.client.force_authenticate(self.user)
+        self.today = timezone.localdate()
+
+    def start_shift(self, days_ago, hour, shift_type=None, rider=None):
+        shift = RiderShift.objects.create(
+            rider=rider or self.rider, shift_type=shift_type or self.day_shift
+        )
+        # start_time is auto_now_add; update() skips the rollup signals
+        started = timezone.make_aware(
+            datetime.combine(self.today - timedelta(days=days_ago), time(hour))
+        )
+        RiderShift.objects.filter(pk=shift.pk).update(start_time=started)
+        shift.refresh_from_db()
+        return shift
+
+    def finish(self, shift, status, hours=None):
+        shift.status = status
+        if hours is not None:
+            shift.end_time = shift.start_time + timedelta(hours=hours)
+        shift.save()
+
+    def rollups(self):
+        return list(
+            RiderShiftDailyRollup.objects.values(
+                "day", "shift_type_id", "shifts_ended", "shifts_cancelled"
+            )
+        )
+
+    def test_ending_a_shift_rolls_it_up_on_its_start_day(self):
+        shift = self.start_shift(2, 23, self.night_shift)
+        self.assertEqual(self.rollups(), [])
+
+        response = self.client.post(
+            reverse("end-rider-shift", args=[shift.pk]),
+            {"secret_code": "1234"},
+            secure=True,
+        )
+
+        self.assertEqual(response.status_code, 200)
+        shift.refresh_from_db()
+        rollup = RiderShiftDailyRollup.objects.get()
+        # Ends long after midnight but still counts towards the start day
+        self.assertEqual(rollup.day, self.today - timedelta(days=2))
+        self.assertEqual(rollup.restaurant_id, self.restaurant.pk)
+        self.assertEqual(rollup.shift_type_id, self.night_shift.pk)
+        self.assertEqual((rollup.shifts_ended, rollup.shifts_cancelled), (1, 0))
+        self.assertEqual(rollup.time_worked, shift.end_time - shift.start_time)
+
+    def test_cancelling_a_shift_rolls_it_up_on_its_start_day(self):
+        worked = self.start_shift(1, 8)
+        self.finish(worked, "ended", hours=8)
+        cancelled = self.start_shift(1, 16)
+
+        self.finish(cancelled, "cancelled")
+
+        rollup = RiderShiftDailyRollup.objects.get()
+        self.assertEqual(rollup.day, self.today - timedelta(days=1))
+        self.assertEqual((rollup.shifts_ended, rollup.shifts_cancelled), (1, 1))
+        self.assertEqual(rollup.time_worked, timedelta(hours=8))
+
+    def test_analytics_totals_match_a_full_rebuild(self):
+        other = Rider.objects.create(
+            restaurant=self.restaurant, full_name="Other", phone="333"
+        )
+        self.finish(self.start_shift(3, 8), "ended", hours=8)
+        self.finish(self.start_shift(3, 22, self.night_shift), "ended", hours=6)
+        self.finish(self.start_shift(2, 8), "cancelled")
+        self.finish(self.start_shift(1, 9, rider=other), "ended", hours=4.5)
+        self.finish(self.start_shift(1, 20, self.night_shift, other), "cancelled")
+        self.start_shift(0, 8)
+        url = reverse("rider-shift-analytics")
+        params = {
+            "start": (self.today - timedelta(days=6)).isoformat(),
+            "end": self.today.isoformat(),
+        }
+
+        def report(group_by):
+            response = self.client.get(
+                url, {**params, "group_by": group_by}, secure=True
+            )
+            self.assertEqual(response.status_code, 200)
+            return response.data["results"]
+
+        maintained = {
+            group_by: report(group_by)
+            for group_by in ["rider", "rider,day", "shift_type", "restaurant"]
+        }
+        rows = len(self.rollups())
+
+        self.assertEqual(
+            rebuild_shift_rollups(RiderShiftDailyRollup, RiderShift), rows
+        )
+        for group_by, results in maintained.items():
+            with self.subTest(group_by=group_by):
+                self.assertEqual(report(group_by), results)
+        totals = {
+            row["rider_code"]: (row["hours"], row["shifts"], row["cancellations"])
+            for row in maintained["rider"]
+        }
+        self.assertEqual(
+            totals,
+            {self.rider.rider_code: (14.0, 2, 1), other.rider_code: (4.5, 1, 1)},
+        )
+
+
+class FoodSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="pass")
+        self.restaurant = Restaurant.objects.create(user=self.user, phone="000")
+        self.category = FoodCategory.objects.create(
+            restaurant=self.restaurant, name="Mains"
+        )
+        self.client.force_authenticate(self.user)
+        self.url = reverse("food-search")
+
+    def add_food(self, name, description=""):
+        return Food.objects.create(
+            restaurant=self.restaurant,
+            category=self.category,
+            name=name,
+            description=description,
+            price=5,
+        ).pk
+
+    def search(self, q):
+        return self.fetch(self.url, {"q": q})
+
+    def fetch(self, url, params=None):
+        response = self.client.get(url, params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_full_text_matches_the_description(self):
+        dodo = self.add_food("Dodo", "Fried plantains with pepper sauce")
+        self.add_food("Suya", "Spiced grilled beef")
+
+        results = self.search("plantain")["results"]
+
+        self.assertEqual([food["id"] for food in results], [dodo])
+        self.assertIn("<mark>", results[0]["highlights"]["description"])
+
+    def test_a_typo_in_the_name_still_matches_by_trigram(self):
+        suya = self.add_food("Suya", "Spiced grilled beef")
+        self.add_food("Dodo", "Fried plantains with pepper sauce")
+
+        results = self.search("Suyo")["results"]
+
+        self.assertEqual([food["id"] for food in results], [suya])
+
+    def test_cursor_pages_through_tied_ranks_without_gaps_or_repeats(self):
+        best = self.add_food("Puff puff", "Puff puff dusted with sugar")
+        tied = [self.add_food("Puff puff", "Sweet fried dough") for _ in range(4)]
+        self.add_food("Chin chin", "Crunchy fried snack")
+
+        with mock.patch.object(FoodSearchPagination, "page_size", 2):
+            data = self.search("puff")
+            pages = [[food["id"] for food in data["results"]]]
+            # Next links carry q and the cursor; bounded in case they repeat
+            while data["next"] and len(pages) < 5:
+                data = self.fetch(data["next"])
+                pages.append([food["id"] for food in data["results"]])
+
+        # Page two starts and ends inside the run of tied ranks
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sum(pages, []), [best] + sorted(tied, reverse=True))
@@ -3,8 +3,11 @@ from .views import (
     RestaurantCategoryFoodCreateView,
     RestaurantListCreateView,
     RestaurantRetrieveUpdateDestroyView,
+    RestaurantMenuView,
+    RestaurantMenuImportView,
     FoodCategoryListCreateView,
     FoodListCreateView,
+    FoodSearchView,
     ExtraListCreateView,
     RiderListCreateView,
     RiderRetrieveUpdateDestroyView,
@@ -15,7 +18,12 @@ from .views import (
     EndRiderShiftView,
 )
 from orders.views import (
+    OrderBulkStatusView,
+    OrderExportView,
     OrderListCreateView,
+    OrderReportView,
+    OrderSlaView,
+    OrderTimelineView,
     RestaurantOrderRetrieveUpdateDestroyView,
     RiderOrderCreateView,
 )
@@ -50,16 +58,48 @@ urlpatterns = [
         OrderListCreateView.as_view(),
         name="restaurant-orders",
     ),
+    path(
+        "<str:restaurant_id>/orders/export.csv",
+        OrderExportView.as_view(),
+        {"fmt": "csv"},
+        name="restaurant-order-export-csv",
+    ),
+    path(
+        "<str:restaurant_id>/orders/export.ndjson",
+        OrderExportView.as_view(),
+        {"fmt": "ndjson"},
+        name="restaurant-order-export-ndjson",
+    ),
+    path(
+        "<str:restaurant_id>/orders/bulk-status/",
+        OrderBulkStatusView.as_view(),
+        name="restaurant-order-bulk-status",
+    ),
     path(
         "<str:restaurant_id>/orders/<str:order_id>/",
         RestaurantOrderRetrieveUpdateDestroyView.as_view(),
         name="restaurant-order-detail",
     ),
+    path(
+        "<str:restaurant_id>/orders/<str:order_id>/timeline/",
+        OrderTimelineView.as_view(),
+        name="restaurant-order-timeline",
+    ),
     path(
         "<str:restaurant_id>/riders/<str:rider_id>/deliveries/",
         RiderOrderCreateView.as_view(),
         name="create-rider-order",
     ),
+    path(
+        "<str:restaurant_id>/reports/sla/",
+        OrderSlaView.as_view(),
+        name="restaurant-order-sla",
+    ),
+    path(
+        "<str:restaurant_id>/reports/orders/",
+        OrderReportView.as_view(),
+        name="restaurant-order-report",
+    ),
     # ---------------- FOOD CATEGORIES ----------------
     path(
         "<str:restaurant_id>/food-categories/",
@@ -68,11 +108,28 @@ urlpatterns = [
     ),
     # ---------------- FOODS ----------------
     path("foods/", FoodListCreateView.as_view(), name="foods"),
+    path("foods/search/", FoodSearchView.as_view(), name="food-search"),
+    path(
+        "<str:restaurant_id>/foods/search/",
+        FoodSearchView.as_view(),
+        name="restaurant-food-search",
+    ),
     path(
         "<str:restaurant_id>/foods/",
         FoodListCreateView.as_view(),
         name="restaurant-foods",
     ),
+    # ---------------- MENU SNAPSHOT ----------------
+    path(
+        "<str:restaurant_id>/menu/",
+        RestaurantMenuView.as_view(),
+        name="restaurant-menu",
+    ),
+    path(
+        "<str:restaurant_id>/menu/import/",
+        RestaurantMenuImportView.as_view(),
+        name="restaurant-menu-import",
+    ),
     # ---------------- CATEGORY + FOOD IN ONE ----------------
     path(
         "<str:restaurant_id>/category-food/",
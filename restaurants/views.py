@@ -1,80 +1,229 @@
+import hashlib
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, status
+from rest_framework.pagination import CursorPagination
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from django.db.models import Count, F, Max, Prefetch, Sum, Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from backend.reports import RollupReportView
 
 from .models import (
     Restaurant,
     FoodCategory,
     Food,
     Extra,
+    Review,
     Rider,
     ShiftType,
     RiderShift,
+    RiderShiftDailyRollup,
 )
+from .dispatch import MAX_OPEN_ORDERS, NEAREST_RIDERS_LIMIT, nearest_available_riders
+from .menu import get_menu_snapshot
+from .menu_import import detect_format, import_menu
+from .search import food_highlights, search_foods
 from .serializers import (
     RestaurantSerializer,
     FoodCategorySerializer,
     FoodSerializer,
+    FoodSearchResultSerializer,
     ExtraSerializer,
     RiderSerializer,
+    NearestRiderSerializer,
     ShiftTypeSerializer,
     RiderShiftSerializer,
 )
 
 
-# 🔒 Force HTTPS in all response URLs
-def enforce_https_in_response(data):
-    if isinstance(data, dict):
-        for key, value in data.items():
-            if isinstance(value, str) and value.startswith("http://"):
-                data[key] = value.replace("http://", "https://", 1)
-            elif isinstance(value, (dict, list)):
-                enforce_https_in_response(value)
-    elif isinstance(data, list):
-        for item in data:
-            enforce_https_in_response(item)
-    return data
+# ---------------- CONDITIONAL GET ----------------
+class ConditionalGetMixin:
+    """
+    Answer If-None-Match / If-Modified-Since from the restaurants' change
+    markers with a single aggregate query, before anything is serialized.
+    """
+
+    restaurant_kwarg = "restaurant_id"
+
+    def get_restaurant_scope(self):
+        qs = Restaurant.objects.filter(user=self.request.user)
+        restaurant_id = self.kwargs.get(self.restaurant_kwarg)
+        if restaurant_id:
+            qs = qs.filter(restaurant_id=restaurant_id)
+        return qs
+
+    def get_validators(self):
+        state = self.get_restaurant_scope().aggregate(
+            updated_at=Max("updated_at"),
+            menu_version=Sum("menu_version"),
+            restaurants=Count("pk"),
+        )
+        fingerprint = "|".join(
+            [
+                self.__class__.__name__,
+                self.request.get_full_path(),
+                str(self.request.user.pk),
+                str(state["updated_at"]),
+                str(state["menu_version"]),
+                str(state["restaurants"]),
+            ]
+        )
+        etag = '"%s"' % hashlib.md5(fingerprint.encode()).hexdigest()
+        last_modified = state["updated_at"]
+        return etag, int(last_modified.timestamp()) if last_modified else None
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+# ---------------- RATINGS ----------------
+def apply_rating_filters(queryset, request):
+    """Support ?min_rating= and ?ordering=rating|-rating on the stored aggregate."""
+    min_rating = request.query_params.get("min_rating")
+    if min_rating:
+        try:
+            queryset = queryset.filter(rating__gte=Decimal(min_rating))
+        except InvalidOperation:
+            raise ValidationError({"min_rating": "Must be a number."})
+
+    ordering = request.query_params.get("ordering")
+    if ordering in ("rating", "-rating"):
+        queryset = queryset.order_by(ordering, "pk")
+    return queryset
 
 
 # ---------------- RESTAURANTS ----------------
+# Max rows rendered per expanded sub-collection in the restaurant list
+EXPAND_PAGE_SIZE = 50
+
+
+def parse_expand(request):
+    raw = request.query_params.get("expand", "")
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    return requested & set(RestaurantSerializer.EXPANDABLE_FIELDS)
+
+
+def limit_per_restaurant(queryset, limit, order_by):
+    return queryset.annotate(
+        expand_rank=Window(
+            RowNumber(), partition_by=F("restaurant_id"), order_by=order_by
+        )
+    ).filter(expand_rank__lte=limit)
+
+
+def restaurant_expand_prefetches(expand, limit=None):
+    """Prefetch each expanded sub-collection, capped per restaurant when limited."""
+    Order = Restaurant._meta.get_field("orders").related_model
+    querysets = {
+        "categories": (FoodCategory.objects.with_item_counts(), ["name", "id"]),
+        "foods": (
+            Food.objects.select_related("category").prefetch_related(
+                "extras", "reviews"
+            ),
+            ["id"],
+        ),
+        "reviews": (Review.objects.all(), ["-created_at"]),
+        "riders": (Rider.objects.all(), ["id"]),
+        "orders": (
+            Order.objects.only("order_id", "restaurant"),
+            ["-date_ordered", "order_id"],
+        ),
+    }
+    prefetches = []
+    for name in RestaurantSerializer.EXPANDABLE_FIELDS:
+        if name not in expand:
+            continue
+        queryset, order_by = querysets[name]
+        if limit:
+            queryset = limit_per_restaurant(queryset, limit, order_by)
+        prefetches.append(Prefetch(name, queryset=queryset.order_by(*order_by)))
+    return prefetches
+
+
 class RestaurantListCreateView(generics.ListCreateAPIView):
     serializer_class = RestaurantSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def get_queryset(self):
-        return Restaurant.objects.filter(user=self.request.user)
+        qs = (
+            Restaurant.objects.filter(user=self.request.user)
+            .select_related("representative")
+            .prefetch_related(
+                *restaurant_expand_prefetches(
+                    parse_expand(self.request), limit=EXPAND_PAGE_SIZE
+                )
+            )
+            .order_by("restaurant_id")
+        )
+        return apply_rating_filters(qs, self.request)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
     def get_serializer_context(self):
-        return {"request": self.request}
+        return {"request": self.request, "expand": parse_expand(self.request)}
 
 
-class RestaurantRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+class RestaurantRetrieveUpdateDestroyView(
+    ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView
+):
     serializer_class = RestaurantSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
+    restaurant_kwarg = "pk"
+
+    def get_expand(self):
+        # Without ?expand= the detail view keeps rendering every collection
+        if "expand" in self.request.query_params:
+            return parse_expand(self.request)
+        return set(RestaurantSerializer.EXPANDABLE_FIELDS)
 
     def get_queryset(self):
-        return Restaurant.objects.filter(user=self.request.user)
+        return (
+            Restaurant.objects.filter(user=self.request.user)
+            .select_related("representative")
+            .prefetch_related(*restaurant_expand_prefetches(self.get_expand()))
+        )
 
     def get_serializer_context(self):
-        return {"request": self.request}
+        return {"request": self.request, "expand": self.get_expand()}
 
 
 # ---------------- FOOD CATEGORIES ----------------
-class FoodCategoryListCreateView(generics.ListCreateAPIView):
+class FoodCategoryListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = FoodCategorySerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        qs = FoodCategory.objects.filter(restaurant__user=self.request.user)
+        qs = (
+            FoodCategory.objects.filter(restaurant__user=self.request.user)
+            .with_item_counts()
+            .order_by("name", "id")
+        )
         restaurant_id = self.kwargs.get("restaurant_id")
         if restaurant_id:
             qs = qs.filter(restaurant__restaurant_id=restaurant_id)
@@ -99,24 +248,31 @@ class FoodCategoryRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIVie
     lookup_field = "pk"
 
     def get_queryset(self):
-        return FoodCategory.objects.filter(restaurant__user=self.request.user)
+        return FoodCategory.objects.filter(
+            restaurant__user=self.request.user
+        ).with_item_counts()
 
     def get_serializer_context(self):
         return {"request": self.request}
 
 
 # ---------------- FOODS ----------------
-class FoodListCreateView(generics.ListCreateAPIView):
+class FoodListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = FoodSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def get_queryset(self):
-        qs = Food.objects.filter(restaurant__user=self.request.user)
+        qs = (
+            Food.objects.filter(restaurant__user=self.request.user)
+            .select_related("category", "restaurant")
+            .prefetch_related("extras", "reviews")
+            .order_by("id")
+        )
         restaurant_id = self.kwargs.get("restaurant_id")
         if restaurant_id:
             qs = qs.filter(restaurant__restaurant_id=restaurant_id)
-        return qs
+        return apply_rating_filters(qs, self.request)
 
     def perform_create(self, serializer):
         restaurant_id = self.kwargs.get("restaurant_id") or self.request.data.get(
@@ -144,6 +300,47 @@ class FoodRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         return {"request": self.request}
 
 
+# ---------------- FOOD SEARCH ----------------
+class FoodSearchPagination(CursorPagination):
+    # Stable ordering across requests, not keyset paging: the rank is computed
+    # for every match, and DRF's cursor keys on it alone, skipping rows that
+    # tie with the cursor's rank by offset
+    ordering = ("-rank", "-id")
+    page_size = 20
+
+
+class FoodSearchView(generics.ListAPIView):
+    serializer_class = FoodSearchResultSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = FoodSearchPagination
+
+    def get_search_text(self):
+        text = self.request.query_params.get("q", "").strip()
+        if not text:
+            raise ValidationError({"q": "This query parameter is required."})
+        return text
+
+    def get_queryset(self):
+        qs = Food.objects.select_related("category")
+        restaurant_id = self.kwargs.get(
+            "restaurant_id"
+        ) or self.request.query_params.get("restaurant")
+        if restaurant_id:
+            qs = qs.filter(restaurant_id=restaurant_id)
+        category_id = self.request.query_params.get("category")
+        if category_id:
+            qs = qs.filter(category_id=category_id)
+        return search_foods(qs, self.get_search_text())
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        # Headlines are only computed for the rows on this page
+        context = self.get_serializer_context()
+        context["highlights"] = food_highlights(page, self.get_search_text())
+        serializer = self.get_serializer_class()(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
+
+
 # ---------------- CATEGORY + FOOD IN ONE GO ----------------
 class RestaurantCategoryFoodCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -178,10 +375,72 @@ class RestaurantCategoryFoodCreateView(APIView):
             ).data,
             "food": FoodSerializer(food, context={"request": request}).data,
         }
-        return Response(
-            enforce_https_in_response(response_data), status=status.HTTP_201_CREATED
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
+
+# ---------------- MENU SNAPSHOT ----------------
+class RestaurantMenuView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, restaurant_id):
+        version = (
+            Restaurant.objects.filter(restaurant_id=restaurant_id)
+            .values_list("menu_version", flat=True)
+            .first()
+        )
+        if version is None:
+            raise Http404
+
+        etag = f'"menu-{restaurant_id}-v{version}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            # Served as prebuilt bytes, bypassing serializers and renderers
+            response = HttpResponse(
+                get_menu_snapshot(restaurant_id, version, request),
+                content_type="application/json",
+            )
+        response["ETag"] = etag
+        response["X-Menu-Version"] = str(version)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+# ---------------- BULK MENU IMPORT ----------------
+class RestaurantMenuImportView(APIView):
+    """
+    Accepts a CSV/NDJSON body, or a multipart "file" upload, with one food per
+    row and upserts the whole menu in one transaction.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, restaurant_id):
+        restaurant = get_object_or_404(
+            Restaurant, restaurant_id=restaurant_id, user=request.user
         )
 
+        if request.content_type.startswith("multipart/form-data"):
+            upload = request.FILES.get("file")
+            if upload is None:
+                return Response(
+                    {"detail": "file is required."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            stream, fmt = upload, detect_format(upload.content_type, upload.name)
+        else:
+            # Read the raw body lazily so large menus are never held in memory
+            stream, fmt = request.stream, detect_format(request.content_type)
+
+        if fmt is None or stream is None:
+            return Response(
+                {"detail": "Send a CSV or NDJSON menu."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        report = import_menu(restaurant, stream, fmt)
+        return Response(report, status=status.HTTP_200_OK)
+
 
 # ---------------- EXTRAS ----------------
 class ExtraListCreateView(generics.ListCreateAPIView):
@@ -250,6 +509,95 @@ def toggle_rider_active_status(request, pk):
 
 
 # ---------------- SHIFTS ----------------
+def positive_int_param(request, name, default, maximum):
+    raw = request.query_params.get(name)
+    if raw is None:
+        return default
+    if not raw.isdigit() or not 1 <= int(raw) <= maximum:
+        raise ValidationError({name: f"Must be between 1 and {maximum}."})
+    return int(raw)
+
+
+class NearestRidersView(APIView):
+    """
+    Riders closest to an order's pickup point (?order=<order_id>) or to
+    ?lat=&lng=, who are active, on shift and under ?max_open_orders=.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_point(self):
+        params = self.request.query_params
+        if params.get("order"):
+            Order = Restaurant._meta.get_field("orders").related_model
+            order = get_object_or_404(
+                Order,
+                order_id=params["order"],
+                restaurant__user=self.request.user,
+            )
+            if order.pickup_location is None:
+                raise ValidationError({"order": "This order has no pickup location."})
+            return order.pickup_location
+        try:
+            return Point(float(params["lng"]), float(params["lat"]), srid=4326)
+        except (KeyError, ValueError):
+            raise ValidationError({"detail": "Pass ?order= or both ?lat= and ?lng=."})
+
+    def get(self, request, restaurant_id=None):
+        point = self.get_point()
+        riders = Rider.objects.filter(restaurant__user=request.user)
+        if restaurant_id:
+            riders = riders.filter(restaurant_id=restaurant_id)
+
+        riders = nearest_available_riders(
+            point,
+            riders=riders,
+            limit=positive_int_param(request, "k", NEAREST_RIDERS_LIMIT, 50),
+            max_open_orders=positive_int_param(
+                request, "max_open_orders", MAX_OPEN_ORDERS, 100
+            ),
+        )
+        serializer = NearestRiderSerializer(
+            riders, many=True, context={"request": request}
+        )
+        return Response(serializer.data)
+
+
+class RiderLocationListView(APIView):
+    """
+    Last known rider positions. Live frames are written behind, so these lag
+    by at most `max_staleness` seconds; ?max_age= (seconds) drops positions
+    older than that.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, restaurant_id=None):
+        riders = Rider.objects.filter(
+            restaurant__user=request.user, last_location__isnull=False
+        )
+        if restaurant_id:
+            riders = riders.filter(restaurant_id=restaurant_id)
+        max_age = positive_int_param(request, "max_age", None, 60 * 60 * 24)
+        if max_age:
+            riders = riders.filter(
+                last_location_at__gte=timezone.now() - timedelta(seconds=max_age)
+            )
+
+        positions = riders.order_by("rider_code").values_list(
+            "rider_code", "last_location", "last_location_at"
+        )
+        return Response(
+            {
+                "max_staleness": settings.RIDER_LOCATION_FLUSH_SECONDS,
+                "results": [
+                    {"rider_code": code, "lat": point.y, "lng": point.x, "at": at}
+                    for code, point, at in positions
+                ],
+            }
+        )
+
+
 class ShiftTypeListCreateView(generics.ListCreateAPIView):
     queryset = ShiftType.objects.all()
     serializer_class = ShiftTypeSerializer
@@ -281,7 +629,7 @@ class StartRiderShiftView(APIView):
             rider=rider, shift_type=shift_type, started_by=request.user
         )
         serializer = RiderShiftSerializer(shift, context={"request": request})
-        return Response(enforce_https_in_response(serializer.data), status=201)
+        return Response(serializer.data, status=201)
 
 
 class EndRiderShiftView(APIView):
@@ -303,4 +651,69 @@ class EndRiderShiftView(APIView):
         shift.save()
 
         serializer = RiderShiftSerializer(shift, context={"request": request})
-        return Response(enforce_https_in_response(serializer.data), status=200)
+        return Response(serializer.data, status=200)
+
+
+# ---------------- SHIFT ANALYTICS ----------------
+SHIFT_ANALYTICS_MAX_DAYS = 366
+SHIFT_ANALYTICS_GROUPS = {
+    "rider": (
+        [],
+        {"rider_code": F("rider__rider_code"), "rider_name": F("rider__full_name")},
+    ),
+    "shift_type": (["shift_type_id"], {"shift_type_name": F("shift_type__name")}),
+    "restaurant": (["restaurant_id"], {"restaurant_name": F("restaurant__name")}),
+    "day": (["day"], {}),
+}
+
+
+class RiderShiftAnalyticsView(RollupReportView):
+    """
+    Hours worked, shift counts and cancellations from the daily rollups.
+
+    ?group_by= any of rider, shift_type, restaurant and day (default rider),
+    and optional ?rider=<rider_code> / ?shift_type=<id> filters.
+    """
+
+    max_days = SHIFT_ANALYTICS_MAX_DAYS
+    groups = SHIFT_ANALYTICS_GROUPS
+    default_group_by = "rider"
+
+    def get(self, request, restaurant_id=None):
+        start, end = self.parse_range()
+        group_by = self.parse_group_by()
+
+        rollups = RiderShiftDailyRollup.objects.filter(
+            restaurant__user=request.user, day__range=(start, end)
+        )
+        if restaurant_id:
+            rollups = rollups.filter(restaurant_id=restaurant_id)
+        if request.query_params.get("rider"):
+            rollups = rollups.filter(rider__rider_code=request.query_params["rider"])
+        if request.query_params.get("shift_type"):
+            shift_type = request.query_params["shift_type"]
+            if not shift_type.isdigit():
+                raise ValidationError({"shift_type": "Must be a shift type id."})
+            rollups = rollups.filter(shift_type_id=shift_type)
+
+        rows = self.group_rows(
+            rollups,
+            group_by,
+            time_worked=Sum("time_worked"),
+            shifts=Sum("shifts_ended"),
+            cancellations=Sum("shifts_cancelled"),
+        )
+
+        results = []
+        for row in rows:
+            time_worked = row.pop("time_worked")
+            row["hours"] = round(time_worked.total_seconds() / 3600, 2)
+            results.append(row)
+        return Response(
+            {
+                "start": start,
+                "end": end,
+                "group_by": group_by,
+                "results": results,
+            }
+        )